@@ -9,6 +9,11 @@ import os
 import streamlit as st
 from dotenv import load_dotenv
 
+from backend.config import RAGConfig
+from backend.embedding_cache import configure_embedding_cache
+from backend.embeddings import warm_up_embedding_model
+from backend.vector_store import set_allow_legacy_pickle_stores, set_vector_store_cache_budget
+
 # Load env vars from .env (OPENROUTER_API_KEY, etc.)
 load_dotenv()
 
@@ -28,6 +33,25 @@ else:
         "Set it in your .env file if you want to use OpenRouter."
     )
 
+# Warm up the shared embedding model once per process so the first chat turn
+# does not pay for loading the weights.
+if "config" not in st.session_state:
+    st.session_state.config = RAGConfig()
+try:
+    warm_up_embedding_model(st.session_state.config)
+except Exception as e:
+    st.warning(f"Embedding model warm-up failed: {e}")
+set_vector_store_cache_budget(
+    getattr(st.session_state.config, "vector_store_cache_budget_mb", 2048)
+)
+set_allow_legacy_pickle_stores(
+    getattr(st.session_state.config, "allow_legacy_pickle_stores", False)
+)
+try:
+    configure_embedding_cache(st.session_state.config)
+except Exception as e:
+    st.warning(f"Embedding cache disabled: {e}")
+
 st.markdown(
     """
 Welcome!  
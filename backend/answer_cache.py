@@ -0,0 +1,518 @@
+# backend/answer_cache.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from .config import RAGConfig
+from .embeddings import embed_query_cached, embedding_model_id
+from .manifest import index_fingerprint
+from .rag_utils import EventSink
+
+# Role of this module:
+# Semantic cache of final answers, in front of `rag_pipeline.aanswer_question`
+# and `hybrid_rag.hybrid_answer_question`. A question whose embedding is at
+# least `answer_cache_threshold` cosine-similar to an earlier one gets the
+# stored answer, documents and trace back without retrieval or any LLM call.
+#
+# Entries are scoped: only questions asked under the same settings match.
+#   config_key  pipeline, LLM, embedding model, DB paths, top_k, agentic mode,
+#               retrieval, index search, rerank and router settings
+#               (everything that changes the answer)
+#   scope       config_key + index fingerprint of every DB
+# When a DB is rebuilt its fingerprint changes: lookups use the new scope, and
+# the rows of older scopes of the same config_key are deleted on the next lookup.
+#
+# Opt-in (`use_answer_cache`, off by default).
+# Rows expire after `answer_cache_ttl_s`; beyond `answer_cache_max_entries`
+# the least recently used rows are evicted. SQLite file shared by all
+# sessions / processes (WAL), like backend/embedding_cache.py.
+#
+# Inspect / clear from a shell:
+#   python -m backend.answer_cache stats
+#   python -m backend.answer_cache clear
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    id          INTEGER PRIMARY KEY,
+    config_key  TEXT    NOT NULL,   -- settings + DB paths
+    scope       TEXT    NOT NULL,   -- config_key + DB index fingerprints
+    question    TEXT    NOT NULL,
+    dim         INTEGER NOT NULL,
+    vector      BLOB    NOT NULL,   -- float32 unit vector of the question, little endian
+    answer      TEXT    NOT NULL,
+    docs        TEXT    NOT NULL,   -- JSON [{page_content, metadata, id}]
+    reasoning   TEXT,
+    extra       TEXT,               -- JSON (hybrid: extracted legal metadata)
+    created     REAL    NOT NULL,
+    last_used   REAL    NOT NULL,
+    hits        INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_scope ON answers (scope);
+CREATE INDEX IF NOT EXISTS answers_config_key ON answers (config_key);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+"""
+
+# Answers that must not be replayed (provider errors, missing configuration)
+_ERROR_PREFIXES = ("[LLM error]", "LLM provider is not correctly configured")
+
+# Eviction brings the cache down to this fraction of max_entries
+_EVICT_TO = 0.9
+
+
+@dataclass
+class CachedAnswer:
+    question: str                 # the earlier question that matched
+    answer: str
+    docs: List[Document]
+    reasoning: Optional[str]
+    extra: Dict[str, Any]
+    similarity: float
+    age_s: float
+    hits: int                     # times served before this one
+
+
+@dataclass
+class AnswerCacheKey:
+    """Where the answer of a missed lookup is stored (see `store_answer`)."""
+    cache: "AnswerCache"
+    config_key: str
+    scope: str
+    question: str
+    vector: np.ndarray = field(repr=False)
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm > 0 else v
+
+
+def _docs_to_json(docs: List[Document]) -> str:
+    return json.dumps(
+        [{"page_content": d.page_content, "metadata": d.metadata or {}, "id": d.id} for d in docs],
+        ensure_ascii=False,
+        default=str,
+    )
+
+
+def _docs_from_json(raw: str) -> List[Document]:
+    return [
+        Document(page_content=d["page_content"], metadata=d.get("metadata") or {}, id=d.get("id"))
+        for d in json.loads(raw or "[]")
+    ]
+
+
+def is_cacheable_answer(answer: str) -> bool:
+    text = (answer or "").strip()
+    return bool(text) and not text.startswith(_ERROR_PREFIXES)
+
+
+class AnswerCache:
+    """
+    SQLite-backed semantic {(scope, question vector) -> answer} cache.
+
+    - `lookup` returns the most similar live answer of a scope above a
+      threshold (brute-force cosine over the scope's vectors, which are kept
+      in memory between writes).
+    - One connection shared by all threads (guarded by a lock); WAL mode.
+    """
+
+    def __init__(self, path: str, max_entries: int = 2000, ttl_s: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = int(max_entries)
+        self.ttl_s = float(ttl_s)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # scope -> (row ids, created times, unit vectors), dropped on every write
+        self._vectors: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        # config_key -> last scope seen (stale scopes purged when it changes)
+        self._scopes: Dict[str, str] = {}
+
+    # ---------------- Lookups ----------------
+    def _scope_vectors(self, scope: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Caller holds the lock
+        cached = self._vectors.get(scope)
+        if cached is None:
+            rows = self._conn.execute(
+                "SELECT id, created, vector FROM answers WHERE scope = ?", (scope,)
+            ).fetchall()
+            if rows:
+                cached = (
+                    np.array([r[0] for r in rows], dtype=np.int64),
+                    np.array([r[1] for r in rows], dtype=np.float64),
+                    np.vstack([np.frombuffer(r[2], dtype="<f4") for r in rows]),
+                )
+            else:
+                cached = (np.empty(0, np.int64), np.empty(0, np.float64), np.empty((0, 0), np.float32))
+            self._vectors[scope] = cached
+        return cached
+
+    def _purge_stale_scopes(self, config_key: str, scope: str) -> None:
+        # Caller holds the lock. Rows of the same settings over older DB versions.
+        if self._scopes.get(config_key) == scope:
+            return
+        cur = self._conn.execute(
+            "DELETE FROM answers WHERE config_key = ? AND scope != ?", (config_key, scope)
+        )
+        self._conn.commit()
+        if cur.rowcount:
+            self._vectors.clear()
+            print(f"[answer_cache] {cur.rowcount} answer(s) of rebuilt DBs invalidated.")
+        self._scopes[config_key] = scope
+
+    def lookup(
+        self,
+        config_key: str,
+        scope: str,
+        vector: np.ndarray,
+        threshold: float = 0.95,
+    ) -> Optional[CachedAnswer]:
+        """Most similar live answer of `scope` with cosine similarity >= threshold, or None."""
+        q = _unit(vector)
+        now = time.time()
+        with self._lock:
+            self._purge_stale_scopes(config_key, scope)
+            ids, created, matrix = self._scope_vectors(scope)
+            best = -1
+            if len(ids) and matrix.shape[1] == q.shape[0]:
+                sims = matrix @ q
+                if self.ttl_s > 0:
+                    sims = np.where(created >= now - self.ttl_s, sims, -np.inf)
+                best = int(np.argmax(sims))
+                if sims[best] < threshold:
+                    best = -1
+            if best < 0:
+                self.misses += 1
+                return None
+            row_id, similarity = int(ids[best]), float(sims[best])
+            row = self._conn.execute(
+                "SELECT question, answer, docs, reasoning, extra, created, hits "
+                "FROM answers WHERE id = ?",
+                (row_id,),
+            ).fetchone()
+            if row is None:
+                self._vectors.pop(scope, None)
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE answers SET last_used = ?, hits = hits + 1 WHERE id = ?", (now, row_id)
+            )
+            self._conn.commit()
+            self.hits += 1
+        question, answer, docs, reasoning, extra, t_created, n_hits = row
+        return CachedAnswer(
+            question=question,
+            answer=answer,
+            docs=_docs_from_json(docs),
+            reasoning=reasoning,
+            extra=json.loads(extra) if extra else {},
+            similarity=similarity,
+            age_s=now - t_created,
+            hits=int(n_hits),
+        )
+
+    def put(
+        self,
+        config_key: str,
+        scope: str,
+        question: str,
+        vector: np.ndarray,
+        answer: str,
+        docs: List[Document],
+        reasoning: Optional[str] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        v = _unit(vector).astype("<f4")
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO answers (config_key, scope, question, dim, vector, answer, docs, "
+                "reasoning, extra, created, last_used) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    config_key,
+                    scope,
+                    question,
+                    int(v.shape[0]),
+                    v.tobytes(),
+                    answer,
+                    _docs_to_json(docs),
+                    reasoning,
+                    json.dumps(extra, ensure_ascii=False, default=str) if extra else None,
+                    now,
+                    now,
+                ),
+            )
+            if self.ttl_s > 0:
+                self._conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_s,))
+            self._evict(self.max_entries)
+            self._conn.commit()
+            self._vectors.clear()
+
+    # ---------------- Maintenance ----------------
+    def _evict(self, max_entries: int) -> int:
+        # Caller holds the lock (and commits). Least recently used rows first.
+        (n,) = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()
+        if n <= max_entries:
+            return 0
+        excess = n - int(max_entries * _EVICT_TO)
+        self._conn.execute(
+            "DELETE FROM answers WHERE id IN "
+            "(SELECT id FROM answers ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        return excess
+
+    def clear(self) -> int:
+        """Delete every answer. Returns rows deleted."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self._vectors.clear()
+            return cur.rowcount
+
+    def vacuum(self) -> None:
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (n, served, scopes) = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(hits), 0), COUNT(DISTINCT scope) FROM answers"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "path": self.path,
+            "entries": int(n),
+            "max_entries": self.max_entries,
+            "scopes": int(scopes),
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "served_total": int(served),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# =====================================================================
+# Process-wide caches
+# =====================================================================
+_CACHES: Dict[str, AnswerCache] = {}
+_CACHES_LOCK = threading.Lock()
+# index.faiss path -> ((mtime_ns, size, inode), fingerprint)
+_FINGERPRINTS: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
+
+
+def get_answer_cache(config: RAGConfig) -> Optional[AnswerCache]:
+    """The shared AnswerCache of the config's file (None when disabled)."""
+    if not getattr(config, "use_answer_cache", False):
+        return None
+    path = getattr(config, "answer_cache_path", "vector_store/.cache/answers.sqlite")
+    key = os.path.realpath(os.path.abspath(path))
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = AnswerCache(path)
+        cache.max_entries = int(getattr(config, "answer_cache_max_entries", 2000))
+        cache.ttl_s = float(getattr(config, "answer_cache_ttl_s", 7 * 24 * 3600))
+        return cache
+
+
+def get_answer_cache_stats(config: RAGConfig) -> Optional[Dict[str, Any]]:
+    cache = get_answer_cache(config)
+    return cache.stats() if cache is not None else None
+
+
+def _db_version(path: str) -> str:
+    index_path = os.path.join(path, "index.faiss")
+    try:
+        st = os.stat(index_path)
+    except OSError:
+        return "missing"
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+    cached = _FINGERPRINTS.get(index_path)
+    if cached is None or cached[0] != stamp:
+        cached = _FINGERPRINTS[index_path] = (stamp, index_fingerprint(index_path))
+    return cached[1]
+
+
+def answer_cache_keys(
+    config: RAGConfig,
+    pipeline: str,
+    embedding_model: Embeddings,
+    db_map: Dict[str, str],
+) -> Tuple[str, str]:
+    """(config_key, scope) of a question asked with `config` (see the module comment)."""
+    settings = {
+        "pipeline": pipeline,
+        "llm": [config.llm_provider, config.llm_model_name, getattr(config, "llm_base_url", "")],
+        "embedding": embedding_model_id(embedding_model),
+        "dbs": sorted(os.path.realpath(p) for p in db_map.values()),
+        "top_k": config.top_k,
+        "agentic_mode": getattr(config, "agentic_mode", "standard_rag"),
+        "use_multiagent": bool(getattr(config, "use_multiagent", False)),
+        "hybrid_metadata_mode": getattr(config, "hybrid_metadata_mode", "sequential"),
+        "retrieval_mode": getattr(config, "retrieval_mode", "dense"),
+        "use_rerank": bool(getattr(config, "use_rerank", False)),
+        "rerank_model_name": getattr(config, "rerank_model_name", ""),
+        "chunk_retrieval_mode": getattr(config, "chunk_retrieval_mode", "neighbors"),
+        "chunk_neighbor_window": getattr(config, "chunk_neighbor_window", 1),
+        "rrf_k": getattr(config, "rrf_k", 60),
+        "rerank_budget_ms": getattr(config, "rerank_budget_ms", 1500.0),
+        "index": [
+            getattr(config, "index_type", "flat"),
+            getattr(config, "index_nprobe", 8),
+            getattr(config, "index_ef_search", 64),
+        ],
+        "router": [
+            bool(getattr(config, "use_local_router", True)),
+            getattr(config, "router_min_similarity", 0.35),
+            getattr(config, "router_skip_similarity", 0.15),
+            getattr(config, "router_margin", 0.05),
+            getattr(config, "router_keyword_boost", 0.1),
+        ],
+    }
+    raw = json.dumps(settings, sort_keys=True)
+    config_key = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    versions = [_db_version(p) for p in settings["dbs"]]
+    scope = hashlib.sha256(f"{config_key}|{'|'.join(versions)}".encode("utf-8")).hexdigest()
+    return config_key, scope
+
+
+def lookup_answer(
+    config: RAGConfig,
+    pipeline: str,
+    question: str,
+    embedding_model: Embeddings,
+    db_map: Dict[str, str],
+) -> Tuple[Optional[AnswerCacheKey], Optional[CachedAnswer]]:
+    """
+    (key to store the fresh answer under, cached answer or None).
+    (None, None) when the cache is disabled or unusable; a cache failure never
+    fails the question.
+    """
+    try:
+        cache = get_answer_cache(config)
+        if cache is None:
+            return None, None
+        config_key, scope = answer_cache_keys(config, pipeline, embedding_model, db_map)
+        vector = embed_query_cached(
+            embedding_model,
+            question,
+            use_process_cache=getattr(config, "use_query_embedding_cache", True),
+        )
+        hit = cache.lookup(
+            config_key,
+            scope,
+            vector,
+            threshold=float(getattr(config, "answer_cache_threshold", 0.95)),
+        )
+    except Exception as e:
+        print(f"[answer_cache] Lookup failed: {e}")
+        return None, None
+    return AnswerCacheKey(cache, config_key, scope, question, vector), hit
+
+
+def store_answer(
+    key: Optional[AnswerCacheKey],
+    answer: str,
+    docs: List[Document],
+    reasoning: Optional[str] = None,
+    extra: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """Store the answer of a missed lookup (error answers are not stored)."""
+    if key is None or not is_cacheable_answer(answer):
+        return False
+    try:
+        key.cache.put(
+            key.config_key, key.scope, key.question, key.vector, answer, docs, reasoning, extra
+        )
+    except Exception as e:
+        print(f"[answer_cache] Could not store answer: {e}")
+        return False
+    return True
+
+
+def cache_hit_log(hit: CachedAnswer) -> str:
+    return (
+        f"Answer cache HIT: similarity {hit.similarity:.3f} to the earlier question "
+        f"{hit.question[:120]!r} (answered {hit.age_s / 60:.0f} min ago, served {hit.hits + 1} "
+        "time(s) from cache) → no retrieval, no LLM call."
+    )
+
+
+def serve_cached_answer(
+    hit: CachedAnswer,
+    show_reasoning: bool,
+    on_event: Optional[EventSink] = None,
+    **event_fields: Any,
+) -> Tuple[str, List[Document], Optional[str]]:
+    """
+    (answer, docs, reasoning_trace) of a cache hit, emitting the same events as
+    a live answer (one retrieval event, then the whole answer as one token).
+    """
+    if on_event is not None:
+        on_event({
+            "type": "retrieval",
+            "docs": hit.docs,
+            "db_names": list(dict.fromkeys(
+                d.metadata.get("db_name") for d in hit.docs if d.metadata.get("db_name")
+            )),
+            "cache_hit": {
+                "similarity": hit.similarity,
+                "question": hit.question,
+                "age_s": hit.age_s,
+            },
+            **event_fields,
+        })
+        on_event({"type": "token", "text": hit.answer})
+    reasoning_trace = None
+    if show_reasoning:
+        reasoning_trace = f"**Answer cache**: {cache_hit_log(hit)}"
+        if hit.reasoning:
+            reasoning_trace += "\n\n" + hit.reasoning
+    return hit.answer, hit.docs, reasoning_trace
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent answer cache.")
+    defaults = RAGConfig()
+    parser.add_argument("--path", default=defaults.answer_cache_path)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Entries, scopes, answers served")
+    sub.add_parser("clear", help="Delete all answers")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"{args.path}: no answer cache yet.")
+        raise SystemExit(0)
+
+    cache = AnswerCache(args.path, max_entries=defaults.answer_cache_max_entries)
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    else:
+        n = cache.clear()
+        cache.vacuum()
+        print(f"Deleted {n} answer(s).")
+    cache.close()
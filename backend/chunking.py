@@ -0,0 +1,280 @@
+# backend/chunking.py
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from .config import RAGConfig
+
+# Role of this module:
+# Chunking stage between the document loader and the vector store build, and
+# the matching "parent-document" expansion at retrieval time.
+#
+# - Build time: every Document is split along its structure (paragraphs, then
+#   sentences, then token windows for what is still too long) into chunks of at
+#   most `chunk_tokens` tokens, with `overlap_tokens` of overlap. Chunks are cut
+#   from the original text, and carry parent id + character offsets in metadata.
+# - Query time: chunks are what gets matched; `expand_chunk_hits` then returns
+#   the deduplicated parent documents, or only the matched chunks plus their
+#   neighbours, rebuilt from the stored chunks.
+#
+# "Tokens" are whitespace-separated words: all-MiniLM-L6-v2 truncates at 256
+# word pieces, roughly 180-200 words of legal text.
+
+# Metadata keys written on every chunk
+PARENT_ID = "parent_id"
+CHUNK_INDEX = "chunk_index"
+CHUNK_COUNT = "chunk_count"
+CHAR_START = "char_start"
+CHAR_END = "char_end"
+_CHUNK_KEYS = (PARENT_ID, CHUNK_INDEX, CHUNK_COUNT, CHAR_START, CHAR_END)
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;:])\s+")
+_TOKEN_RE = re.compile(r"\S+")
+
+# Span of the original text: (start, end, n_tokens)
+_Span = Tuple[int, int, int]
+
+
+@dataclass(frozen=True)
+class ChunkingSpec:
+    chunk_tokens: int = 200
+    overlap_tokens: int = 40
+
+    def signature(self) -> str:
+        """Stored with a store's fingerprints: a different spec means re-chunking."""
+        return f"words:{self.chunk_tokens}:{self.overlap_tokens}"
+
+
+def chunking_spec_from_config(config: RAGConfig) -> Optional[ChunkingSpec]:
+    """ChunkingSpec of the config, or None when chunking is disabled."""
+    if not getattr(config, "chunking_enabled", False):
+        return None
+    return ChunkingSpec(
+        chunk_tokens=max(1, int(config.chunk_size_tokens)),
+        overlap_tokens=max(0, min(int(config.chunk_overlap_tokens), int(config.chunk_size_tokens) - 1)),
+    )
+
+
+def _count_tokens(text: str) -> int:
+    return len(_TOKEN_RE.findall(text))
+
+
+def _split(text: str, start: int, end: int, pattern: "re.Pattern[str]") -> List[Tuple[int, int]]:
+    """Sub-spans of text[start:end] separated by `pattern` (separators dropped)."""
+    spans: List[Tuple[int, int]] = []
+    pos = start
+    for m in pattern.finditer(text, start, end):
+        if m.start() > pos:
+            spans.append((pos, m.start()))
+        pos = m.end()
+    if pos < end:
+        spans.append((pos, end))
+    return spans
+
+
+def _token_windows(text: str, start: int, end: int, spec: ChunkingSpec) -> List[_Span]:
+    """Fixed windows of `chunk_tokens` tokens, overlapping by `overlap_tokens`."""
+    tokens = [(m.start(), m.end()) for m in _TOKEN_RE.finditer(text, start, end)]
+    if not tokens:
+        return []
+    step = max(1, spec.chunk_tokens - spec.overlap_tokens)
+    windows: List[_Span] = []
+    for i in range(0, len(tokens), step):
+        window = tokens[i:i + spec.chunk_tokens]
+        windows.append((window[0][0], window[-1][1], len(window)))
+        if i + spec.chunk_tokens >= len(tokens):
+            break
+    return windows
+
+
+def _units(text: str, spec: ChunkingSpec) -> List[_Span]:
+    """
+    Structural units of at most `chunk_tokens` tokens each: paragraphs, the
+    sentences of longer paragraphs, and token windows of longer sentences.
+    """
+    units: List[_Span] = []
+    for p_start, p_end in _split(text, 0, len(text), _PARAGRAPH_RE):
+        n = _count_tokens(text[p_start:p_end])
+        if n == 0:
+            continue
+        if n <= spec.chunk_tokens:
+            units.append((p_start, p_end, n))
+            continue
+        for s_start, s_end in _split(text, p_start, p_end, _SENTENCE_RE):
+            n = _count_tokens(text[s_start:s_end])
+            if n == 0:
+                continue
+            if n <= spec.chunk_tokens:
+                units.append((s_start, s_end, n))
+            else:
+                units.extend(_token_windows(text, s_start, s_end, spec))
+    return units
+
+
+def chunk_spans(text: str, spec: ChunkingSpec) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of the chunks of `text`."""
+    units = _units(text, spec)
+    if not units:
+        return []
+
+    chunks: List[Tuple[int, int]] = []
+    current: List[_Span] = []
+    size = 0
+    for unit in units:
+        if current and size + unit[2] > spec.chunk_tokens:
+            chunks.append((current[0][0], current[-1][1]))
+            # Carry trailing units over as overlap (units that are token windows
+            # of one long sentence already overlap each other)
+            carried: List[_Span] = []
+            carried_size = 0
+            for prev in reversed(current):
+                if prev[1] > unit[0] or carried_size + prev[2] > spec.overlap_tokens:
+                    break
+                if carried_size + prev[2] + unit[2] > spec.chunk_tokens:
+                    break
+                carried.insert(0, prev)
+                carried_size += prev[2]
+            current, size = carried, carried_size
+        current.append(unit)
+        size += unit[2]
+    chunks.append((current[0][0], current[-1][1]))
+    return chunks
+
+
+def _parent_id(doc: Document, ordinal: int) -> str:
+    source = str((doc.metadata or {}).get("source", ""))
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return f"{digest}-{ordinal}"
+
+
+def chunk_document(doc: Document, spec: ChunkingSpec, ordinal: int = 0) -> List[Document]:
+    """
+    Split one document. `ordinal` is its position within its source file, so
+    the parent id (hash of the source + ordinal) is stable across rebuilds.
+    """
+    text = doc.page_content
+    spans = chunk_spans(text, spec) or [(0, len(text))]
+    parent_id = _parent_id(doc, ordinal)
+    return [
+        Document(
+            page_content=text[start:end],
+            metadata={
+                **(doc.metadata or {}),
+                PARENT_ID: parent_id,
+                CHUNK_INDEX: i,
+                CHUNK_COUNT: len(spans),
+                CHAR_START: start,
+                CHAR_END: end,
+            },
+        )
+        for i, (start, end) in enumerate(spans)
+    ]
+
+
+def chunk_document_batches(
+    doc_batches: Iterable[List[Document]],
+    spec: ChunkingSpec,
+) -> Iterator[List[Document]]:
+    """Chunk a stream of Document batches (see `document_loader.iter_document_batches`)."""
+    ordinals: Dict[str, int] = {}
+    for batch in doc_batches:
+        out: List[Document] = []
+        for doc in batch:
+            source = str((doc.metadata or {}).get("source", ""))
+            ordinal = ordinals.get(source, 0)
+            ordinals[source] = ordinal + 1
+            out.extend(chunk_document(doc, spec, ordinal))
+        yield out
+
+
+# =====================================================================
+# Retrieval: chunk hits → parents / neighbours
+# =====================================================================
+def is_chunk(doc: Document) -> bool:
+    return PARENT_ID in (doc.metadata or {})
+
+
+def _chunks_of_parents(docstore: Any, parent_ids: List[str]) -> Dict[str, List[Document]]:
+    """All stored chunks of the given parents, from any LangChain docstore."""
+    if hasattr(docstore, "find_by_parent"):
+        return docstore.find_by_parent(parent_ids)
+    wanted = set(parent_ids)
+    found: Dict[str, List[Document]] = {}
+    for doc in getattr(docstore, "_dict", {}).values():
+        pid = (doc.metadata or {}).get(PARENT_ID)
+        if pid in wanted:
+            found.setdefault(pid, []).append(doc)
+    return found
+
+
+def _stitch(chunks: List[Document]) -> str:
+    """Rebuild text from chunks using their offsets (overlaps removed, gaps marked)."""
+    chunks = sorted(chunks, key=lambda d: d.metadata[CHAR_START])
+    parts: List[str] = []
+    covered = -1
+    for d in chunks:
+        start, end = d.metadata[CHAR_START], d.metadata[CHAR_END]
+        if end <= covered:
+            continue
+        if parts and start > covered:
+            parts.append(" … ")
+        parts.append(d.page_content[max(0, covered - start):])
+        covered = end
+    return "".join(parts)
+
+
+def expand_chunk_hits(
+    docstore: Any,
+    hits: List[Document],
+    mode: str = "neighbors",
+    window: int = 1,
+) -> List[Document]:
+    """
+    Turn ranked chunk hits into context documents, one per parent (ranked by
+    its best chunk):
+
+    - mode "parent"    → the whole parent document,
+    - mode "neighbors" → matched chunks ± `window` neighbours, stitched in order,
+    - mode "chunks"    → hits unchanged.
+
+    Documents that are not chunks (stores built without chunking) pass through.
+    """
+    if mode == "chunks" or not any(is_chunk(d) for d in hits):
+        return hits
+
+    order: List[Any] = []
+    matched: Dict[str, List[Document]] = {}
+    for d in hits:
+        if not is_chunk(d):
+            order.append(d)
+            continue
+        pid = d.metadata[PARENT_ID]
+        if pid not in matched:
+            matched[pid] = []
+            order.append(pid)
+        matched[pid].append(d)
+
+    stored = _chunks_of_parents(docstore, list(matched))
+    results: List[Document] = []
+    for item in order:
+        if isinstance(item, Document):
+            results.append(item)
+            continue
+        pid = item
+        chunks = stored.get(pid) or matched[pid]
+        hit_idx = sorted({d.metadata[CHUNK_INDEX] for d in matched[pid]})
+        if mode == "neighbors":
+            keep = {i + o for i in hit_idx for o in range(-window, window + 1)}
+            chunks = [d for d in chunks if d.metadata[CHUNK_INDEX] in keep]
+
+        meta = {k: v for k, v in matched[pid][0].metadata.items() if k not in _CHUNK_KEYS}
+        meta[PARENT_ID] = pid
+        meta["matched_chunks"] = hit_idx
+        results.append(Document(page_content=_stitch(chunks), metadata=meta))
+    return results
@@ -0,0 +1,173 @@
+# backend/civil_codes.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional, Tuple
+
+# Role of this module:
+# Parser / normalizer for civil code citations, used on both sides of a
+# `civil_codes_used` filter:
+#   - when a store is built, every document's citations are parsed into
+#     article intervals for the metadata index (backend/metadata_index.py),
+#   - at query time, the codes extracted by the LLM are parsed the same way,
+#     and a document matches if any of its intervals overlaps any query interval
+#     OF THE SAME ACT (a citation without an act prefix in the query matches
+#     that article in any act).
+#
+# Handles the forms found in the corpora and in extracted metadata:
+#   "Art. 720", "Art.720", "ART720", "Article 179", "720 c.c."   single article
+#   "Art. 768-bis", "Art. 279.a", "4a"                           suffixed article
+#   "Art. 51/2", "Art. 2 par. 3", "Art. 143, comma 1", "5 al. 2" paragraph
+#   "Art. 815-819", "Articles 611 to 615"                        range
+#   "Art. 1427 et seq.", "Art. 1427 ss.", "768-bis ff."          open range
+#   "Art. 592, 593, 595", "ART498, ART500"                       lists
+#   "Marriage and Family Relations Act: 58, 59"                  act prefix
+# Paragraphs are kept in the canonical key but matching is per article
+# ("al." is the Italian alinea, a paragraph; "al" without a dot is "to").
+# Law / decree numbers ("Law 151/1975", "D.Lgs. 28/2010") are not articles and
+# are skipped, and so are articles of other codes ("Art. 29 Cost.",
+# "Artt. 570 e 572 c.p.", "Art. 706 c.p.c.").
+
+# "et seq." covers the article and this many following ones
+ET_SEQ_SPAN = 10
+
+# Suffix ordinals: an article is encoded as article * _SLOTS + suffix ordinal,
+# so "768-bis" sorts between 768 and 769 and ranges include suffixed articles.
+_SLOTS = 16
+_LATIN_SUFFIXES = (
+    "bis", "ter", "quater", "quinquies", "sexies",
+    "septies", "octies", "novies", "decies",
+)
+_SUFFIX_ORDINAL = {s: i + 2 for i, s in enumerate(_LATIN_SUFFIXES)}
+
+_ARTICLE_WORD = r"(?:art(?:icles?|icolo|icoli|t)?\.?)"
+_SUFFIX = r"(?:[-.\s]?(?P<suffix>" + "|".join(_LATIN_SUFFIXES) + r")\b|\.?(?P<letter>[a-z])\b)"
+_PARAGRAPH = r"(?:\s*(?:/|,?\s*(?:par\.?|para\.?|paragraph|comma|co\.|al\.|§))\s*(?P<par>\d+))"
+_RANGE_END = r"(?:\s*(?:-|–|to|through|al(?!\.)|a)\s*" + _ARTICLE_WORD + r"?\s*(?P<end>\d+))"
+_ET_SEQ = r"(?P<seq>\s*(?:et\s*seq\.?|e\s*ss\.?|ss\.?|ff\.?|and\s+following|e\s+seguenti))"
+
+_REF_RE = re.compile(
+    r"(?<![\d])(?P<article>\d+)" + _SUFFIX + r"?" + _PARAGRAPH + r"?" + _RANGE_END + r"?" + _ET_SEQ + r"?",
+    re.IGNORECASE,
+)
+_ACT_RE = re.compile(r"^\s*(?P<act>[^:\d]{3,}?)\s*:\s*(?=\S)")
+# "number/year": a law or decree number, not "article/paragraph"
+_LAW_NUMBER_RE = re.compile(r"(?<![\d/])\d+\s*/\s*(?:18|19|20)\d{2}(?![\d/])")
+# Abbreviation of another code right after a reference (constitution, penal
+# code, civil / penal procedure codes): the reference is not a civil code article
+_OTHER_ACT_RE = re.compile(
+    r"\s*,?\s*(?:(?:della|of\s+the)\s+)?"
+    r"(?:cost(?:ituzione)?\b\.?|constitution\b|c\.\s*p\.(?:\s*[cp]\.)?|cod(?:ice)?\.?\s*(?:pen|proc)\w*)",
+    re.IGNORECASE,
+)
+# What may separate the references of one list ("Artt. 3, 29 e 30 Cost.")
+_LIST_SEP_RE = re.compile(r"[\s,;]*(?:(?:e|ed|and|&)\s+)?" + _ARTICLE_WORD + r"?\s*", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class CivilCodeRef:
+    """One cited article (or article range) of a civil code citation."""
+    article: int
+    suffix: str = ""                  # "bis", "ter", …, or a letter ("a")
+    paragraph: Optional[int] = None
+    end: Optional[int] = None         # inclusive range end (article number)
+    open_ended: bool = False          # "et seq."
+    act: str = ""                     # e.g. "marriage and family relations act"
+
+    def key(self) -> str:
+        """Canonical form: '720', '768-bis', '51/2', '815-819', '1427+'."""
+        text = str(self.article)
+        if self.suffix:
+            text += f"-{self.suffix}"
+        if self.paragraph is not None:
+            text += f"/{self.paragraph}"
+        if self.end is not None:
+            text += f"-{self.end}"
+        if self.open_ended:
+            text += "+"
+        return f"{self.act}: {text}" if self.act else text
+
+    def interval(self) -> Tuple[str, int, int]:
+        """(act, lo, hi): inclusive article interval in article * 16 + suffix ordinal units."""
+        lo = self.article * _SLOTS + _suffix_ordinal(self.suffix)
+        if self.open_ended:
+            return self.act, lo, (self.article + ET_SEQ_SPAN) * _SLOTS + _SLOTS - 1
+        if self.end is not None and self.end >= self.article:
+            return self.act, lo, self.end * _SLOTS + _SLOTS - 1
+        return self.act, lo, lo
+
+
+def _suffix_ordinal(suffix: str) -> int:
+    if not suffix:
+        return 0
+    if suffix in _SUFFIX_ORDINAL:
+        return _SUFFIX_ORDINAL[suffix]
+    return min(_SLOTS - 1, ord(suffix) - ord("a") + 1)
+
+
+def parse_civil_codes(value: Any) -> List[CivilCodeRef]:
+    """
+    Every article reference in a citation string (or list of strings).
+    Text without any article number (e.g. "Art. ART") gives [].
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        refs: List[CivilCodeRef] = []
+        for item in value:
+            refs.extend(parse_civil_codes(item))
+        return list(dict.fromkeys(refs))
+
+    text = str(value)
+    act = ""
+    m = _ACT_RE.match(text)
+    if m and not re.fullmatch(_ARTICLE_WORD, m.group("act").strip(), re.IGNORECASE):
+        act = re.sub(r"\s+", " ", m.group("act")).strip().casefold()
+        text = text[m.end():]
+    text = _LAW_NUMBER_RE.sub(" ", text)
+
+    refs: List[CivilCodeRef] = []
+    run: List[CivilCodeRef] = []  # references of the current list
+    last_end = 0
+    for m in _REF_RE.finditer(text):
+        if not _LIST_SEP_RE.fullmatch(text, last_end, m.start()):
+            refs.extend(run)
+            run = []
+        last_end = m.end()
+        suffix = (m.group("suffix") or m.group("letter") or "").lower()
+        end = int(m.group("end")) if m.group("end") else None
+        run.append(
+            CivilCodeRef(
+                article=int(m.group("article")),
+                suffix=suffix,
+                paragraph=int(m.group("par")) if m.group("par") else None,
+                end=end if end is not None and end > int(m.group("article")) else None,
+                open_ended=bool(m.group("seq")),
+                act=act,
+            )
+        )
+        if _OTHER_ACT_RE.match(text, m.end()):
+            # The whole list belongs to another code
+            run = []
+    refs.extend(run)
+    return list(dict.fromkeys(refs))
+
+
+def normalize_civil_codes(value: Any) -> List[str]:
+    """Canonical keys of every reference in `value` (see `CivilCodeRef.key`)."""
+    return [ref.key() for ref in parse_civil_codes(value)]
+
+
+def code_intervals(value: Any) -> List[Tuple[str, int, int]]:
+    """(act, lo, hi) article intervals cited by `value` (what filters match on)."""
+    return [ref.interval() for ref in parse_civil_codes(value)]
+
+
+def describe_codes(values: Iterable[Any]) -> str:
+    """'Art. 151 → 151; Art. 1427 et seq. → 1427+' (for logs)."""
+    parts = []
+    for v in values:
+        keys = normalize_civil_codes(v)
+        parts.append(f"{v} → {', '.join(keys) if keys else '(unparsed)'}")
+    return "; ".join(parts)
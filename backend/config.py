@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import List
+from typing import List, Optional
 
 # Role of this module:
 # All other backend modules read from one shared configuration object.
@@ -30,16 +30,48 @@ class RAGConfig:
     # "huggingface"  -> HuggingFaceEndpoint / ChatHuggingFace (needs HF token for private models)
     llm_provider: str = "openrouter"
     llm_model_name: str = "openai/gpt-4o-mini"
+    # OpenAI-compatible endpoint used by the "openrouter" provider
+    llm_base_url: str = "https://openrouter.ai/api/v1"
+    # Keep-alive HTTP connection pool shared by all LLM calls with the same settings
+    llm_pool_max_connections: int = 20
+    llm_pool_max_keepalive: int = 10
+    llm_pool_keepalive_expiry: float = 60.0
+    llm_request_timeout: float = 120.0
+    # Exact-match cache of LLM responses (backend/llm_cache.py) for the calls that
+    # opt in: retrieval decision, DB selection, law classification, metadata
+    # extraction, RAGAS judge prompts. In-memory LRU of llm_response_cache_size
+    # entries, persisted to llm_response_cache_path ("" = memory only).
+    use_llm_response_cache: bool = True
+    llm_response_cache_size: int = 1024
+    llm_response_cache_path: str = "vector_store/.cache/llm_responses.sqlite"
 
     # ---------------- Embeddings ----------------
     # "huggingface" -> HuggingFaceEmbeddings (any HF model or local path)
     # "openrouter"  -> OpenAIEmbeddings (OpenRouter OpenAI-compatible API)
     embedding_provider: str = "huggingface"
     embedding_model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Device for local (HF) embedding models and whether vectors are L2-normalized.
+    # Together with provider + model name these key the shared embedding registry.
+    embedding_device: str = "cpu"
+    normalize_embeddings: bool = True
+    # Vector DB builds: texts per forward pass, and number of sentence-transformers
+    # worker processes (1 = embed in the app process; HF models only).
+    embedding_batch_size: int = 64
+    embedding_build_workers: int = 1
+    # Persistent document-vector cache shared by builds and the reranker fallback,
+    # keyed by (model, normalize flag, sha256(text)); LRU-evicted above max_mb.
+    use_embedding_cache: bool = True
+    embedding_cache_path: str = "vector_store/.cache/embeddings.sqlite"
+    embedding_cache_max_mb: int = 1024
 
     # ---------------- Data (JSON corpus) ----------------
     # List of folders where JSON corpus lives
     json_folders: List[str] = field(default_factory=list)
+    # Vector DB Builder: split documents into chunks before embedding
+    # (paragraphs → sentences → word windows; see backend/chunking.py)
+    chunking_enabled: bool = True
+    chunk_size_tokens: int = 200
+    chunk_overlap_tokens: int = 40
 
     # ---------------- Vector stores (paths) ----------------
     # Root/base folder under which all FAISS vector DBs will be created.
@@ -59,11 +91,79 @@ class RAGConfig:
     # Optional: multiple DBs (multi-DB mode)
     # Example: ["vector_store/divorce_db", "vector_store/succession_db"]
     vector_store_dirs: List[str] = field(default_factory=list)
+    # Memory budget (MB) of the in-process cache of opened vector stores (LRU)
+    vector_store_cache_budget_mb: int = 2048
+    # Open stores that only have the legacy pickled docstore (index.pkl). Unpickling
+    # can run arbitrary code: enable only for stores you built yourself, or migrate
+    # them with `python -m backend.vector_store --convert <path>`.
+    allow_legacy_pickle_stores: bool = False
+    # FAISS index type of built stores (backend/index_spec.py):
+    #   "flat" (exact) | "ivf_flat" | "ivf_pq" | "hnsw" | "sq8"
+    # nlist / PQ sub-quantizers of 0 are derived from the number of vectors.
+    index_type: str = "flat"
+    index_nlist: int = 0
+    index_pq_m: int = 0
+    index_hnsw_m: int = 32
+    # Query time: IVF cells searched / HNSW candidate list size (recall vs latency)
+    index_nprobe: int = 8
+    index_ef_search: int = 64
 
     # ---------------- Retrieval ----------------
     top_k: int = 5
-    # Reserved for future reranking strategies; currently not used in the pipeline.
+    # Second-stage cross-encoder reranking of the retrieved candidates
+    # (backend/reranker.py), in every pipeline
     use_rerank: bool = False
+    rerank_model_name: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    rerank_device: str = "cpu"
+    # Tokens of (question + document) the cross-encoder reads
+    rerank_max_length: int = 256
+    rerank_batch_size: int = 16
+    # Stop scoring candidates once this many ms are spent (0 = no budget);
+    # unscored candidates keep their first-stage order
+    rerank_budget_ms: float = 1500.0
+    # Cached (question, document) scores
+    rerank_cache_size: int = 4096
+    # Reuse query vectors across requests (process-wide LRU). Within one request
+    # the question is always embedded only once.
+    use_query_embedding_cache: bool = True
+    # What chunk hits of chunked stores turn into in the prompt:
+    #   "chunks" (as matched) | "neighbors" (± window chunks) | "parent" (whole document)
+    chunk_retrieval_mode: str = "neighbors"
+    chunk_neighbor_window: int = 1
+    # "dense"  -> FAISS similarity only
+    # "fusion" -> FAISS + BM25 lexical index of each store, reciprocal rank fusion
+    #             (exact article / case numbers and legal terms)
+    retrieval_mode: str = "dense"
+    # RRF constant: score = sum of 1 / (rrf_k + rank) over the dense and lexical rankings
+    rrf_k: int = 60
+    # Thread pool size for searching several vector DBs in parallel
+    retrieval_max_workers: int = 4
+
+    # ---------------- Local router ----------------
+    # Decide "retrieval needed?" and "which DBs?" locally (backend/router.py):
+    # cosine of the question to each DB's manifest centroids + keyword priors.
+    # USE retrieval when the best score (similarity + keyword boost) reaches
+    # router_min_similarity, NO retrieval below router_skip_similarity whatever
+    # the keywords; DBs within router_margin of the best score are selected. Anything in between falls back to the LLM calls.
+    use_local_router: bool = True
+    router_min_similarity: float = 0.35
+    router_skip_similarity: float = 0.15
+    router_margin: float = 0.05
+    router_keyword_boost: float = 0.1
+
+    # ---------------- Answer cache ----------------
+    # Semantic cache of final answers (backend/answer_cache.py): a question at least
+    # answer_cache_threshold cosine-similar to an earlier one asked with the same
+    # LLM / embedding model / DBs (and DB versions) / top_k / agentic mode gets the
+    # stored answer without retrieval or LLM calls. Entries expire after ttl_s;
+    # above max_entries the least recently used ones are evicted.
+    # Opt-in: the file is shared by every session, and questions differing only
+    # by a negation or a jurisdiction can be that similar.
+    use_answer_cache: bool = False
+    answer_cache_path: str = "vector_store/.cache/answers.sqlite"
+    answer_cache_threshold: float = 0.95
+    answer_cache_ttl_s: float = 7 * 24 * 3600
+    answer_cache_max_entries: int = 2000
 
     # ---------------- Agentic behavior ----------------
     # agentic_mode:
@@ -71,6 +171,17 @@ class RAGConfig:
     #   - "react"         -> ReAct-style agentic RAG (Thought / Action / Observation)
     #   - "hybrid_legal"  -> hybrid legal RAG (metadata extraction + metadata-aware vector search)
     agentic_mode: str = "standard_rag"
+    # Hybrid legal RAG only — how 'law' classification and metadata extraction run:
+    #   - "sequential" -> classify, then extract (original behavior)
+    #   - "parallel"   -> both at once + speculative 'law'-only retrieval
+    #   - "fused"      -> one LLM call returns 'law' and the other fields
+    hybrid_metadata_mode: str = "sequential"
 
     # Multi-agent supervisor switch (used only in rag_pipeline for multi-DB agent routing)
     use_multiagent: bool = False
+    # Sub-agents run concurrently: at most this many at a time, each cancelled
+    # after subagent_timeout_s seconds (None = no timeout). Their threaded
+    # retrieval checks the same deadline between steps; a blocking call already
+    # running (one search, one reranker batch) finishes in the background.
+    max_concurrent_agents: int = 4
+    subagent_timeout_s: Optional[float] = 120.0
@@ -0,0 +1,246 @@
+# backend/docstore.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+from langchain_core.documents import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+# Role of this module:
+# SQLite-backed docstore for the FAISS vector stores. Documents are plain
+# JSON rows loaded lazily by id, so opening a store reads no document at all
+# and nothing is ever unpickled (unlike the legacy `index.pkl` layout).
+
+DOCSTORE_FILENAME = "docstore.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    pos          INTEGER PRIMARY KEY,   -- position of the vector in index.faiss
+    doc_id       TEXT NOT NULL UNIQUE,  -- LangChain docstore id
+    page_content TEXT NOT NULL,
+    metadata     TEXT NOT NULL          -- JSON object
+);
+-- Chunks of one parent document (see backend/chunking.py)
+CREATE INDEX IF NOT EXISTS documents_parent_id
+    ON documents (json_extract(metadata, '$.parent_id'));
+-- 'index_fingerprint': fingerprint of the index.faiss these positions belong to
+CREATE TABLE IF NOT EXISTS store_meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _doc_to_row(pos: int, doc_id: str, doc: Document) -> tuple:
+    return (
+        int(pos),
+        str(doc_id),
+        doc.page_content,
+        json.dumps(doc.metadata or {}, ensure_ascii=False, default=str),
+    )
+
+
+def _row_to_doc(doc_id: str, page_content: str, metadata: str) -> Document:
+    return Document(id=doc_id, page_content=page_content, metadata=json.loads(metadata))
+
+
+def write_docstore(
+    path: str,
+    index_to_docstore_id: Dict[int, str],
+    docstore: Docstore,
+    index_fingerprint: Optional[str] = None,
+) -> None:
+    """
+    Write a complete docstore file atomically (temp file + rename), so readers
+    never observe a half-written store. Positions are taken from
+    `index_to_docstore_id`, documents from any LangChain docstore.
+    `index_fingerprint` records which index.faiss the positions belong to.
+    """
+    def _lookup(doc_id: str) -> Document:
+        doc = docstore.search(doc_id)
+        if not isinstance(doc, Document):
+            raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+        return doc
+
+    tmp_path = path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(_SCHEMA)
+        conn.executemany(
+            "INSERT INTO documents (pos, doc_id, page_content, metadata) VALUES (?, ?, ?, ?)",
+            (
+                _doc_to_row(pos, doc_id, _lookup(doc_id))
+                for pos, doc_id in sorted(index_to_docstore_id.items())
+            ),
+        )
+        if index_fingerprint is not None:
+            conn.execute(
+                "INSERT INTO store_meta (key, value) VALUES ('index_fingerprint', ?)",
+                (index_fingerprint,),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """
+    Docstore reading documents from `docstore.sqlite` on demand.
+
+    Drop-in replacement for LangChain's InMemoryDocstore (`search`, `add`,
+    `delete`), plus `mget` and `iter_documents` helpers. One connection is shared
+    by all threads (guarded by a lock); lookups are primary-key reads.
+    """
+
+    def __init__(self, path: str, read_only: bool = True):
+        self.path = path
+        self.read_only = read_only
+        if read_only:
+            uri = f"file:{os.path.abspath(path)}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    # ---------------- Docstore interface ----------------
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT doc_id, page_content, metadata FROM documents WHERE doc_id = ?",
+                (search,),
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return _row_to_doc(*row)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        """
+        Add documents. Positions continue after the current last one, in the
+        order given (same order FAISS.add_* appends vectors to the index).
+        After deletes, positions are only re-packed when the store is saved
+        again (see `vector_store.save_vector_store`).
+        """
+        if self.read_only:
+            raise ValueError(f"Docstore {self.path} is opened read-only.")
+        with self._lock:
+            existing = self._existing_ids(list(texts))
+            if existing:
+                raise ValueError(f"Tried to add ids that already exist: {existing}")
+            (next_pos,) = self._conn.execute(
+                "SELECT COALESCE(MAX(pos) + 1, 0) FROM documents"
+            ).fetchone()
+            self._conn.executemany(
+                "INSERT INTO documents (pos, doc_id, page_content, metadata) VALUES (?, ?, ?, ?)",
+                (
+                    _doc_to_row(next_pos + i, doc_id, doc)
+                    for i, (doc_id, doc) in enumerate(texts.items())
+                ),
+            )
+            self._conn.commit()
+
+    def delete(self, ids: List) -> None:
+        if self.read_only:
+            raise ValueError(f"Docstore {self.path} is opened read-only.")
+        with self._lock:
+            if not self._existing_ids(ids):
+                raise ValueError(f"Tried to delete ids that does not  exist: {ids}")
+            self._conn.executemany(
+                "DELETE FROM documents WHERE doc_id = ?", ((i,) for i in ids)
+            )
+            self._conn.commit()
+
+    # ---------------- Extra helpers ----------------
+    def mget(self, ids: Sequence[str]) -> List[Optional[Document]]:
+        """Batch lookup; returns None for unknown ids, in the order of `ids`."""
+        if not ids:
+            return []
+        found: Dict[str, Document] = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = list(ids[start:start + 500])
+                marks = ",".join("?" * len(chunk))
+                for doc_id, content, meta in self._conn.execute(
+                    f"SELECT doc_id, page_content, metadata FROM documents "
+                    f"WHERE doc_id IN ({marks})",
+                    chunk,
+                ):
+                    found[doc_id] = _row_to_doc(doc_id, content, meta)
+        return [found.get(i) for i in ids]
+
+    def find_by_parent(self, parent_ids: Sequence[str]) -> Dict[str, List[Document]]:
+        """{parent id -> its stored chunks} (metadata['parent_id'], indexed)."""
+        found: Dict[str, List[Document]] = {}
+        with self._lock:
+            for start in range(0, len(parent_ids), 500):
+                chunk = list(parent_ids[start:start + 500])
+                marks = ",".join("?" * len(chunk))
+                for doc_id, content, meta in self._conn.execute(
+                    f"SELECT doc_id, page_content, metadata FROM documents "
+                    f"WHERE json_extract(metadata, '$.parent_id') IN ({marks})",
+                    chunk,
+                ):
+                    doc = _row_to_doc(doc_id, content, meta)
+                    found.setdefault(doc.metadata["parent_id"], []).append(doc)
+        return found
+
+    def index_fingerprint(self) -> Optional[str]:
+        """Fingerprint of the index.faiss this docstore was written for (None if not recorded)."""
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT value FROM store_meta WHERE key = 'index_fingerprint'"
+                ).fetchone()
+            except sqlite3.OperationalError:  # written before store_meta existed
+                return None
+        return row[0] if row else None
+
+    def index_to_docstore_id(self) -> Dict[int, str]:
+        """{FAISS position -> doc id}; only ids are read, not the documents."""
+        with self._lock:
+            return {
+                int(pos): doc_id
+                for pos, doc_id in self._conn.execute("SELECT pos, doc_id FROM documents")
+            }
+
+    def iter_documents(self, limit: Optional[int] = None) -> Iterator[Document]:
+        """Documents in index order (optionally only the first `limit`)."""
+        sql = "SELECT doc_id, page_content, metadata FROM documents ORDER BY pos"
+        params: tuple = ()
+        if limit is not None:
+            sql += " LIMIT ?"
+            params = (int(limit),)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        for doc_id, content, meta in rows:
+            yield _row_to_doc(doc_id, content, meta)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (n,) = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()
+        return int(n)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _existing_ids(self, ids: Sequence[Any]) -> List[str]:
+        existing: List[str] = []
+        for start in range(0, len(ids), 500):
+            chunk = [str(i) for i in ids[start:start + 500]]
+            marks = ",".join("?" * len(chunk))
+            existing.extend(
+                r[0]
+                for r in self._conn.execute(
+                    f"SELECT doc_id FROM documents WHERE doc_id IN ({marks})", chunk
+                )
+            )
+        return existing
@@ -1,13 +1,34 @@
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Any, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from langchain_core.documents import Document
 
+try:  # Fast JSON parser (optional); falls back to the standard library
+    import orjson
+
+    def _json_loads(raw: bytes) -> Any:
+        return orjson.loads(raw)
+
+    JSON_PARSER = "orjson"
+except ImportError:  # pragma: no cover - depends on the environment
+    def _json_loads(raw: bytes) -> Any:
+        return json.loads(raw)
+
+    JSON_PARSER = "json"
+
 # Role of this module:
-#This is the ingestion layer: it converts your raw JSON legal cases into 
+#This is the ingestion layer: it converts your raw JSON legal cases into
 # LangChain Documents that can then be embedded and stored.
 # Used mainly by vector_store.py and the Vector DB Builder page.
+#
+# Files are parsed in a process pool and handed out as a stream of Document
+# batches (`iter_document_batches`), so embedding can start while parsing is
+# still running. Problems are collected in an IngestionReport instead of printed.
 
 def _extract_docs_from_json_object(obj: Any, source: str) -> List[Document]:
     """
@@ -55,22 +76,155 @@ def _extract_docs_from_json_object(obj: Any, source: str) -> List[Document]:
     return docs
 
 
-def load_documents_from_folders(folders: List[str]) -> List[Document]:
-    all_docs: List[Document] = []
-
+# =====================================================================
+# Error report
+# =====================================================================
+@dataclass
+class IngestionError:
+    path: str
+    kind: str      # "missing_folder" | "read_error" | "parse_error" | "no_documents"
+    message: str
+
+
+@dataclass
+class IngestionReport:
+    """Filled while `iter_document_batches` runs (safe to read in between batches)."""
+    json_parser: str = JSON_PARSER
+    files_total: int = 0
+    files_done: int = 0
+    files_failed: int = 0
+    documents: int = 0
+    chunks: int = 0  # documents handed to the index build (after chunking, if any)
+    batches: int = 0
+    elapsed_s: float = 0.0
+    errors: List[IngestionError] = field(default_factory=list)
+
+    @property
+    def progress(self) -> float:
+        return self.files_done / self.files_total if self.files_total else 1.0
+
+    def add_error(self, path: str, kind: str, message: str) -> None:
+        self.errors.append(IngestionError(path=path, kind=kind, message=message))
+
+    def as_records(self) -> List[Dict[str, str]]:
+        return [asdict(e) for e in self.errors]
+
+    def summary(self) -> str:
+        return (
+            f"{self.documents} document(s) from {self.files_done - self.files_failed}/"
+            f"{self.files_total} file(s) in {self.elapsed_s:.2f}s "
+            f"({self.batches} batch(es), parser={self.json_parser}); "
+            f"{len(self.errors)} problem(s)"
+        )
+
+
+# =====================================================================
+# Parsing (runs in worker processes)
+# =====================================================================
+def _parse_json_file(path: str) -> Tuple[List[Document], Optional[Tuple[str, str]]]:
+    """Parse one file. Returns (docs, (error kind, message) or None)."""
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+    except OSError as e:
+        return [], ("read_error", str(e))
+    try:
+        data = _json_loads(raw)
+    except Exception as e:
+        return [], ("parse_error", f"{type(e).__name__}: {e}")
+
+    docs = _extract_docs_from_json_object(data, source=path)
+    if not docs:
+        return [], ("no_documents", "no item with a 'content'/'text'/'corpus' field")
+    return docs, None
+
+
+def list_json_files(
+    folders: List[str],
+    report: Optional[IngestionReport] = None,
+) -> List[str]:
+    """Every *.json file under `folders`, sorted per folder (missing folders → report)."""
+    files: List[str] = []
     for folder in folders:
         folder_path = Path(folder)
         if not folder_path.exists():
-            print(f"[document_loader] Folder does not exist: {folder_path}")
+            if report is not None:
+                report.add_error(str(folder_path), "missing_folder", "Folder does not exist")
             continue
-
-        for json_file in folder_path.rglob("*.json"):
-            try:
-                with open(json_file, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                docs = _extract_docs_from_json_object(data, source=str(json_file))
-                all_docs.extend(docs)
-            except Exception as e:
-                print(f"[document_loader] Error loading {json_file}: {e}")
-
+        files.extend(str(p) for p in sorted(folder_path.rglob("*.json")))
+    return files
+
+
+def iter_document_batches(
+    folders: List[str],
+    batch_size: int = 256,
+    max_workers: Optional[int] = None,
+    corpus_name: Optional[str] = None,
+    report: Optional[IngestionReport] = None,
+    files: Optional[List[str]] = None,
+) -> Iterator[List[Document]]:
+    """
+    Stream the Documents of every *.json file under `folders` in batches.
+
+    - Files are parsed in a process pool (`max_workers`, default: CPU count);
+      with max_workers=1 or a handful of files they are parsed in-process.
+    - Batches come out in deterministic file order while later files are still
+      being parsed, so callers can embed batch N while batch N+1 is parsed.
+    - corpus_name given → stored as metadata['corpus'] on every document.
+    - Per-file problems go to `report` (an IngestionReport); nothing is printed.
+    - files given → parse exactly these files (`folders` is not scanned), e.g.
+      only the files that changed since the last build.
+    """
+    report = report if report is not None else IngestionReport()
+    t0 = time.perf_counter()
+    if files is None:
+        files = list_json_files(folders, report)
+    report.files_total = len(files)
+
+    workers = max_workers or os.cpu_count() or 1
+    pool: Optional[ProcessPoolExecutor] = None
+    if workers > 1 and len(files) > 64:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(
+            _parse_json_file, files, chunksize=max(1, len(files) // (workers * 8))
+        )
+    else:
+        results = map(_parse_json_file, files)
+
+    batch: List[Document] = []
+    try:
+        for path, (docs, error) in zip(files, results):
+            report.files_done += 1
+            if error is not None:
+                report.files_failed += 1
+                report.add_error(path, *error)
+                continue
+            if corpus_name is not None:
+                for d in docs:
+                    d.metadata["corpus"] = corpus_name
+            batch.extend(docs)
+            while len(batch) >= batch_size:
+                out, batch = batch[:batch_size], batch[batch_size:]
+                report.documents += len(out)
+                report.batches += 1
+                report.elapsed_s = time.perf_counter() - t0
+                yield out
+        if batch:
+            report.documents += len(batch)
+            report.batches += 1
+            yield batch
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        report.elapsed_s = time.perf_counter() - t0
+
+
+def load_documents_from_folders(
+    folders: List[str],
+    report: Optional[IngestionReport] = None,
+) -> List[Document]:
+    """All documents at once (thin wrapper over `iter_document_batches`)."""
+    all_docs: List[Document] = []
+    for batch in iter_document_batches(folders, report=report):
+        all_docs.extend(batch)
     return all_docs
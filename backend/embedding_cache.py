@@ -0,0 +1,301 @@
+# backend/embedding_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .config import RAGConfig
+from .embeddings import embedding_model_id
+
+# Role of this module:
+# Persistent, size-bounded cache of document vectors shared by every build and
+# by the similarity reranker's re-embedding fallback. Rows are keyed by
+# (embedding model id incl. normalize flag, sha256(text)), so building several
+# stores from overlapping folders embeds each text once, and a rebuild after a
+# crash or a model switch-back costs no embedding at all.
+#
+# Inspect / prune from a shell:
+#   python -m backend.embedding_cache stats
+#   python -m backend.embedding_cache prune --max-mb 256
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model      TEXT    NOT NULL,   -- embeddings.embedding_model_id(...)
+    text_hash  TEXT    NOT NULL,   -- sha256 of the text
+    dim        INTEGER NOT NULL,
+    vector     BLOB    NOT NULL,   -- float32, little endian
+    last_used  REAL    NOT NULL,
+    PRIMARY KEY (model, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+# Eviction brings the cache down to this fraction of its budget, so it does
+# not run again on the very next insert.
+_EVICT_TO = 0.9
+# Approximate bytes per row besides the vector (key, hash, index entry)
+_ROW_OVERHEAD = 160
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    SQLite-backed {(model id, sha256(text)) -> float32 vector} store.
+
+    - `max_mb` bounds the stored data (vectors + per-row overhead); least
+      recently used vectors are evicted first (checked after every insert).
+    - One connection shared by all threads (guarded by a lock); WAL mode so a
+      builder process and the app can use the same file.
+    """
+
+    def __init__(self, path: str, max_mb: float = 1024):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._bytes = self._live_bytes()
+
+    # ---------------- Lookups ----------------
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for `texts` (None for misses), in order."""
+        hashes = [text_hash(t) for t in texts]
+        found: Dict[str, np.ndarray] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), 500):
+                chunk = list(dict.fromkeys(hashes[start:start + 500]))
+                marks = ",".join("?" * len(chunk))
+                for h, blob in self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({marks})",
+                    [model, *chunk],
+                ):
+                    found[h] = np.frombuffer(blob, dtype="<f4")
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    ((now, model, h) for h in found),
+                )
+                self._conn.commit()
+            out = [found.get(h) for h in hashes]
+            n_hits = sum(v is not None for v in out)
+            self.hits += n_hits
+            self.misses += len(out) - n_hits
+        return out
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype="<f4")
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    (model, text_hash(t), int(v.shape[0]), v.tobytes(), now)
+                    for t, v in zip(texts, vectors)
+                ),
+            )
+            self._conn.commit()
+            # Running estimate; recounted exactly only when it crosses the budget
+            self._bytes += sum(v.nbytes + _ROW_OVERHEAD for v in vectors)
+            if self._bytes > self.max_bytes:
+                self._bytes = self._live_bytes()
+                if self._bytes > self.max_bytes:
+                    self._evict(int(self.max_bytes * _EVICT_TO))
+                    self._bytes = self._live_bytes()
+
+    # ---------------- Maintenance ----------------
+    def _live_bytes(self) -> int:
+        # Caller holds the lock. Vector bytes + per-row key/overhead estimate.
+        (n, dims) = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(dim), 0) FROM embeddings"
+        ).fetchone()
+        return int(dims) * 4 + int(n) * _ROW_OVERHEAD
+
+    def _evict(self, target_bytes: int, model: Optional[str] = None) -> int:
+        # Caller holds the lock. Deletes least recently used rows until under target.
+        excess = self._live_bytes() - target_bytes
+        if excess <= 0:
+            return 0
+        where, params = ("WHERE model = ?", [model]) if model else ("", [])
+        victims = []
+        for m, h, dim in self._conn.execute(
+            f"SELECT model, text_hash, dim FROM embeddings {where} ORDER BY last_used", params
+        ):
+            victims.append((m, h))
+            excess -= dim * 4 + _ROW_OVERHEAD
+            if excess <= 0:
+                break
+        self._conn.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND text_hash = ?", victims
+        )
+        self._conn.commit()
+        return len(victims)
+
+    def prune(self, max_mb: Optional[float] = None, model: Optional[str] = None) -> int:
+        """Evict least recently used vectors down to `max_mb` (default: the budget)."""
+        target = self.max_bytes if max_mb is None else int(max_mb * 1024 * 1024)
+        with self._lock:
+            n = self._evict(target, model=model)
+            self._bytes = self._live_bytes()
+            return n
+
+    def clear(self, model: Optional[str] = None) -> int:
+        """Delete every vector (of one model if given). Returns rows deleted."""
+        with self._lock:
+            if model:
+                cur = self._conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+            else:
+                cur = self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._bytes = self._live_bytes()
+            return cur.rowcount
+
+    def vacuum(self) -> None:
+        """Give freed pages back to the file system."""
+        with self._lock:
+            self._conn.execute("VACUUM")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            models = [
+                {"model": m, "vectors": int(n), "dim": int(d), "last_used": float(t)}
+                for m, n, d, t in self._conn.execute(
+                    "SELECT model, COUNT(*), MAX(dim), MAX(last_used) "
+                    "FROM embeddings GROUP BY model ORDER BY model"
+                )
+            ]
+            live = self._live_bytes()
+        return {
+            "path": self.path,
+            "size_mb": round(live / (1024 * 1024), 2),
+            "max_mb": round(self.max_bytes / (1024 * 1024), 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "models": models,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# =====================================================================
+# Process-wide cache
+# =====================================================================
+_CACHES: Dict[str, EmbeddingCache] = {}
+_DEFAULT_CACHE: Optional[EmbeddingCache] = None
+_CACHES_LOCK = threading.Lock()
+
+
+def get_embedding_cache(path: str, max_mb: float = 1024) -> EmbeddingCache:
+    """One shared EmbeddingCache per file (the budget is updated on reuse)."""
+    key = os.path.realpath(os.path.abspath(path))
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = EmbeddingCache(path, max_mb=max_mb)
+        else:
+            cache.max_bytes = int(max_mb * 1024 * 1024)
+        return cache
+
+
+def configure_embedding_cache(config: RAGConfig) -> Optional[EmbeddingCache]:
+    """Enable / disable the process-wide default cache from config."""
+    global _DEFAULT_CACHE
+    cache = None
+    if getattr(config, "use_embedding_cache", True):
+        cache = get_embedding_cache(config.embedding_cache_path, config.embedding_cache_max_mb)
+    with _CACHES_LOCK:
+        _DEFAULT_CACHE = cache
+    return cache
+
+
+def get_default_embedding_cache() -> Optional[EmbeddingCache]:
+    return _DEFAULT_CACHE
+
+
+def embed_documents_cached(
+    embedding_model: Embeddings,
+    texts: Sequence[str],
+    cache: Optional[EmbeddingCache] = None,
+    embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None,
+) -> np.ndarray:
+    """
+    float32 matrix of document vectors, embedding only texts missing from the
+    cache (`cache` or the process default; with neither this is a plain
+    `embed_documents`). `embed_fn` replaces `embed_documents` for the misses.
+    """
+    cache = cache if cache is not None else _DEFAULT_CACHE
+    embed_fn = embed_fn or (
+        lambda batch: np.asarray(embedding_model.embed_documents(batch), dtype=np.float32)
+    )
+    texts = list(texts)
+    if cache is None or not texts:
+        return np.asarray(embed_fn(texts), dtype=np.float32)
+
+    model = embedding_model_id(embedding_model)
+    cached = cache.get_many(model, texts)
+    missing = [i for i, v in enumerate(cached) if v is None]
+    if not missing:
+        return np.vstack(cached).astype(np.float32, copy=False)
+
+    # Embed each distinct missing text once
+    unique = list(dict.fromkeys(texts[i] for i in missing))
+    fresh = np.asarray(embed_fn(unique), dtype=np.float32)
+    cache.put_many(model, unique, fresh)
+    by_text = dict(zip(unique, fresh))
+
+    vectors = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+    for i, v in enumerate(cached):
+        vectors[i] = v if v is not None else by_text[texts[i]]
+    return vectors
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Inspect or prune the persistent embedding cache.")
+    defaults = RAGConfig()
+    parser.add_argument("--path", default=defaults.embedding_cache_path)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Size, vectors per model")
+    p_prune = sub.add_parser("prune", help="Evict least recently used vectors")
+    p_prune.add_argument("--max-mb", type=float, required=True)
+    p_prune.add_argument("--model", default=None, help="only evict vectors of this model id")
+    p_clear = sub.add_parser("clear", help="Delete all vectors")
+    p_clear.add_argument("--model", default=None, help="only delete vectors of this model id")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"{args.path}: no embedding cache yet.")
+        raise SystemExit(0)
+
+    cache = EmbeddingCache(args.path, max_mb=defaults.embedding_cache_max_mb)
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    elif args.command == "prune":
+        n = cache.prune(args.max_mb, model=args.model)
+        cache.vacuum()
+        print(f"Evicted {n} vector(s); size now {cache.stats()['size_mb']} MB.")
+    else:
+        n = cache.clear(args.model)
+        cache.vacuum()
+        print(f"Deleted {n} vector(s).")
+    cache.close()
@@ -1,21 +1,72 @@
 from langchain_core.embeddings import Embeddings
+import inspect
 import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
 
 from langchain_openai import OpenAIEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 
 from .config import RAGConfig
 
+# Role of this module:
+# Builds the embedding model used by every backend path and keeps ONE shared
+# instance per (provider, model name, device, normalize flag) for the whole
+# process, so chat turns and the Vector DB Builder never reload the weights.
+# `BatchEmbedder` is the build-time path: length-sorted batches, optionally
+# spread over a sentence-transformers multi-process pool.
 
-def get_embedding_model(config: RAGConfig) -> Embeddings:
+
+# (provider, model_name, device, normalize_embeddings)
+EmbeddingKey = Tuple[str, str, str, bool]
+
+
+@dataclass
+class _RegistryEntry:
+    model: Embeddings
+    refcount: int = 0
+    load_seconds: float = 0.0
+    loaded_at: float = 0.0
+    warmed_up: bool = False
+
+
+# Process-wide registry: {EmbeddingKey -> _RegistryEntry}
+_EMBEDDING_REGISTRY: Dict[EmbeddingKey, _RegistryEntry] = {}
+# Reverse lookup {id(model) -> EmbeddingKey}, used to key cached query vectors.
+_MODEL_KEYS: Dict[int, EmbeddingKey] = {}
+# Guards the dicts only; never held while a model loads.
+_REGISTRY_LOCK = threading.RLock()
+# {EmbeddingKey -> lock held while that model loads}: two threads never load the
+# same weights twice, and lookups of other (loaded) models are not blocked.
+_LOAD_LOCKS: Dict[EmbeddingKey, threading.Lock] = {}
+
+
+def embedding_registry_key(config: RAGConfig) -> EmbeddingKey:
+    provider = config.embedding_provider
+    if provider == "openai":
+        provider = "openrouter"
+    return (
+        provider,
+        config.embedding_model_name,
+        getattr(config, "embedding_device", "cpu"),
+        bool(getattr(config, "normalize_embeddings", True)),
+    )
+
+
+def _build_embedding_model(config: RAGConfig) -> Embeddings:
     """
-    Returns a LangChain Embeddings object based on config.
+    Returns a NEW LangChain Embeddings object based on config.
 
     - embedding_provider == "openrouter":
         Uses OpenAIEmbeddings via OpenRouter (OpenAI-compatible API).
 
     - embedding_provider == "huggingface":
-        Uses HuggingFaceEmbeddings with device forced to CPU to avoid
+        Uses HuggingFaceEmbeddings with device forced to CPU (by default) to avoid
         issues like "Cannot copy out of meta tensor; no data!" on some setups.
     """
     if config.embedding_provider in {"openrouter", "openai"}:
@@ -31,6 +82,410 @@ def get_embedding_model(config: RAGConfig) -> Embeddings:
     # Default: Hugging Face embeddings on CPU
     return HuggingFaceEmbeddings(
         model_name=config.embedding_model_name,
-        model_kwargs={"device": "cpu"},           # 🔴 force CPU
-        encode_kwargs={"normalize_embeddings": True}, # 🔴 normalize embeddings
+        model_kwargs={"device": getattr(config, "embedding_device", "cpu")},  # 🔴 force CPU
+        encode_kwargs={
+            "normalize_embeddings": bool(getattr(config, "normalize_embeddings", True))
+        },  # 🔴 normalize embeddings
     )
+
+
+def _get_or_create_entry(config: RAGConfig) -> _RegistryEntry:
+    key = embedding_registry_key(config)
+    with _REGISTRY_LOCK:
+        entry = _EMBEDDING_REGISTRY.get(key)
+        if entry is not None:
+            return entry
+        load_lock = _LOAD_LOCKS.setdefault(key, threading.Lock())
+
+    with load_lock:
+        # Another thread may have loaded it while we waited
+        with _REGISTRY_LOCK:
+            entry = _EMBEDDING_REGISTRY.get(key)
+            if entry is not None:
+                return entry
+
+        t0 = time.perf_counter()
+        model = _build_embedding_model(config)
+        entry = _RegistryEntry(
+            model=model,
+            load_seconds=time.perf_counter() - t0,
+            loaded_at=time.time(),
+        )
+        with _REGISTRY_LOCK:
+            _EMBEDDING_REGISTRY[key] = entry
+            _MODEL_KEYS[id(model)] = key
+            _LOAD_LOCKS.pop(key, None)
+        return entry
+
+
+def get_embedding_model(config: RAGConfig) -> Embeddings:
+    """
+    Returns the shared Embeddings object for this config.
+
+    The model is loaded once per process and reused by every caller with the same
+    (provider, model name, device, normalize flag). Use `acquire_embedding_model`
+    instead if you need the model to be protected from `evict_embedding_model`.
+    """
+    return _get_or_create_entry(config).model
+
+
+def acquire_embedding_model(config: RAGConfig) -> Embeddings:
+    """
+    Same as `get_embedding_model`, but increments the reference count so that
+    `evict_embedding_model` (without force) keeps the model loaded.
+    Pair every call with `release_embedding_model`.
+    """
+    key = embedding_registry_key(config)
+    while True:
+        entry = _get_or_create_entry(config)
+        with _REGISTRY_LOCK:
+            # Evicted between load and lock → load again
+            if _EMBEDDING_REGISTRY.get(key) is entry:
+                entry.refcount += 1
+                return entry.model
+
+
+def release_embedding_model(config: RAGConfig) -> None:
+    """Decrement the reference count taken by `acquire_embedding_model`."""
+    key = embedding_registry_key(config)
+    with _REGISTRY_LOCK:
+        entry = _EMBEDDING_REGISTRY.get(key)
+        if entry is not None and entry.refcount > 0:
+            entry.refcount -= 1
+
+
+def evict_embedding_model(
+    config: Optional[RAGConfig] = None,
+    force: bool = False,
+) -> List[EmbeddingKey]:
+    """
+    Drop models from the registry so their weights can be garbage collected.
+
+    - config given → evict only that model.
+    - config None  → evict every registered model.
+    Models still referenced (refcount > 0) are kept unless force=True.
+    Returns the list of evicted keys.
+    """
+    with _REGISTRY_LOCK:
+        if config is not None:
+            keys = [embedding_registry_key(config)]
+        else:
+            keys = list(_EMBEDDING_REGISTRY.keys())
+
+        evicted: List[EmbeddingKey] = []
+        for key in keys:
+            entry = _EMBEDDING_REGISTRY.get(key)
+            if entry is None:
+                continue
+            if entry.refcount > 0 and not force:
+                continue
+            del _EMBEDDING_REGISTRY[key]
+            _MODEL_KEYS.pop(id(entry.model), None)
+            _QUERY_EMBEDDING_CACHE.clear_model(key)
+            evicted.append(key)
+        return evicted
+
+
+def warm_up_embedding_model(config: RAGConfig) -> float:
+    """
+    Load the model (if needed) and run one tiny embedding so the first user
+    question does not pay for lazy initialization. Returns elapsed seconds.
+    Calling it again for an already warmed-up model is a no-op; a failed
+    warm-up raises and leaves the model marked as not warmed up.
+    """
+    t0 = time.perf_counter()
+    entry = _get_or_create_entry(config)
+    with _REGISTRY_LOCK:
+        if entry.warmed_up:
+            return 0.0
+    entry.model.embed_query("warm-up")
+    with _REGISTRY_LOCK:
+        entry.warmed_up = True
+    return time.perf_counter() - t0
+
+
+def list_embedding_models() -> List[Dict[str, Any]]:
+    """Snapshot of the registry (for logging / debugging pages)."""
+    with _REGISTRY_LOCK:
+        return [
+            {
+                "provider": key[0],
+                "model_name": key[1],
+                "device": key[2],
+                "normalize_embeddings": key[3],
+                "refcount": entry.refcount,
+                "load_seconds": round(entry.load_seconds, 3),
+                "warmed_up": entry.warmed_up,
+            }
+            for key, entry in _EMBEDDING_REGISTRY.items()
+        ]
+
+
+def embedding_model_id(embedding_model: Embeddings) -> str:
+    """
+    Stable text id of a model's vector space (provider/model/normalize), stored
+    with persisted vectors so they are never mixed with another model's.
+    """
+    if isinstance(embedding_model, HuggingFaceEmbeddings):
+        provider = "huggingface"
+    elif isinstance(embedding_model, OpenAIEmbeddings):
+        provider = "openrouter"
+    else:
+        provider = type(embedding_model).__name__
+    name = getattr(embedding_model, "model_name", None) or getattr(embedding_model, "model", None)
+    encode_kwargs = getattr(embedding_model, "encode_kwargs", None) or {}
+    return f"{provider}:{name}:normalize={bool(encode_kwargs.get('normalize_embeddings', False))}"
+
+
+# =====================================================================
+# Query embedding cache
+# =====================================================================
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache of query vectors keyed by (embedding model, text).
+
+    One question is needed by several steps (retrieval on every selected DB,
+    similarity reranking, hybrid primary/fallback passes, every sub-agent in the
+    multi-agent path); with this cache it is embedded exactly once.
+    `maxsize=None` means unbounded (useful for a short-lived per-request cache).
+    """
+
+    def __init__(self, maxsize: Optional[int] = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Tuple[Hashable, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_embed(
+        self,
+        embedding_model: Embeddings,
+        text: str,
+        parent: Optional["QueryEmbeddingCache"] = None,
+    ) -> np.ndarray:
+        """
+        Return the cached vector for `text`, embedding it on a miss.
+        On a miss, `parent` (e.g. the process-wide cache) is consulted first.
+        """
+        key = (_model_cache_key(embedding_model), text)
+        with self._lock:
+            vec = self._data.get(key)
+            if vec is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return vec
+            self.misses += 1
+
+        if parent is not None:
+            vec = parent.get_or_embed(embedding_model, text)
+        else:
+            vec = np.asarray(embedding_model.embed_query(text), dtype=np.float32)
+            vec.setflags(write=False)
+
+        with self._lock:
+            self._data[key] = vec
+            self._data.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+        return vec
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def clear_model(self, model_key: Hashable) -> None:
+        with self._lock:
+            for key in [k for k in self._data if k[0] == model_key]:
+                del self._data[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+def _model_cache_key(embedding_model: Embeddings) -> Hashable:
+    key = _MODEL_KEYS.get(id(embedding_model))
+    if key is not None:
+        return key
+    # Model not created by the registry: identify it by its own settings + identity
+    name = getattr(embedding_model, "model_name", None) or getattr(embedding_model, "model", None)
+    return (type(embedding_model).__name__, name, id(embedding_model))
+
+
+# Process-wide query vector cache shared by all pipelines
+_QUERY_EMBEDDING_CACHE = QueryEmbeddingCache(maxsize=256)
+
+
+def embed_query_cached(
+    embedding_model: Embeddings,
+    text: str,
+    request_cache: Optional[QueryEmbeddingCache] = None,
+    use_process_cache: bool = True,
+) -> np.ndarray:
+    """
+    Embed a query once and reuse the vector.
+
+    - request_cache given → per-request cache, checked first.
+    - use_process_cache   → process-wide LRU shared by every request.
+    With neither, this is a plain `embed_query` returning a float32 array.
+    """
+    parent = _QUERY_EMBEDDING_CACHE if use_process_cache else None
+    if request_cache is not None:
+        return request_cache.get_or_embed(embedding_model, text, parent=parent)
+    if parent is not None:
+        return parent.get_or_embed(embedding_model, text)
+    return np.asarray(embedding_model.embed_query(text), dtype=np.float32)
+
+
+def get_query_embedding_cache_stats() -> Dict[str, Any]:
+    """Hit/miss counters of the process-wide query embedding cache."""
+    return _QUERY_EMBEDDING_CACHE.stats()
+
+
+# =====================================================================
+# Batched document embedding (vector store builds)
+# =====================================================================
+class BatchEmbedder:
+    """
+    Embeds document texts for index builds, batch by batch.
+
+    - Texts are sorted by length (longest first) so each batch holds texts of
+      similar length and little compute is spent on padding; results are
+      returned in the original order.
+    - Hugging Face models are encoded directly with sentence-transformers
+      (`batch_size` texts per forward pass). With num_workers > 1 a
+      sentence-transformers multi-process pool is started on the model device
+      and each step sends `batch_size * num_workers` texts across the workers.
+    - Other providers (OpenRouter) go through `embed_documents` per step.
+    - cache given (an `embedding_cache.EmbeddingCache`) → texts already in it
+      are not embedded, and new vectors are added to it.
+
+    Use it as a context manager so the worker pool is always stopped.
+    """
+
+    def __init__(
+        self,
+        embedding_model: Embeddings,
+        batch_size: int = 64,
+        num_workers: int = 1,
+        cache: Optional[Any] = None,
+    ):
+        self.embedding_model = embedding_model
+        self.cache = cache
+        self.batch_size = max(1, int(batch_size))
+        self.num_workers = max(1, int(num_workers))
+        self._st_model = (
+            getattr(embedding_model, "_client", None)
+            if isinstance(embedding_model, HuggingFaceEmbeddings)
+            else None
+        )
+        self._pool: Optional[Dict[str, Any]] = None
+
+    def __enter__(self) -> "BatchEmbedder":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    @property
+    def step_size(self) -> int:
+        """Texts embedded per step (= per progress callback)."""
+        if self._st_model is not None:
+            return self.batch_size * self.num_workers
+        return self.batch_size
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._st_model is None:
+            return np.asarray(self.embedding_model.embed_documents(texts), dtype=np.float32)
+
+        # Same preprocessing and encode kwargs as HuggingFaceEmbeddings.embed_documents
+        texts = [t.replace("\n", " ") for t in texts]
+        kwargs = dict(getattr(self.embedding_model, "encode_kwargs", None) or {})
+        kwargs.update(batch_size=self.batch_size, show_progress_bar=False)
+
+        if self.num_workers > 1:
+            if self._pool is None:
+                device = (getattr(self.embedding_model, "model_kwargs", None) or {}).get(
+                    "device", "cpu"
+                )
+                self._pool = self._st_model.start_multi_process_pool(
+                    [device] * self.num_workers
+                )
+            kwargs["chunk_size"] = self.batch_size
+            return np.asarray(self._encode_pool(texts, kwargs), dtype=np.float32)
+        return np.asarray(self._st_model.encode(texts, **kwargs), dtype=np.float32)
+
+    def _encode_pool(self, texts: List[str], kwargs: Dict[str, Any]) -> Any:
+        """
+        Encode on the worker pool. sentence-transformers >= 5 takes the pool in
+        `encode(pool=...)`; older releases only have `encode_multi_process`,
+        which accepts a subset of the encode kwargs (the rest are dropped).
+        """
+        if "pool" in inspect.signature(self._st_model.encode).parameters:
+            return self._st_model.encode(texts, pool=self._pool, **kwargs)
+        accepted = inspect.signature(self._st_model.encode_multi_process).parameters
+        if not any(p.kind is p.VAR_KEYWORD for p in accepted.values()):
+            kwargs = {k: v for k, v in kwargs.items() if k in accepted}
+        return self._st_model.encode_multi_process(texts, self._pool, **kwargs)
+
+    def embed(
+        self,
+        texts: List[str],
+        on_step: Optional[Callable[[int], None]] = None,
+    ) -> np.ndarray:
+        """
+        float32 matrix (len(texts), dim) in the order of `texts`.
+        `on_step(n)` is called after every step with the number of texts embedded.
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        if self.cache is None:
+            return self._embed_sorted(texts, on_step)
+
+        model_id = embedding_model_id(self.embedding_model)
+        cached = self.cache.get_many(model_id, texts)
+        missing = [i for i, v in enumerate(cached) if v is None]
+        if on_step is not None and len(missing) < len(texts):
+            on_step(len(texts) - len(missing))
+        if not missing:
+            return np.vstack(cached).astype(np.float32, copy=False)
+
+        fresh = self._embed_sorted([texts[i] for i in missing], on_step)
+        self.cache.put_many(model_id, [texts[i] for i in missing], fresh)
+        vectors = np.empty((len(texts), fresh.shape[1]), dtype=np.float32)
+        for i, v in enumerate(cached):
+            if v is not None:
+                vectors[i] = v
+        vectors[missing] = fresh
+        return vectors
+
+    def _embed_sorted(
+        self,
+        texts: List[str],
+        on_step: Optional[Callable[[int], None]] = None,
+    ) -> np.ndarray:
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        step = self.step_size
+        parts: List[np.ndarray] = []
+        for start in range(0, len(texts), step):
+            idx = order[start:start + step]
+            parts.append(self._encode([texts[i] for i in idx]))
+            if on_step is not None:
+                on_step(len(idx))
+
+        vectors = np.empty((len(texts), parts[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(parts)
+        return vectors
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._st_model.stop_multi_process_pool(self._pool)
+            self._pool = None
@@ -0,0 +1,92 @@
+# backend/fingerprints.py
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Role of this module:
+# Fingerprint table of a vector store (`fingerprints.json`, next to index.faiss):
+# for every source file, its size / mtime / sha256 and the (doc id, content hash,
+# metadata hash) of each Document it produced. Incremental builds
+# (`vector_store.update_vector_store`) compare it with the files on disk so only
+# new or changed documents are embedded and removed ones are deleted.
+
+FINGERPRINTS_FILENAME = "fingerprints.json"
+FINGERPRINTS_VERSION = 1
+
+# One indexed document: (docstore id, content sha256, metadata sha256)
+DocFingerprint = Tuple[str, str, str]
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def document_fingerprint(doc: Document) -> Tuple[str, str]:
+    """(content hash, metadata hash). Vectors only depend on the content."""
+    meta = json.dumps(doc.metadata or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return _sha256(doc.page_content.encode("utf-8")), _sha256(meta.encode("utf-8"))
+
+
+def file_fingerprint(path: str) -> Dict[str, Any]:
+    """{"size", "mtime_ns", "sha256"} of a source file."""
+    st = os.stat(path)
+    with open(path, "rb") as f:
+        digest = _sha256(f.read())
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+
+
+def file_changed(path: str, entry: Optional[Dict[str, Any]]) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """
+    Compare a file with its table entry. Size + mtime equal → unchanged without
+    reading it; otherwise the content hash decides (a `touch` is not a change).
+    Returns (changed, fresh file fingerprint or None if not computed).
+    """
+    if entry is None:
+        return True, None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return True, None
+    if st.st_size == entry.get("size") and st.st_mtime_ns == entry.get("mtime_ns"):
+        return False, None
+    fresh = file_fingerprint(path)
+    return fresh["sha256"] != entry.get("sha256"), fresh
+
+
+def new_table(embedding_id: str, dimension: int) -> Dict[str, Any]:
+    return {
+        "version": FINGERPRINTS_VERSION,
+        "embedding": embedding_id,
+        "dimension": int(dimension),
+        "updated_at": "",
+        "files": {},
+    }
+
+
+def read_fingerprints(store_dir: str) -> Optional[Dict[str, Any]]:
+    """fingerprints.json of a store, or None if missing, unreadable or of another version."""
+    path = os.path.join(store_dir, FINGERPRINTS_FILENAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(table, dict) or table.get("version") != FINGERPRINTS_VERSION:
+        return None
+    return table
+
+
+def write_fingerprints(store_dir: str, table: Dict[str, Any]) -> None:
+    """Write fingerprints.json atomically."""
+    table = dict(table, updated_at=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    path = os.path.join(store_dir, FINGERPRINTS_FILENAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(table, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
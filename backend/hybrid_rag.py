@@ -4,15 +4,30 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Dict, List, Optional, Tuple, Any
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 
 import numpy as np
 from langchain_core.documents import Document
 
+from .chunking import expand_chunk_hits, is_chunk
 from .config import RAGConfig
-from .embeddings import get_embedding_model
+from .embeddings import (
+    get_embedding_model,
+    embed_query_cached,
+    get_query_embedding_cache_stats,
+)
+from .answer_cache import lookup_answer, serve_cached_answer, store_answer
 from .llm_provider import LLMBackend
-from .vector_store import load_vector_store
+from .rag_utils import EventSink, _iter_events, _latency_log, _submit_in_thread
+from .manifest import format_histogram
+from .civil_codes import describe_codes
+from .index_spec import query_parameters
+from .reranker import rerank_documents
+from .sharded_collection import ShardedCollection
+from .vector_store import get_db_manifest, get_metadata_index
 
 
 # =====================================================================
@@ -186,55 +201,36 @@ def _describe_databases(
     embedding_model,
 ) -> Dict[str, str]:
     """
-    Build a SHORT description for each DB based on a few documents' metadata.
+    Build a SHORT description for each DB from its manifest (full-corpus
+    metadata histograms, see backend/manifest.py; no docstore scan).
     Used only for logging and simple heuristic routing.
     """
     descriptions: Dict[str, str] = {}
 
     for db_name, path in db_map.items():
         try:
-            vs = load_vector_store(path, embedding_model)
+            manifest = get_db_manifest(path, embedding_model)
         except Exception:
             descriptions[db_name] = "Database could not be loaded."
             continue
 
-        docs: List[Document] = []
-        try:
-            if hasattr(vs, "docstore") and hasattr(vs.docstore, "_dict"):
-                all_docs = list(vs.docstore._dict.values())
-                docs = all_docs[:20]
-        except Exception:
-            docs = []
-
-        laws = set()
-        types_ = set()
-        subjects = set()
-        other_tags = set()
-
-        for d in docs:
-            meta = d.metadata or {}
-            if "law" in meta:
-                laws.add(str(meta["law"]))
-            if "type" in meta:
-                types_.add(str(meta["type"]))
-            if "subject_of_succession" in meta:
-                subjects.add(str(meta["subject_of_succession"]))
-            for k in ("domain", "category", "state"):
-                if k in meta:
-                    other_tags.add(f"{k}={meta[k]}")
-
+        hist = manifest.get("histograms", {})
         parts = []
-        if laws:
-            parts.append("law: " + ", ".join(sorted(laws)))
-        if types_:
-            parts.append("type: " + ", ".join(sorted(types_)))
-        if subjects:
-            parts.append("subject: " + ", ".join(sorted(subjects)))
-        if other_tags:
-            parts.append("tags: " + ", ".join(sorted(other_tags)))
+        if hist.get("law"):
+            parts.append("law: " + format_histogram(hist["law"]))
+        if hist.get("type"):
+            parts.append("type: " + format_histogram(hist["type"]))
+        if hist.get("subject_of_succession"):
+            parts.append(
+                "subject: " + format_histogram(hist["subject_of_succession"], top=3)
+            )
+        if hist.get("state"):
+            parts.append("tags: state=" + format_histogram(hist["state"]))
 
         if parts:
-            descriptions[db_name] = "; ".join(parts)
+            descriptions[db_name] = (
+                f"{manifest.get('doc_count', 0)} docs; " + "; ".join(parts)
+            )
         else:
             descriptions[db_name] = "general legal corpus."
 
@@ -262,84 +258,14 @@ def _build_context(docs: List[Document], max_chars: int = 4000) -> str:
     return "".join(chunks)
 
 
-def _similarity_rank_and_filter(
-    question: str,
-    docs: List[Document],
-    embedding_model,
-    top_k: int,
-    min_sim: float = 0.1,
-) -> Tuple[List[Document], str]:
-    """
-    Rank docs by cosine similarity and filter below min_sim.
-    Returns (filtered_docs, log_string).
-    """
-    log_lines: List[str] = []
-
-    if not docs:
-        log_lines.append("No documents returned from base retriever.")
-        return [], "\n".join(log_lines)
-
-    q_vec = np.array(embedding_model.embed_query(question), dtype="float32")
-    doc_texts = [d.page_content for d in docs]
-    doc_vecs = np.array(embedding_model.embed_documents(doc_texts), dtype="float32")
-
-    q_norm = np.linalg.norm(q_vec)
-    doc_norms = np.linalg.norm(doc_vecs, axis=1)
-    denom = np.maximum(q_norm * doc_norms, 1e-8)
-    sims = (doc_vecs @ q_vec) / denom
-
-    num_raw = len(docs)
-    sims_min = float(np.min(sims))
-    sims_max = float(np.max(sims))
-    sims_mean = float(np.mean(sims))
-
-    indices = [i for i, s in enumerate(sims) if s >= min_sim]
-    num_after_threshold = len(indices)
-
-    if not indices:
-        log_lines.append(
-            f"Similarity filtering: {num_raw} raw docs → 0 kept "
-            f"(threshold={min_sim:.3f}, "
-            f"sim range=[{sims_min:.3f}, {sims_max:.3f}], mean={sims_mean:.3f})."
-        )
-        return [], "\n".join(log_lines)
-
-    indices_sorted = sorted(indices, key=lambda i: sims[i], reverse=True)[:top_k]
-    final_docs = [docs[i] for i in indices_sorted]
-
-    sims_kept = sims[indices_sorted]
-    sims_kept_min = float(np.min(sims_kept))
-    sims_kept_max = float(np.max(sims_kept))
-    sims_kept_mean = float(np.mean(sims_kept))
-
-    log_lines.append(
-        "Similarity filtering + reranking:\n"
-        f"- Raw docs from retriever: {num_raw}\n"
-        f"- Docs above threshold {min_sim:.3f}: {num_after_threshold}\n"
-        f"- Final top_k={top_k} docs kept: {len(final_docs)}\n"
-        f"- Similarity stats (all raw): min={sims_min:.3f}, max={sims_max:.3f}, "
-        f"mean={sims_mean:.3f}\n"
-        f"- Similarity stats (kept):   min={sims_kept_min:.3f}, max={sims_kept_max:.3f}, "
-        f"mean={sims_kept_mean:.3f}"
-    )
-
-    return final_docs, "\n".join(log_lines)
-
-
 # =====================================================================
 # 4. LLM-based law classification & metadata extraction 
 # =====================================================================
 
-def _classify_law(
-    question: str,
-    llm_backend: LLMBackend,
-) -> Tuple[str, str]:
+def _classify_law_heuristic(question: str) -> Tuple[Optional[str], List[str]]:
     """
-    Classify the query as 'Inheritance' or 'Divorce' (matching document metadata 'law').
-
-    - First: heuristic keyword classification (fast).
-    - Then: if ambiguous, LLM classification.
-    - Always returns one of 'Inheritance' or 'Divorce' (mandatory).
+    Keyword-only law classification (no LLM).
+    Returns (law or None if ambiguous, log_lines).
     """
     q = question.lower()
 
@@ -356,11 +282,26 @@ def _classify_law(
         heuristic_log.append("Heuristic: divorce/separazione keywords detected.")
 
     if has_succession and not has_divorce:
-        law = "Inheritance"
-        return law, "\n".join(heuristic_log) or "Heuristic → Inheritance."
+        return "Inheritance", heuristic_log or ["Heuristic → Inheritance."]
     if has_divorce and not has_succession:
-        law = "Divorce"
-        return law, "\n".join(heuristic_log) or "Heuristic → Divorce."
+        return "Divorce", heuristic_log or ["Heuristic → Divorce."]
+    return None, heuristic_log
+
+
+def _classify_law(
+    question: str,
+    llm_backend: LLMBackend,
+) -> Tuple[str, str]:
+    """
+    Classify the query as 'Inheritance' or 'Divorce' (matching document metadata 'law').
+
+    - First: heuristic keyword classification (fast).
+    - Then: if ambiguous, LLM classification.
+    - Always returns one of 'Inheritance' or 'Divorce' (mandatory).
+    """
+    law, heuristic_log = _classify_law_heuristic(question)
+    if law is not None:
+        return law, "\n".join(heuristic_log)
 
     # Ambiguous or no strong heuristic → ask LLM
     system_prompt = (
@@ -374,7 +315,7 @@ def _classify_law(
     )
     user_prompt = f"Question:\n{question}\n\nAnswer with 'Inheritance' or 'Divorce' only."
 
-    resp = llm_backend.chat(system_prompt, user_prompt).strip()
+    resp = llm_backend.chat(system_prompt, user_prompt, cache=True).strip()
     resp_up = resp.upper()
 
     if "INHERIT" in resp_up:
@@ -389,28 +330,36 @@ def _classify_law(
     return law, log
 
 
-def _extract_legal_metadata_from_query(
+def _metadata_extraction_prompts(
     question: str,
-    llm_backend: LLMBackend,
-) -> Tuple[Dict[str, Any], str]:
+    law_hint: Optional[str],
+) -> Tuple[str, str]:
     """
-    Use the LLM as a metadata extraction agent, based on LEGAL_METADATA_SCHEMA.
+    Prompts for the metadata extraction call.
 
-    - law is mandatory and MUST be exactly 'Inheritance' or 'Divorce'.
-    - All other fields are optional and can be null/[].
+    - law_hint given → 'law' is pinned to it (sequential / parallel modes).
+    - law_hint None  → the model also classifies 'law' (fused mode).
     """
-    law_hint, law_class_log = _classify_law(question, llm_backend)
-
     schema_json = json.dumps(LEGAL_METADATA_SCHEMA, ensure_ascii=False, indent=2)
 
+    if law_hint is not None:
+        law_rules = (
+            f"- 'law' is MANDATORY and MUST be exactly '{law_hint}'.\n"
+            "- Set 'law' in the JSON to this value, unless the text clearly contradicts it.\n"
+        )
+    else:
+        law_rules = (
+            "- 'law' is MANDATORY and MUST be exactly 'Inheritance' (succession/eredità) "
+            "or 'Divorce' (divorce/separazione). If you are unsure, pick the most plausible.\n"
+        )
+
     system_prompt = (
         "You are a legal metadata extraction assistant for Italian civil law cases.\n"
         "Given a natural language user query or case description, you must extract "
         "a concise JSON object that conforms EXACTLY to the following JSON schema:\n\n"
         f"{schema_json}\n\n"
         "Important rules:\n"
-        f"- 'law' is MANDATORY and MUST be exactly '{law_hint}'.\n"
-        "- Set 'law' in the JSON to this value, unless the text clearly contradicts it.\n"
+        f"{law_rules}"
         "- If a field is not clearly inferable, set it to null (or [] for arrays).\n"
         "- 'cost' and 'financial_support' must be a value followed by '€' if an amount "
         "is mentioned, otherwise null.\n"
@@ -421,9 +370,11 @@ def _extract_legal_metadata_from_query(
     )
 
     user_prompt = f"Text:\n{question}\n\nReturn ONLY the JSON object."
+    return system_prompt, user_prompt
 
-    raw = llm_backend.chat(system_prompt, user_prompt)
 
+def _parse_metadata_response(raw: str) -> Dict[str, Any]:
+    """Parse the extraction output and make sure every schema key exists."""
     # Default empty structure
     default_meta: Dict[str, Any] = {}
     for k, v in LEGAL_METADATA_SCHEMA["properties"].items():
@@ -432,8 +383,6 @@ def _extract_legal_metadata_from_query(
             default_meta[k] = []
         else:
             default_meta[k] = None
-    # law mandatory: set default to law_hint
-    default_meta["law"] = law_hint
 
     try:
         meta = json.loads(raw)
@@ -446,17 +395,187 @@ def _extract_legal_metadata_from_query(
     for k, v in default_meta.items():
         if k not in meta:
             meta[k] = v
+    return meta
 
-    # Enforce 'law' = law_hint (mandatory)
-    meta["law"] = law_hint
 
-    log = (
+def _format_metadata_log(meta: Dict[str, Any], law_class_log: str) -> str:
+    return (
         "Hybrid legal metadata extracted from query:\n"
         + json.dumps(meta, ensure_ascii=False, indent=2)
         + "\n\nLaw classification log:\n"
         + law_class_log
     )
-    return meta, log
+
+
+def _extract_legal_metadata_from_query(
+    question: str,
+    llm_backend: LLMBackend,
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Use the LLM as a metadata extraction agent, based on LEGAL_METADATA_SCHEMA.
+
+    - law is mandatory and MUST be exactly 'Inheritance' or 'Divorce'.
+    - All other fields are optional and can be null/[].
+    """
+    law_hint, law_class_log = _classify_law(question, llm_backend)
+
+    system_prompt, user_prompt = _metadata_extraction_prompts(question, law_hint)
+    raw = llm_backend.chat(system_prompt, user_prompt, cache=True)
+
+    meta = _parse_metadata_response(raw)
+    # Enforce 'law' = law_hint (mandatory)
+    meta["law"] = law_hint
+
+    return meta, _format_metadata_log(meta, law_class_log)
+
+
+def _extract_legal_metadata_fused(
+    question: str,
+    llm_backend: LLMBackend,
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Fused mode: ONE structured-output call returns 'law' together with the other
+    LEGAL_METADATA_SCHEMA fields, so ambiguous queries no longer pay a separate
+    classification round trip. An invalid 'law' falls back to the keyword
+    heuristic, then to 'Inheritance' (same default as `_classify_law`).
+    """
+    heuristic_law, heuristic_log = _classify_law_heuristic(question)
+
+    t0 = time.perf_counter()
+    system_prompt, user_prompt = _metadata_extraction_prompts(question, None)
+    raw = llm_backend.chat(system_prompt, user_prompt, cache=True)
+    t_call = time.perf_counter() - t0
+
+    meta = _parse_metadata_response(raw)
+    llm_law = meta.get("law")
+    if llm_law in ("Inheritance", "Divorce"):
+        law = llm_law
+        law_lines = heuristic_log + [f"Fused LLM call: law='{llm_law}'."]
+    else:
+        law = heuristic_law or "Inheritance"
+        law_lines = heuristic_log + [
+            f"Fused LLM call: invalid law={llm_law!r} → {law} (heuristic/default)."
+        ]
+    meta["law"] = law
+
+    if heuristic_law is None:
+        law_lines.append(
+            f"Latency: 1 LLM call ({t_call * 1000:.0f} ms) instead of classify + extract "
+            f"→ saved ≈ one LLM round trip (~{t_call * 1000:.0f} ms)."
+        )
+    else:
+        law_lines.append(
+            f"Latency: 1 LLM call ({t_call * 1000:.0f} ms); heuristic was decisive, "
+            "so sequential mode would not have needed an extra call (saved ≈ 0 ms)."
+        )
+
+    return meta, _format_metadata_log(meta, "\n".join(law_lines))
+
+
+def _extract_metadata_with_prefetch(
+    question: str,
+    llm_backend: LLMBackend,
+    config: RAGConfig,
+    embedding_model,
+    db_map: Dict[str, str],
+    db_descriptions: Dict[str, str],
+) -> Tuple[Dict[str, Any], str, Dict[str, Tuple[List[Document], str]]]:
+    """
+    Parallel mode: law classification and metadata extraction run at the same
+    time, and as soon as 'law' is known the mandatory {'law': ...} retrieval pass
+    is started speculatively on the DBs that law routes to.
+
+    - Heuristic decisive → no classification call; extraction gets the law hint.
+    - Ambiguous          → LLM classification + hint-less extraction in parallel;
+                           the classified law always wins over the extracted one.
+
+    Returns (meta, metadata_log, mandatory_results) where mandatory_results is
+    {"db1, db2" (searched DB names) -> (docs, log)} for
+    `_retrieve_from_collection_hybrid(mandatory_result=...)`.
+    """
+    t_start = time.perf_counter()
+    heuristic_law, _ = _classify_law_heuristic(question)
+    timings: Dict[str, float] = {}
+
+    def _timed(label: str, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timings[label] = time.perf_counter() - t0
+
+    def _extract(law_hint: Optional[str]) -> str:
+        system_prompt, user_prompt = _metadata_extraction_prompts(question, law_hint)
+        return llm_backend.chat(system_prompt, user_prompt, cache=True)
+
+    def _prefetch(law: str) -> Dict[str, Tuple[List[Document], str]]:
+        db_names, _ = _heuristic_db_candidates({"law": law}, db_map, db_descriptions)
+        q_vec = embed_query_cached(
+            embedding_model,
+            question,
+            use_process_cache=getattr(config, "use_query_embedding_cache", True),
+        )
+        collection = ShardedCollection(
+            {n: db_map[n] for n in db_names},
+            embedding_model,
+            max_workers=getattr(config, "retrieval_max_workers", 4),
+        )
+        try:
+            result = _run_hybrid_pass(
+                question=question,
+                collection=collection,
+                db_names=db_names,
+                q_vec=q_vec,
+                top_k=config.top_k,
+                use_rerank=config.use_rerank,
+                which="speculative (mandatory 'law' only)",
+                f={"law": law},
+                retrieval_mode=getattr(config, "retrieval_mode", "dense"),
+                rrf_k=getattr(config, "rrf_k", 60),
+                rerank_config=config,
+                index_search=query_parameters(config),
+                chunk_mode=getattr(config, "chunk_retrieval_mode", "neighbors"),
+            )
+        except Exception:
+            # Not fatal: the regular retrieval step runs (and reports) this pass again
+            return {}
+        return {", ".join(db_names): result}
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="hybrid-meta") as pool:
+        if heuristic_law is not None:
+            extract_fut = pool.submit(_timed, "extract", _extract, heuristic_law)
+            law, law_class_log = _classify_law(question, llm_backend)
+            timings["classify"] = 0.0
+        else:
+            extract_fut = pool.submit(_timed, "extract", _extract, None)
+            law, law_class_log = _timed("classify", _classify_law, question, llm_backend)
+
+        prefetch_fut = pool.submit(_timed, "prefetch", _prefetch, law)
+        raw = extract_fut.result()
+        mandatory_results = prefetch_fut.result()
+
+    wall = time.perf_counter() - t_start
+    meta = _parse_metadata_response(raw)
+    extracted_law = meta.get("law")
+    # Enforce 'law' = classified law (mandatory)
+    meta["law"] = law
+
+    sequential = timings.get("classify", 0.0) + timings.get("extract", 0.0) + timings.get("prefetch", 0.0)
+    log_lines = [law_class_log]
+    if heuristic_law is None and extracted_law not in (None, law):
+        log_lines.append(
+            f"Extraction proposed law={extracted_law!r}; classifier result '{law}' kept."
+        )
+    log_lines.append(
+        "Parallel metadata mode: "
+        f"classify={timings.get('classify', 0.0) * 1000:.0f} ms, "
+        f"extract={timings.get('extract', 0.0) * 1000:.0f} ms, "
+        f"speculative retrieval={timings.get('prefetch', 0.0) * 1000:.0f} ms "
+        f"on DB(s) [{'; '.join(mandatory_results) or 'none'}], wall={wall * 1000:.0f} ms "
+        f"→ saved ≈ {max(sequential - wall, 0.0) * 1000:.0f} ms vs. running them in sequence."
+    )
+
+    return meta, _format_metadata_log(meta, "\n".join(log_lines)), mandatory_results
 
 
 def _build_metadata_filter(meta: Dict[str, Any]) -> Dict[str, Any]:
@@ -464,7 +583,9 @@ def _build_metadata_filter(meta: Dict[str, Any]) -> Dict[str, Any]:
     Build a metadata filter for the vector store based on extracted metadata.
 
     - 'law' → used directly as metadata filter.
-    - First civil code (if present) → 'civil_codes_used' filter.
+    - Civil codes (if present) → 'civil_codes_used' filter over ALL of them:
+      a document matches if it cites any of them (articles, ranges and
+      "et seq." are parsed on both sides, see backend/civil_codes.py).
     """
     filt: Dict[str, Any] = {}
 
@@ -473,8 +594,12 @@ def _build_metadata_filter(meta: Dict[str, Any]) -> Dict[str, Any]:
         filt["law"] = law
 
     civil_codes = meta.get("civil_codes_used") or []
-    if isinstance(civil_codes, list) and civil_codes:
-        filt["civil_codes_used"] = civil_codes[0]
+    if isinstance(civil_codes, str):
+        civil_codes = [civil_codes]
+    if isinstance(civil_codes, list):
+        codes = [str(c).strip() for c in civil_codes if c is not None and str(c).strip()]
+        if codes:
+            filt["civil_codes_used"] = codes
 
     return filt
 
@@ -536,26 +661,165 @@ def _heuristic_db_candidates(
 # 5. Retrieval & logs (static filters + similarity, with fallback)
 # =====================================================================
 
-def _retrieve_from_db_hybrid(
+def _run_hybrid_pass(
     question: str,
-    db_name: str,
-    db_path: str,
-    embedding_model,
+    collection: ShardedCollection,
+    db_names: List[str],
+    q_vec: np.ndarray,
+    top_k: int,
+    use_rerank: bool,
+    which: str,
+    f: Optional[Dict[str, Any]],
+    retrieval_mode: str = "dense",
+    rrf_k: int = 60,
+    rerank_config: Optional[RAGConfig] = None,
+    index_search: Optional[Dict[str, int]] = None,
+    chunk_mode: str = "chunks",
+) -> Tuple[List[Document], str]:
+    """
+    Run a single retrieval pass with filter f over the shards `db_names` of
+    the collection: ONE scatter-gather search (backend/sharded_collection.py),
+    i.e. shards that cannot match f are pruned, the others are searched in
+    parallel and their hits merged into one global top-k. Each shard applies f
+    inside the FAISS search with its metadata index (exact top-k among
+    matching docs). retrieval_mode="fusion" → dense and BM25 rankings are
+    fused (reciprocal rank fusion).
+    use_rerank → the candidates are reranked with the cross-encoder of
+    `rerank_config` (backend/reranker.py). `index_search` holds the query-time
+    nprobe / ef_search of IVF / HNSW stores (backend/index_spec.py).
+    When the hits are chunks that the caller folds into parents / neighbour
+    windows (`chunk_mode` other than "chunks"), up to k_base chunks are kept so
+    that enough distinct parents remain for top_k documents after expansion.
+    Returns (docs, log_string).
+    """
+    label = ", ".join(db_names)
+    k_base = max(top_k * 3, top_k)
+    local_logs: List[str] = [f"[Shards {label}] Retrieval phase = {which}"]
+
+    if f:
+        local_logs.append(
+            f"[Shards {label}] Using metadata filter: "
+            f"{json.dumps(f, ensure_ascii=False)}"
+        )
+        if "civil_codes_used" in f:
+            local_logs.append(
+                f"[Shards {label}] Civil codes parsed: "
+                f"{describe_codes(f['civil_codes_used'])}"
+            )
+    else:
+        local_logs.append(f"[Shards {label}] No metadata filter used.")
+
+    local_logs.append(
+        f"[Shards {label}] Base retriever k={k_base} (top_k={top_k}), merged over all shards."
+    )
+
+    result = collection.search(
+        question,
+        q_vec,
+        k=k_base,
+        filter=f or None,
+        names=db_names,
+        retrieval_mode=retrieval_mode,
+        rrf_k=rrf_k,
+        **(index_search or {}),
+    )
+    if f:
+        for db_name in result.searched:
+            try:
+                metadata_index = get_metadata_index(collection.shards[db_name], collection.embedding_model)
+                sel = metadata_index.selectivity(f)
+            except Exception:
+                sel = None
+            if sel is not None:
+                per_clause = ", ".join(f"{k}={v}" for k, v in sel["clauses"].items())
+                local_logs.append(
+                    f"[DB {db_name}] Metadata pre-filter: {per_clause} → "
+                    f"{sel['matches']}/{sel['n']} vectors match ({sel['fraction']:.1%}) "
+                    "→ search restricted to matching ids."
+                )
+            else:
+                local_logs.append(
+                    f"[DB {db_name}] Metadata pre-filter unavailable for this filter "
+                    "→ post-filtering the nearest hits."
+                )
+    local_logs.extend(result.log_lines())
+    if result.fusion:
+        local_logs.append(
+            f"[Shards {label}] Retrieval mode: fusion (FAISS + BM25, reciprocal rank fusion, k={rrf_k})."
+        )
+    raw_docs = result.docs
+    local_logs.append(
+        f"[Shards {label}] Raw docs from retriever: {len(raw_docs)}"
+    )
+
+    # Chunked store: keep more chunk hits, they are folded into top_k parents later
+    keep = k_base if chunk_mode != "chunks" and any(is_chunk(d) for d in raw_docs) else top_k
+    if use_rerank:
+        docs, rerank_log = rerank_documents(
+            question, raw_docs, rerank_config or RAGConfig(), top_k=keep
+        )
+        local_logs.append(f"[Shards {label}] {rerank_log}")
+    else:
+        local_logs.append(
+            f"[Shards {label}] Reranking DISABLED (use_rerank=False); "
+            f"using top {keep} raw docs in retrieval order."
+        )
+        docs = raw_docs[:keep]
+
+    if not docs:
+        local_logs.append(
+            f"[Shards {label}] Result: no docs kept after retrieval/rerank."
+        )
+    else:
+        per_db = Counter(d.metadata.get("db_name", "") for d in docs)
+        local_logs.append(
+            f"[Shards {label}] Result: {len(docs)} doc(s) kept for context ("
+            + ", ".join(f"{n}={c}" for n, c in per_db.items())
+            + ")."
+        )
+
+    return docs, "\n".join(local_logs)
+
+
+def _retrieve_from_collection_hybrid(
+    question: str,
+    collection: ShardedCollection,
+    db_names: List[str],
     top_k: int,
     use_rerank: bool,
     metadata_filter: Optional[Dict[str, Any]] = None,
+    query_vector: Optional[np.ndarray] = None,
+    mandatory_result: Optional[Tuple[List[Document], str]] = None,
+    retrieval_mode: str = "dense",
+    rrf_k: int = 60,
+    rerank_config: Optional[RAGConfig] = None,
+    index_search: Optional[Dict[str, int]] = None,
+    chunk_mode: str = "chunks",
 ) -> Tuple[List[Document], str]:
     """
-    Retrieve docs from a single FAISS DB combining:
+    Retrieve the global top_k docs over the shards `db_names` combining:
       - metadata_filter (all fields = mandatory + marginal)
       - if that is too strict (len(docs) < top_k), fall back to ONLY mandatory filter:
            -> 'law' (Inheritance / Divorce)
-      - optional embedding-based similarity reranking (use_rerank flag)
+      - optional cross-encoder reranking (use_rerank flag, settings from rerank_config)
+
+    Each pass is one scatter-gather search over all shards (`_run_hybrid_pass`).
+    `query_vector` is the already-embedded question, shared by both passes
+    (embedded here if None).
+
+    `mandatory_result` is an already computed ('law'-only) pass, e.g. started
+    speculatively while metadata extraction was still running; it is reused
+    instead of running that pass again.
+    `chunk_mode` is forwarded to `_run_hybrid_pass` (chunk hits kept for expansion).
     """
-    log_lines: List[str] = [f"[DB {db_name}] path={db_path}"]
+    label = ", ".join(db_names)
+    log_lines: List[str] = [
+        f"[DB {db_name}] path={collection.shards[db_name]}" for db_name in db_names
+    ]
 
-    vector_store = load_vector_store(db_path, embedding_model)
-    k_base = max(top_k * 3, top_k)
+    q_vec = query_vector
+    if q_vec is None:
+        q_vec = embed_query_cached(collection.embedding_model, question)
 
     # Full filter (mandatory + marginal) from metadata
     full_filter: Dict[str, Any] = metadata_filter or {}
@@ -569,78 +833,40 @@ def _retrieve_from_db_hybrid(
         which: str,
         f: Optional[Dict[str, Any]],
     ) -> Tuple[List[Document], str]:
-        """
-        Helper to run a single retrieval pass with filter f.
-        Returns (docs, log_string).
-        """
-        local_logs: List[str] = [f"[DB {db_name}] Retrieval phase = {which}"]
-
-        search_kwargs: Dict[str, Any] = {"k": k_base}
-        if f:
-            search_kwargs["filter"] = f
-            local_logs.append(
-                f"[DB {db_name}] Using metadata filter: "
-                f"{json.dumps(f, ensure_ascii=False)}"
+        if mandatory_result is not None and f == mandatory_filter:
+            docs_pre, log_pre = mandatory_result
+            return list(docs_pre), (
+                f"[Shards {label}] Retrieval phase = {which} → reusing speculative "
+                f"prefetched result ({len(docs_pre)} doc(s)).\n{log_pre}"
             )
-        else:
-            local_logs.append(f"[DB {db_name}] No metadata filter used.")
-
-        base_retriever = vector_store.as_retriever(search_kwargs=search_kwargs)
-        local_logs.append(
-            f"[DB {db_name}] Base retriever k={k_base} (top_k={top_k})."
+        return _run_hybrid_pass(
+            question=question,
+            collection=collection,
+            db_names=db_names,
+            q_vec=q_vec,
+            top_k=top_k,
+            use_rerank=use_rerank,
+            which=which,
+            f=f,
+            retrieval_mode=retrieval_mode,
+            rrf_k=rrf_k,
+            rerank_config=rerank_config,
+            index_search=index_search,
+            chunk_mode=chunk_mode,
         )
 
-        raw_docs = base_retriever.invoke(question)
-        local_logs.append(
-            f"[DB {db_name}] Raw docs from retriever: {len(raw_docs)}"
-        )
-
-        if use_rerank:
-            local_logs.append(
-                f"[DB {db_name}] Similarity reranking ENABLED (use_rerank=True)."
-            )
-            docs, sim_log = _similarity_rank_and_filter(
-                question=question,
-                docs=raw_docs,
-                embedding_model=embedding_model,
-                top_k=top_k,
-                min_sim=0.1,
-            )
-            local_logs.append(sim_log)
-        else:
-            local_logs.append(
-                f"[DB {db_name}] Similarity reranking DISABLED (use_rerank=False); "
-                f"using top_k={top_k} raw docs in original order."
-            )
-            docs = raw_docs[:top_k]
-
-        if not docs:
-            local_logs.append(
-                f"[DB {db_name}] Result: no docs kept after retrieval/rerank."
-            )
-        else:
-            local_logs.append(
-                f"[DB {db_name}] Result: {len(docs)} doc(s) kept for context."
-            )
-
-        # Tag docs with db_name
-        for d in docs:
-            d.metadata = d.metadata or {}
-            d.metadata["db_name"] = db_name
-
-        return docs, "\n".join(local_logs)
-
     # --- Phase 1: full filter (mandatory + marginal) ---
     docs, log_primary = _run_once("primary (full filter)", full_filter)
     log_lines.append(log_primary)
 
     # If we didn't reach top_k AND there is a stricter filter than just 'law',
-    # run a fallback retrieval using only the mandatory filter.
+    # run a fallback retrieval using only the mandatory filter. With the metadata
+    # pre-filter this only happens when fewer than top_k docs match at all.
     used_fallback = False
     if len(docs) < top_k and mandatory_filter and mandatory_filter != full_filter:
         used_fallback = True
         log_lines.append(
-            f"[DB {db_name}] Fallback triggered: only {len(docs)} doc(s) "
+            f"[Shards {label}] Fallback triggered: only {len(docs)} doc(s) "
             f"from full filter (< top_k={top_k}) → retry with mandatory 'law' only."
         )
         docs_fallback, log_fallback = _run_once(
@@ -653,24 +879,24 @@ def _retrieve_from_db_hybrid(
             docs = docs_fallback
         else:
             log_lines.append(
-                f"[DB {db_name}] Fallback with mandatory 'law' only "
+                f"[Shards {label}] Fallback with mandatory 'law' only "
                 "did not find additional docs; keeping primary result."
             )
 
     elif mandatory_filter and mandatory_filter == full_filter:
         log_lines.append(
-            f"[DB {db_name}] Full filter == mandatory ('law' only); "
+            f"[Shards {label}] Full filter == mandatory ('law' only); "
             "no fallback needed."
         )
     else:
         log_lines.append(
-            f"[DB {db_name}] Full filter produced >= top_k docs "
+            f"[Shards {label}] Full filter produced >= top_k docs "
             f"({len(docs)} >= {top_k}); no fallback to mandatory filter."
         )
 
     # Final summary line
     log_lines.append(
-        f"[DB {db_name}] FINAL docs kept for context: {len(docs)} "
+        f"[Shards {label}] FINAL docs kept for context: {len(docs)} "
         f"(fallback used: {used_fallback})"
     )
 
@@ -789,6 +1015,30 @@ def _metadata_to_text(meta: Dict[str, Any]) -> str:
     return "; ".join(parts)
 
 
+def _generate_answer(
+    llm_backend: LLMBackend,
+    system_prompt: str,
+    user_prompt: str,
+    on_event: Optional[EventSink] = None,
+) -> Tuple[str, float]:
+    """
+    Final answer LLM call (sync). With `on_event`, the answer is streamed as
+    token events. Returns (answer, perf_counter() time of the first piece).
+    """
+    if on_event is None:
+        answer = llm_backend.chat(system_prompt, user_prompt)
+        return answer, time.perf_counter()
+
+    pieces: List[str] = []
+    t_first: Optional[float] = None
+    for piece in llm_backend.stream(system_prompt, user_prompt):
+        if t_first is None:
+            t_first = time.perf_counter()
+        pieces.append(piece)
+        on_event({"type": "token", "text": piece})
+    return "".join(pieces), t_first if t_first is not None else time.perf_counter()
+
+
 # =====================================================================
 # 7. Public entrypoint: hybrid legal RAG (LLM metadata, static retrieval)
 # =====================================================================
@@ -797,6 +1047,7 @@ def hybrid_answer_question(
     question: str,
     config: RAGConfig,
     show_reasoning: bool = False,
+    on_event: Optional[EventSink] = None,
 ) -> Tuple[str, List[Document], Optional[str], Dict[str, Any]]:
     """
     Hybrid legal RAG (NO ReAct):
@@ -804,28 +1055,40 @@ def hybrid_answer_question(
     1. LLM-based metadata extraction from query:
         - 'law' (Inheritance / Divorce) → mandatory (matches document metadata).
         - other fields (civil_codes_used, cost, duration, etc.) → optional.
+        - config.hybrid_metadata_mode: "sequential" (classify, then extract),
+          "parallel" (both at once + speculative 'law'-only retrieval) or
+          "fused" (one LLM call).
 
     2. Static filters:
         - 'law'  → used directly as metadata filter.
-        - first civil code (if present) → civil_codes_used filter.
+        - civil codes (if present) → civil_codes_used filter (any of them, parsed articles / ranges).
 
     3. Heuristic DB selection (NO LLM here):
         - Choose DBs whose name/description matches 'law' keywords.
         - Fall back to ALL DBs if unclear.
 
-    4. Retrieval:
-        - For each chosen DB:
-            - FAISS retriever with metadata filter.
-            - Optional similarity reranking controlled by config.use_rerank.
-            - If full filter (law + marginal) is too strict (len(docs) < top_k),
-              fallback to using only the mandatory filter {'law': ...}.
-        - Concatenate all docs, build context.
+    4. Retrieval (one scatter-gather search over the chosen DBs as shards of
+       one collection, see backend/sharded_collection.py):
+        - DBs that cannot match the metadata filter are pruned; the others
+          are searched in parallel with the filter inside the FAISS search.
+        - Hits are merged into ONE global top_k (duplicates across DBs once).
+        - Optional cross-encoder reranking controlled by config.use_rerank.
+        - If full filter (law + marginal) is too strict (len(docs) < top_k),
+          fallback to using only the mandatory filter {'law': ...}.
+        - Build context from the merged docs.
+
+    0. Answer cache: a near-duplicate of an earlier question (same settings
+       and DB versions) is answered from backend/answer_cache.py, with the
+       metadata extracted back then (config.use_answer_cache).
 
     5. Answer:
         - Single LLM call using:
             - user question
             - stringified metadata injected into the prompt
             - retrieved document context (if any)
+        - on_event given → a "retrieval" event (docs + metadata) is emitted
+          first, then the answer as "token" events (see
+          `stream_hybrid_answer_question`).
 
     Returns:
       - answer_text
@@ -833,15 +1096,45 @@ def hybrid_answer_question(
       - reasoning_trace (logs for UI, not chain-of-thought)
       - metadata_dict (LLM-extracted legal metadata)
     """
+    t_start = time.perf_counter()
     llm_backend = LLMBackend(config)
     embedding_model = get_embedding_model(config)
 
     db_map = _get_vector_db_dirs(config)
+
+    # ---- Step 0: semantic answer cache ----
+    cache_key, hit = lookup_answer(config, "hybrid", question, embedding_model, db_map)
+    if hit is not None:
+        cached_meta = hit.extra.get("metadata") or {}
+        answer, docs, reasoning_trace = serve_cached_answer(
+            hit, show_reasoning, on_event=on_event, metadata=cached_meta
+        )
+        return answer, docs, reasoning_trace, cached_meta
+
     db_descriptions = _describe_databases(db_map, embedding_model)
 
     # ---- Step 1: LLM-based metadata from query ('law' mandatory) ----
-    meta, metadata_log = _extract_legal_metadata_from_query(
-        question, llm_backend
+    metadata_mode = getattr(config, "hybrid_metadata_mode", "sequential")
+    mandatory_results: Dict[str, Tuple[List[Document], str]] = {}
+    t_meta = time.perf_counter()
+    if metadata_mode == "parallel":
+        meta, metadata_log, mandatory_results = _extract_metadata_with_prefetch(
+            question,
+            llm_backend,
+            config=config,
+            embedding_model=embedding_model,
+            db_map=db_map,
+            db_descriptions=db_descriptions,
+        )
+    elif metadata_mode == "fused":
+        meta, metadata_log = _extract_legal_metadata_fused(question, llm_backend)
+    else:
+        meta, metadata_log = _extract_legal_metadata_from_query(
+            question, llm_backend
+        )
+    metadata_log += (
+        f"\nMetadata mode: {metadata_mode} "
+        f"(metadata step took {(time.perf_counter() - t_meta) * 1000:.0f} ms)"
     )
     metadata_filter = _build_metadata_filter(meta)
     metadata_text = _metadata_to_text(meta)  # compact string to inject in prompt
@@ -853,24 +1146,73 @@ def hybrid_answer_question(
         db_descriptions=db_descriptions,
     )
 
-    # ---- Step 3: hybrid retrieval ----
+    # ---- Step 3: hybrid retrieval (one scatter-gather over the chosen DBs) ----
     all_docs: List[Document] = []
     per_db_logs: Dict[str, str] = {}
+    retrieval_timing_log = ""
+    collection = ShardedCollection(
+        {n: db_map[n] for n in chosen_db_names},
+        embedding_model,
+        max_workers=getattr(config, "retrieval_max_workers", 4),
+    )
 
     if chosen_db_names:
-        for db_name in chosen_db_names:
-            db_path = db_map[db_name]
-            docs_db, log_db = _retrieve_from_db_hybrid(
+        # Embed the question ONCE for every DB, both filter passes and reranking
+        q_vec = embed_query_cached(
+            embedding_model,
+            question,
+            use_process_cache=getattr(config, "use_query_embedding_cache", True),
+        )
+        label = ", ".join(chosen_db_names)
+        t0 = time.perf_counter()
+        try:
+            all_docs, log_db = _retrieve_from_collection_hybrid(
                 question=question,
-                db_name=db_name,
-                db_path=db_path,
-                embedding_model=embedding_model,
+                collection=collection,
+                db_names=chosen_db_names,
                 top_k=config.top_k,
                 use_rerank=config.use_rerank,
                 metadata_filter=metadata_filter,
+                query_vector=q_vec,
+                mandatory_result=mandatory_results.get(label),
+                retrieval_mode=getattr(config, "retrieval_mode", "dense"),
+                rrf_k=getattr(config, "rrf_k", 60),
+                rerank_config=config,
+                index_search=query_parameters(config),
+                chunk_mode=getattr(config, "chunk_retrieval_mode", "neighbors"),
             )
-            per_db_logs[db_name] = log_db
-            all_docs.extend(docs_db)
+        except Exception as e:
+            all_docs = []
+            log_db = f"[Shards {label}] ERROR during retrieval: {e!r} → no documents."
+        per_db_logs[label] = log_db
+        retrieval_timing_log = (
+            f"Scatter-gather retrieval over {len(chosen_db_names)} DB(s): "
+            f"wall={(time.perf_counter() - t0) * 1000:.1f} ms (per-DB times in the log above)"
+        )
+
+    # ---- Chunked stores: fold chunk hits into parents / neighbour windows ----
+    chunk_mode = getattr(config, "chunk_retrieval_mode", "neighbors")
+    if all_docs and chunk_mode != "chunks" and any(is_chunk(d) for d in all_docs):
+        n_chunks = len(all_docs)
+        expanded: List[Document] = []
+        for db_name in dict.fromkeys(d.metadata.get("db_name", "") for d in all_docs):
+            db_docs = [d for d in all_docs if d.metadata.get("db_name", "") == db_name]
+            if db_name not in collection.shards:
+                expanded.extend(db_docs)
+                continue
+            for d in expand_chunk_hits(
+                collection.docstore(db_name),
+                db_docs,
+                mode=chunk_mode,
+                window=getattr(config, "chunk_neighbor_window", 1),
+            ):
+                d.metadata["db_name"] = db_name
+                expanded.append(d)
+        all_docs = expanded[: config.top_k]
+        retrieval_timing_log += (
+            f"\nChunk expansion ({chunk_mode}): {n_chunks} chunk hit(s) → "
+            f"{len(all_docs)} document(s)."
+        )
 
     context = _build_context(all_docs) if all_docs else ""
 
@@ -909,7 +1251,19 @@ def hybrid_answer_question(
     )
 
     user_prompt = "\n\n".join(user_parts)
-    answer = llm_backend.chat(system_prompt, user_prompt)
+
+    if on_event is not None:
+        on_event({
+            "type": "retrieval",
+            "docs": all_docs,
+            "db_names": chosen_db_names,
+            "metadata": meta,
+        })
+
+    answer, t_first_token = _generate_answer(
+        llm_backend, system_prompt, user_prompt, on_event=on_event
+    )
+    latency_log = _latency_log(t_start, t_first_token, streaming=on_event is not None)
 
     # ---- Reasoning / logs (but NOT ReAct-style) ----
     reasoning_trace: Optional[str] = None
@@ -923,10 +1277,15 @@ def hybrid_answer_question(
         for db_name, log in per_db_logs.items():
             per_db_log_block += f"\n\n[DB {db_name}]\n{log}"
 
+        cache_stats = get_query_embedding_cache_stats()
         retrieval_log_block = (
             f"LLM-based metadata extraction log:\n{metadata_log}\n\n"
             f"DB routing log:\n{routing_log}\n"
-            f"{per_db_log_block}"
+            f"{per_db_log_block}\n\n"
+            f"{retrieval_timing_log}\n"
+            f"Query embedding cache (process-wide): hits={cache_stats['hits']}, "
+            f"misses={cache_stats['misses']}, size={cache_stats['size']}\n"
+            f"{latency_log}"
         ).strip()
 
         agent_config_log = _build_agent_config_log(
@@ -945,4 +1304,28 @@ def hybrid_answer_question(
             f"```text\n{agent_config_log}\n```"
         )
 
+    store_answer(cache_key, answer, all_docs, reasoning_trace, extra={"metadata": meta})
     return answer, all_docs, reasoning_trace, meta
+
+
+def stream_hybrid_answer_question(
+    question: str,
+    config: RAGConfig,
+    show_reasoning: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming version of `hybrid_answer_question` (generator of events):
+
+      {"type": "retrieval", "docs": [...], "db_names": [...], "metadata": {...}}
+      {"type": "token", "text": "..."}                       answer pieces
+      {"type": "done", "result": (answer, docs, reasoning_trace, metadata),
+       "ttft_s": ..., "total_s": ...}                        last event
+    """
+    return _iter_events(
+        lambda on_event: _submit_in_thread(
+            lambda: hybrid_answer_question(
+                question, config, show_reasoning=show_reasoning, on_event=on_event
+            ),
+            name="hybrid-stream",
+        )
+    )
@@ -0,0 +1,233 @@
+# backend/index_spec.py
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+from .config import RAGConfig
+
+# Role of this module:
+# Which FAISS index type a vector store is saved as. LangChain always builds an
+# exact flat index (IndexFlatL2 / IndexFlatIP); that index stays the working
+# copy while a store is built or updated, and `build_index` converts it to the
+# configured type when the store is saved (see `vector_store.save_vector_store`).
+#
+#   flat      exact search over float32 vectors (default, as before)
+#   ivf_flat  inverted lists (k-means, nlist cells), float32 vectors; nprobe cells searched
+#   ivf_pq    inverted lists + product quantization (~m bytes per vector)
+#   hnsw      HNSW graph over float32 vectors; efSearch candidates explored
+#   sq8       exact scan over 8-bit scalar-quantized vectors (4x smaller)
+#
+# Trained types (ivf_*, sq8) are trained on a random sample of the vectors.
+# nlist / PQ sizes of 0 are derived from the number of vectors; IVF stores
+# with fewer than MIN_IVF_VECTORS vectors stay flat (too few to train k-means,
+# and an exact scan is faster at that size anyway).
+#
+# Query-time nprobe / efSearch come from RAGConfig (`search_parameters`); the
+# values the index was built with are stored in index.faiss and used otherwise.
+
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw", "sq8")
+
+# k-means wants at least this many training points per centroid
+_MIN_POINTS_PER_CENTROID = 39
+_MAX_POINTS_PER_CENTROID = 256
+MIN_IVF_VECTORS = 1000
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    kind: str = "flat"
+    nlist: int = 0              # IVF cells (0 = 4 * sqrt(n), bounded by the training set)
+    pq_m: int = 0               # PQ sub-quantizers (0 = dimension / 8); must divide the dimension
+    pq_nbits: int = 0           # bits per PQ code (0 = 8, fewer for small stores)
+    hnsw_m: int = 32            # HNSW neighbours per node
+    ef_construction: int = 80
+    nprobe: int = 8             # default IVF cells searched (saved with the index)
+    ef_search: int = 64         # default HNSW candidate list (saved with the index)
+
+    def __post_init__(self):
+        if self.kind not in INDEX_KINDS:
+            raise ValueError(f"Unknown index type {self.kind!r} (expected one of {', '.join(INDEX_KINDS)})")
+
+    @property
+    def is_flat(self) -> bool:
+        return self.kind == "flat"
+
+    def signature(self) -> str:
+        """Stored with a store's fingerprints: a different spec means a rebuild."""
+        if self.kind in ("ivf_flat", "ivf_pq"):
+            extra = f":{self.nlist}"
+            if self.kind == "ivf_pq":
+                extra += f":{self.pq_m}x{self.pq_nbits}"
+            return self.kind + extra
+        if self.kind == "hnsw":
+            return f"hnsw:{self.hnsw_m}:{self.ef_construction}"
+        return self.kind
+
+    def factory_string(self, d: int, n: int) -> str:
+        """`faiss.index_factory` description for `n` vectors of dimension `d`."""
+        if self.kind == "flat":
+            return "Flat"
+        if self.kind == "sq8":
+            return "SQ8"
+        if self.kind == "hnsw":
+            return f"HNSW{self.hnsw_m}"
+        nlist = self.nlist or auto_nlist(n)
+        if self.kind == "ivf_flat":
+            return f"IVF{nlist},Flat"
+        m = self.pq_m or auto_pq_m(d)
+        if d % m:
+            raise ValueError(f"PQ sub-quantizers ({m}) must divide the dimension ({d})")
+        nbits = self.pq_nbits or auto_pq_nbits(n)
+        return f"IVF{nlist},PQ{m}x{nbits}"
+
+
+def auto_nlist(n: int) -> int:
+    """4 * sqrt(n) cells, with enough vectors per cell to train k-means."""
+    return max(1, min(int(4 * math.sqrt(n)), n // _MIN_POINTS_PER_CENTROID))
+
+
+def auto_pq_m(d: int) -> int:
+    """About 8 dimensions per sub-quantizer (largest divisor of d not above d / 8)."""
+    for m in range(max(1, d // 8), 0, -1):
+        if d % m == 0:
+            return m
+    return 1
+
+
+def auto_pq_nbits(n: int) -> int:
+    """8-bit codes, or fewer when there are not enough vectors to train 256 centroids."""
+    return int(max(4, min(8, math.floor(math.log2(max(n // _MIN_POINTS_PER_CENTROID, 1))))))
+
+
+def index_spec_from_config(config: RAGConfig) -> IndexSpec:
+    """IndexSpec of the config (flat when unset)."""
+    return IndexSpec(
+        kind=getattr(config, "index_type", "flat") or "flat",
+        nlist=int(getattr(config, "index_nlist", 0)),
+        pq_m=int(getattr(config, "index_pq_m", 0)),
+        hnsw_m=int(getattr(config, "index_hnsw_m", 32)),
+        nprobe=int(getattr(config, "index_nprobe", 8)) or 8,
+        ef_search=int(getattr(config, "index_ef_search", 64)) or 64,
+    )
+
+
+def query_parameters(config: Optional[RAGConfig]) -> Dict[str, int]:
+    """Query-time search settings of the config, as keyword arguments of the search functions."""
+    if config is None:
+        return {}
+    return {
+        "nprobe": int(getattr(config, "index_nprobe", 0) or 0),
+        "ef_search": int(getattr(config, "index_ef_search", 0) or 0),
+    }
+
+
+def build_index(
+    vectors: np.ndarray,
+    spec: IndexSpec,
+    metric: int = faiss.METRIC_L2,
+    train_size: Optional[int] = None,
+    seed: int = 0,
+) -> faiss.Index:
+    """
+    New index of type `spec` holding `vectors` at positions 0..n-1 (the order
+    LangChain's index_to_docstore_id refers to). Trained types are trained on
+    a random sample of at most `train_size` vectors (default: 256 per cell).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    index = faiss.index_factory(d, spec.factory_string(d, n), metric)
+
+    if spec.kind == "hnsw":
+        index.hnsw.efConstruction = spec.ef_construction
+        index.hnsw.efSearch = spec.ef_search
+
+    if not index.is_trained:
+        if train_size is None:
+            cells = faiss.extract_index_ivf(index).nlist if spec.kind.startswith("ivf") else 1
+            train_size = max(cells * _MAX_POINTS_PER_CENTROID, 10_000)
+        sample = vectors
+        if n > train_size:
+            rng = np.random.default_rng(seed)
+            sample = vectors[np.sort(rng.choice(n, train_size, replace=False))]
+        index.train(sample)
+
+    index.add(vectors)
+    if spec.kind.startswith("ivf"):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = min(spec.nprobe, ivf.nlist)
+        # position -> (list, offset) table, so stored vectors can be reconstructed
+        ivf.make_direct_map()
+    return index
+
+
+def convert_index(index: faiss.Index, spec: IndexSpec) -> faiss.Index:
+    """`index` (a flat working index) rebuilt as `spec`; `index` itself if spec is flat."""
+    if spec.is_flat or index.ntotal == 0:
+        return index
+    if spec.kind.startswith("ivf") and index.ntotal < MIN_IVF_VECTORS:
+        print(
+            f"[index_spec] {index.ntotal} vectors: too few to train {spec.kind} "
+            f"(< {MIN_IVF_VECTORS}) → kept flat."
+        )
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    return build_index(vectors, spec, metric=index.metric_type)
+
+
+def is_flat_index(index: faiss.Index) -> bool:
+    """Exact float32 index (what LangChain builds and what can be updated in place)."""
+    return isinstance(index, faiss.IndexFlat)
+
+
+def search_parameters(
+    index: faiss.Index,
+    nprobe: int = 0,
+    ef_search: int = 0,
+    selector: Optional[faiss.IDSelector] = None,
+    selectivity: float = 1.0,
+) -> Optional[faiss.SearchParameters]:
+    """
+    Per-query SearchParameters for `index` (None = index defaults, no selector).
+    nprobe / ef_search of 0 keep the values stored in the index. With a
+    selector matching only `selectivity` of the vectors, HNSW explores
+    proportionally more candidates (up to every vector) so that enough of them pass.
+    """
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(nprobe or ivf.nprobe, ivf.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        ef = ef_search or index.hnsw.efSearch
+        if selector is not None and 0 < selectivity < 1:
+            ef = int(min(max(ef / selectivity, ef), max(index.ntotal, ef)))
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
+
+
+def describe_index(index: faiss.Index) -> Dict[str, Any]:
+    """Type and search settings of an index (for logs / the manifest)."""
+    info: Dict[str, Any] = {"type": type(index).__name__, "ntotal": int(index.ntotal), "d": int(index.d)}
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        info.update(nlist=int(ivf.nlist), nprobe=int(ivf.nprobe))
+    elif isinstance(index, faiss.IndexHNSW):
+        info.update(ef_search=int(index.hnsw.efSearch))
+    return info
@@ -0,0 +1,224 @@
+# backend/lexical_index.py
+from __future__ import annotations
+
+import json
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .manifest import index_fingerprint
+
+# Role of this module:
+# BM25 index of a vector store (`lexical_index.npz`, next to index.faiss), so
+# exact article numbers, case numbers ("N° 236 - 2023") and legal terms can be
+# matched lexically, and fused with the dense FAISS ranking (reciprocal rank
+# fusion over all shards, see `sharded_collection._merge`).
+#
+# Tokenization is the same for every language of the corpus (Italian,
+# Estonian, Slovenian, English translations): accent folding, lowercase,
+# a merged stopword list, and prefix stemming (words cut to their first
+# PREFIX_LEN characters), which works well for inflected languages without
+# per-language stemmers. Numbers are kept whole, and "236 - 2023" / "236/2023"
+# also yield one joined token, so case numbers match as a unit.
+#
+# Postings are CSR arrays over FAISS positions (int32 positions, uint16 term
+# frequencies), stored zlib-compressed.
+
+LEXICAL_INDEX_FILENAME = "lexical_index.npz"
+LEXICAL_INDEX_VERSION = 1
+
+PREFIX_LEN = 6
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_NUMBER_PAIR_RE = re.compile(r"\b(\d+)\s*[-/–]\s*(\d{2,4})\b")
+
+_STOPWORDS = frozenset(
+    # English
+    "a an and are as at be by for from has have if in into is it its of on or "
+    "shall that the their them there these this to was were which who will with "
+    # Italian
+    "al alla alle agli ai che chi con da dal dalla dei del della delle degli di e "
+    "gli i il in la le lo nel nella nelle non o per se si sono su sua suo tra un una uno "
+    # Slovenian
+    "ali da do in iz je ki ko na ne od pa po pri s so v z za "
+    # Estonian
+    "ei ja kui kes ka mis on oli ning see et ta nad"
+    .split()
+)
+
+
+def _fold(text: str) -> str:
+    """Lowercase, accents removed ("č" → "c", "õ" → "o", "è" → "e")."""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    """Index / query terms of `text` (see the module comment)."""
+    text = _fold(text)
+    terms: List[str] = []
+    for word in _WORD_RE.findall(text):
+        if word in _STOPWORDS:
+            continue
+        if word.isdigit():
+            terms.append(word)
+        elif len(word) > 1:
+            terms.append(word[:PREFIX_LEN])
+    terms.extend(f"{a}/{b}" for a, b in _NUMBER_PAIR_RE.findall(text))
+    return terms
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]],
+    k: int = 60,
+) -> List[Tuple[int, float]]:
+    """
+    Fuse ranked lists of ids: score(id) = Σ 1 / (k + rank), rank from 1.
+    Returns (id, score) best first; ties keep first-seen order.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: -kv[1])
+
+
+class LexicalIndex:
+    """BM25 over the documents of one store, addressed by FAISS position."""
+
+    def __init__(
+        self,
+        vocab: List[str],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        tfs: np.ndarray,
+        doc_len: np.ndarray,
+    ):
+        self.vocab = {term: i for i, term in enumerate(vocab)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.n = int(doc_len.shape[0])
+
+        df = np.diff(offsets).astype(np.float32)
+        self.idf = np.log1p((self.n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avgdl = float(doc_len.mean()) if self.n else 1.0
+        # Per-document part of the BM25 denominator
+        self._norm = (BM25_K1 * (1 - BM25_B + BM25_B * doc_len / max(avgdl, 1e-9))).astype(np.float32)
+
+    # ---------------- Build / persist ----------------
+    @classmethod
+    def build(cls, docs: Iterable[Document]) -> "LexicalIndex":
+        """Index documents given in FAISS position order (position = enumeration index)."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        lengths: List[int] = []
+        for pos, doc in enumerate(docs):
+            terms = tokenize(doc.page_content)
+            lengths.append(len(terms))
+            for term, tf in Counter(terms).items():
+                postings.setdefault(term, []).append((pos, tf))
+
+        vocab = sorted(postings)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for i, term in enumerate(vocab):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        doc_ids = np.empty(int(offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.uint16)
+        for i, term in enumerate(vocab):
+            entries = np.asarray(postings[term], dtype=np.int64).reshape(-1, 2)
+            doc_ids[offsets[i]:offsets[i + 1]] = entries[:, 0]
+            tfs[offsets[i]:offsets[i + 1]] = np.minimum(entries[:, 1], np.iinfo(np.uint16).max)
+        return cls(vocab, offsets, doc_ids, tfs, np.asarray(lengths, dtype=np.uint32))
+
+    def save(self, store_dir: str, index_path: str) -> None:
+        """Write lexical_index.npz atomically, tagged with the fingerprint of `index_path`."""
+        header = {
+            "version": LEXICAL_INDEX_VERSION,
+            "prefix_len": PREFIX_LEN,
+            "vocab": sorted(self.vocab, key=self.vocab.get),
+            "index_fingerprint": index_fingerprint(index_path) if os.path.exists(index_path) else "",
+        }
+        path = os.path.join(store_dir, LEXICAL_INDEX_FILENAME)
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(
+                f,
+                header=np.array(json.dumps(header, ensure_ascii=False)),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                tfs=self.tfs,
+                doc_len=self.doc_len,
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, store_dir: str, index_path: str) -> Optional["LexicalIndex"]:
+        """
+        lexical_index.npz of a store, or None if missing, unreadable, built
+        with another tokenizer version, or stale (`index_path` changed).
+        """
+        path = os.path.join(store_dir, LEXICAL_INDEX_FILENAME)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                header = json.loads(str(data["header"]))
+                arrays = {k: data[k] for k in ("offsets", "doc_ids", "tfs", "doc_len")}
+        except (OSError, KeyError, ValueError):
+            return None
+
+        if not isinstance(header, dict) or header.get("version") != LEXICAL_INDEX_VERSION:
+            return None
+        if header.get("prefix_len") != PREFIX_LEN:
+            return None
+        if os.path.exists(index_path):
+            if header.get("index_fingerprint") != index_fingerprint(index_path):
+                return None
+        return cls(header["vocab"], **arrays)
+
+    # ---------------- Search ----------------
+    def search(
+        self,
+        query: str,
+        k: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k (FAISS position, BM25 score) for `query`, best first. Only
+        documents sharing at least one term are returned; `mask` (boolean array
+        over positions, e.g. from the metadata index) restricts the candidates.
+        """
+        if k <= 0:
+            return []
+        scores = np.zeros(self.n, dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            slot = self.vocab.get(term)
+            if slot is None:
+                continue
+            start, end = self.offsets[slot], self.offsets[slot + 1]
+            ids = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype(np.float32)
+            scores[ids] += qtf * self.idf[slot] * tf * (BM25_K1 + 1) / (tf + self._norm[ids])
+
+        if mask is not None:
+            scores[~mask] = 0.0
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in candidates]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "n": self.n,
+            "terms": len(self.vocab),
+            "postings": int(self.doc_ids.shape[0]),
+            "nbytes": int(
+                self.offsets.nbytes + self.doc_ids.nbytes + self.tfs.nbytes + self.doc_len.nbytes
+            ),
+        }
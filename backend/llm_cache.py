@@ -0,0 +1,292 @@
+# backend/llm_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+from .config import RAGConfig
+
+# Role of this module:
+# Exact-match cache of LLM responses for prompts whose answer depends only on
+# the prompt text: the retrieval decision, DB selection, law classification and
+# metadata extraction prompts (opt-in per call: `LLMBackend.chat(..., cache=True)`),
+# and the RAGAS judge prompts of the evaluation page (`LangChainResponseCache`).
+#
+# Keys are sha256 over (provider/model/endpoint, temperature, max tokens,
+# sha256(system prompt), sha256(user prompt)), so a different model or prompt
+# wording never matches. An in-memory LRU sits in front of an optional SQLite
+# file (persists across restarts and is shared by processes; WAL mode).
+#
+# Inspect / clear from a shell:
+#   python -m backend.llm_cache stats
+#   python -m backend.llm_cache clear
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key        TEXT PRIMARY KEY,   -- response_cache_key(...)
+    response   TEXT NOT NULL,
+    created    REAL NOT NULL,
+    last_used  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+# Rows kept in the SQLite file: checked every _TRIM_EVERY inserts, the least
+# recently used rows are then evicted down to _TRIM_TO of the cap
+_MAX_PERSISTED = 50_000
+_TRIM_EVERY = 256
+_TRIM_TO = 0.9
+# `last_used` of rows read from the file is written in batches of this many
+_TOUCH_BATCH = 64
+# The only classes revived from stored LangChain generations
+_GENERATION_CLASSES = [Generation, ChatGeneration, AIMessage]
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def response_cache_key(
+    model: str,
+    temperature: float,
+    system_prompt: str,
+    user_prompt: str,
+    max_tokens: int = 0,
+) -> str:
+    return _sha(
+        f"{model}|{float(temperature)!r}|{int(max_tokens)}|{_sha(system_prompt)}|{_sha(user_prompt)}"
+    )
+
+
+class LLMResponseCache:
+    """
+    {key -> response text}: in-memory LRU of `maxsize` entries, backed by the
+    SQLite file `path` when given (misses in memory are looked up there).
+
+    `get_memory` never touches the file, so async callers can check it inline
+    and run `get` / `put` (disk I/O) in a worker thread. `last_used` of rows
+    read from the file is updated in batches, not committed on every hit.
+    """
+
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None):
+        self.maxsize = int(maxsize)
+        self.path = path or None
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._touched: Dict[str, float] = {}
+        self._puts_since_trim = 0
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _remember(self, key: str, response: str) -> None:
+        # Caller holds the lock
+        self._data[key] = response
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _flush_touched(self) -> None:
+        # Caller holds the lock
+        if self._conn is None or not self._touched:
+            return
+        self._conn.executemany(
+            "UPDATE responses SET last_used = ? WHERE key = ?",
+            [(ts, key) for key, ts in self._touched.items()],
+        )
+        self._conn.commit()
+        self._touched.clear()
+
+    def _trim(self) -> int:
+        # Caller holds the lock (and commits). Least recently used rows first.
+        (n,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        if n <= _MAX_PERSISTED:
+            return 0
+        excess = n - int(_MAX_PERSISTED * _TRIM_TO)
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        return excess
+
+    def get_memory(self, key: str) -> Optional[str]:
+        """In-memory lookup only (no disk I/O); a None here is not counted as a miss."""
+        with self._lock:
+            response = self._data.get(key)
+            if response is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return response
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            response = self._data.get(key)
+            if response is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return response
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT response FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self._touched[key] = time.time()
+                    if len(self._touched) >= _TOUCH_BATCH:
+                        self._flush_touched()
+                    self._remember(key, row[0])
+                    self.hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, response)
+            if self._conn is not None:
+                self._touched.pop(key, None)
+                self._flush_touched()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, created, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, response, now, now),
+                )
+                self._puts_since_trim += 1
+                if self._puts_since_trim >= _TRIM_EVERY:
+                    self._puts_since_trim = 0
+                    self._trim()
+                self._conn.commit()
+
+    def clear(self) -> int:
+        """Forget every response (memory and file). Returns rows deleted from the file."""
+        with self._lock:
+            self._data.clear()
+            self._touched.clear()
+            if self._conn is None:
+                return 0
+            cur = self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            persisted = (
+                self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                if self._conn is not None
+                else 0
+            )
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "persisted": int(persisted),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._flush_touched()
+                self._conn.close()
+                self._conn = None
+
+
+class LangChainResponseCache(BaseCache):
+    """
+    LangChain cache (`ChatOpenAI(..., cache=...)`) over an LLMResponseCache, for
+    LLM calls made by libraries such as RAGAS. Keys are (llm settings string,
+    prompt); generations are stored as LangChain-serialized JSON.
+    """
+
+    def __init__(self, cache: LLMResponseCache):
+        self.cache = cache
+
+    @staticmethod
+    def _key(prompt: str, llm_string: str) -> str:
+        return _sha(f"langchain|{_sha(llm_string)}|{_sha(prompt)}")
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        raw = self.cache.get(self._key(prompt, llm_string))
+        if raw is None:
+            return None
+        try:
+            with warnings.catch_warnings():
+                # `loads` is flagged beta on every call
+                warnings.simplefilter("ignore")
+                try:
+                    return loads(raw, allowed_objects=_GENERATION_CLASSES)
+                except TypeError:
+                    # langchain-core without `allowed_objects`
+                    return loads(raw)
+        except Exception:
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.cache.put(self._key(prompt, llm_string), dumps(list(return_val)))
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.clear()
+
+
+# =====================================================================
+# Process-wide caches
+# =====================================================================
+_CACHES: Dict[str, LLMResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_llm_response_cache(config: RAGConfig) -> Optional[LLMResponseCache]:
+    """The shared response cache of the config (None when disabled); one per file."""
+    if not getattr(config, "use_llm_response_cache", True):
+        return None
+    path = getattr(config, "llm_response_cache_path", "") or ""
+    key = os.path.realpath(os.path.abspath(path)) if path else ""
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = _CACHES[key] = LLMResponseCache(path=path or None)
+        cache.maxsize = int(getattr(config, "llm_response_cache_size", 1024))
+        return cache
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the persistent LLM response cache.")
+    parser.add_argument("--path", default=RAGConfig().llm_response_cache_path)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Number of stored responses")
+    sub.add_parser("clear", help="Delete all responses")
+    args = parser.parse_args()
+
+    if not args.path or not os.path.exists(args.path):
+        print(f"{args.path or '(no path)'}: no LLM response cache file.")
+        raise SystemExit(0)
+
+    cache = LLMResponseCache(path=args.path)
+    if args.command == "stats":
+        print(json.dumps(cache.stats(), indent=2))
+    else:
+        print(f"Deleted {cache.clear()} response(s).")
+    cache.close()
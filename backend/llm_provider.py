@@ -2,20 +2,95 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import os
-from typing import Optional
+import threading
+import weakref
+from typing import AsyncIterator, Dict, Iterator, Optional, Tuple
 
+import httpx
 from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
 
 from .config import RAGConfig
+from .llm_cache import get_llm_response_cache, response_cache_key
 
 
 # Role of this module:
 # Abstracts away LLM details so all other modules call the same simple interface, regardless of provider or model.
 
 
+# (max_connections, max_keepalive_connections, keepalive_expiry, request timeout)
+HTTPPoolSettings = Tuple[int, int, float, float]
+# (provider, model, temperature, max_tokens, base_url, api key fingerprint, HTTP pool settings)
+LLMClientKey = Tuple[str, str, float, int, str, str, HTTPPoolSettings]
+
+# Process-wide client pool: one LangChain chat model (and its keep-alive HTTP
+# connection pool) per key, shared by every LLMBackend instance and thread.
+_LLM_CLIENT_POOL: Dict[LLMClientKey, BaseChatModel] = {}
+_LLM_HTTP_CLIENTS: Dict[LLMClientKey, httpx.Client] = {}
+# Async requests: an httpx.AsyncClient is bound to the event loop it first ran
+# on, so `achat` / `astream` use a chat model pooled per (key, running loop),
+# with its own async keep-alive pool: {(key, id(loop)) -> (loop ref, model, client)}
+_LLM_ASYNC_POOL: Dict[
+    Tuple[LLMClientKey, int],
+    Tuple["weakref.ref[asyncio.AbstractEventLoop]", BaseChatModel, Optional[httpx.AsyncClient]],
+] = {}
+_LLM_POOL_LOCK = threading.Lock()
+
+
+def _key_fingerprint(api_key: Optional[str]) -> str:
+    if not api_key:
+        return ""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def _close_async_client(loop: Optional[asyncio.AbstractEventLoop], client: Optional[httpx.AsyncClient]) -> None:
+    """Close an async client on its own loop (if that loop still runs; else just drop it)."""
+    if client is None or loop is None or loop.is_closed():
+        return
+    try:
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        else:
+            loop.run_until_complete(client.aclose())
+    except Exception:
+        pass
+
+
+def _prune_async_pool() -> None:
+    """Drop async clients of event loops that are gone or closed (caller holds the lock)."""
+    for key, (loop_ref, _, _) in list(_LLM_ASYNC_POOL.items()):
+        loop = loop_ref()
+        if loop is None or loop.is_closed():
+            del _LLM_ASYNC_POOL[key]
+
+
+def close_llm_clients() -> int:
+    """Close every pooled HTTP connection and empty the client pool. Returns #clients closed."""
+    with _LLM_POOL_LOCK:
+        n = len(_LLM_CLIENT_POOL) + len(_LLM_ASYNC_POOL)
+        for http_client in _LLM_HTTP_CLIENTS.values():
+            try:
+                http_client.close()
+            except Exception:
+                pass
+        for loop_ref, _, async_client in _LLM_ASYNC_POOL.values():
+            _close_async_client(loop_ref(), async_client)
+        _LLM_HTTP_CLIENTS.clear()
+        _LLM_CLIENT_POOL.clear()
+        _LLM_ASYNC_POOL.clear()
+        return n
+
+
+def llm_client_pool_size() -> int:
+    with _LLM_POOL_LOCK:
+        _prune_async_pool()
+        return len(_LLM_CLIENT_POOL) + len(_LLM_ASYNC_POOL)
+
+
 class LLMBackend:
     """
     Unified interface for LLM providers:
@@ -23,6 +98,16 @@ class LLMBackend:
       - openrouter   → ChatOpenAI (OpenAI-compatible via OpenRouter)
       - huggingface  → HuggingFaceEndpoint + ChatHuggingFace
 
+    Chat clients are pooled per (provider, model, temperature, max tokens):
+    every LLMBackend with the same settings reuses the same client and its
+    keep-alive HTTP connections (see `RAGConfig.llm_pool_*`). Async calls use
+    a client pooled per running event loop as well, so `achat` works from any
+    loop (`asyncio.run`, the app's background loop, ...).
+
+    `chat` / `achat` with cache=True answer a prompt seen before from the
+    exact-match response cache (backend/llm_cache.py) without a request; only
+    successful responses are stored.
+
     Hugging Face notes:
       - `llm_model_name` must be a valid repo id on HF
         (e.g. `mistralai/Mistral-7B-Instruct-v0.3`) or a local path
@@ -39,19 +124,57 @@ class LLMBackend:
     # ------------------------------------------------------------------
     # OPENROUTER (OpenAI-compatible)
     # ------------------------------------------------------------------
-    def _build_openrouter_chat(self) -> Optional[BaseChatModel]:
+    def _build_openrouter_chat(self, for_async: bool = False) -> Optional[BaseChatModel]:
         api_key = os.getenv("OPENROUTER_API_KEY")
         if not api_key:
             print("[LLMBackend] OPENROUTER_API_KEY not set.")
             return None
 
+        http_kwargs = (
+            {"http_async_client": self._build_async_http_client()}
+            if for_async
+            else {"http_client": self._build_http_client()}
+        )
         return ChatOpenAI(
             model=self.config.llm_model_name,
             temperature=self.temperature,
             api_key=api_key,
-            base_url="https://openrouter.ai/api/v1",
+            base_url=self._base_url(),
+            **http_kwargs,
         )
 
+    def _base_url(self) -> str:
+        return getattr(self.config, "llm_base_url", None) or "https://openrouter.ai/api/v1"
+
+    def _http_pool_limits(self) -> HTTPPoolSettings:
+        """Pool limits and timeout from config (part of the client pool key)."""
+        return (
+            int(getattr(self.config, "llm_pool_max_connections", 20)),
+            int(getattr(self.config, "llm_pool_max_keepalive", 10)),
+            float(getattr(self.config, "llm_pool_keepalive_expiry", 60.0)),
+            float(getattr(self.config, "llm_request_timeout", 120.0)),
+        )
+
+    def _http_pool_settings(self) -> Dict[str, object]:
+        """Keep-alive connection pool limits and timeout (from config)."""
+        max_connections, max_keepalive, keepalive_expiry, timeout = self._http_pool_limits()
+        return {
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            "timeout": httpx.Timeout(timeout),
+        }
+
+    def _build_http_client(self) -> httpx.Client:
+        """HTTP client with keep-alive connection pooling (limits from config)."""
+        return httpx.Client(**self._http_pool_settings())
+
+    def _build_async_http_client(self) -> httpx.AsyncClient:
+        """Async counterpart of `_build_http_client` (used on one event loop only)."""
+        return httpx.AsyncClient(**self._http_pool_settings())
+
     # ------------------------------------------------------------------
     # HUGGING FACE (Inference API via HuggingFaceEndpoint)
     # ------------------------------------------------------------------
@@ -91,32 +214,157 @@ class LLMBackend:
     # ------------------------------------------------------------------
     # Factory
     # ------------------------------------------------------------------
-    def get_langchain_llm(self) -> Optional[BaseChatModel]:
+    def _client_key(self) -> LLMClientKey:
+        """
+        Pool key: every setting a client is built with, so changing any of them
+        (including the HTTP pool limits) builds a new client.
+        """
+        provider = self.config.llm_provider
+        if provider in {"openrouter", "openai"}:
+            return (
+                "openrouter",
+                self.config.llm_model_name,
+                self.temperature,
+                self.max_new_tokens,
+                self._base_url(),
+                _key_fingerprint(os.getenv("OPENROUTER_API_KEY")),
+                self._http_pool_limits(),
+            )
+        hf_token = os.getenv("HUGGINGFACEHUB_API_TOKEN") or os.getenv("HF_TOKEN")
+        return (
+            provider,
+            (self.config.llm_model_name or "").strip(),
+            self.temperature,
+            self.max_new_tokens,
+            "",
+            _key_fingerprint(hf_token),
+            (0, 0, 0.0, 0.0),  # HuggingFaceEndpoint manages its own HTTP sessions
+        )
+
+    def _response_cache_key(self, system_prompt: str, user_prompt: str) -> Optional[str]:
+        """Cache key of a prompt, or None when the response cache is disabled."""
+        if get_llm_response_cache(self.config) is None:
+            return None
+        provider, model, temperature, max_tokens, base_url = self._client_key()[:5]
+        return response_cache_key(
+            f"{provider}:{model}:{base_url}", temperature, system_prompt, user_prompt, max_tokens
+        )
+
+    def _cached_response(self, key: Optional[str], memory_only: bool = False) -> Optional[str]:
+        cache = get_llm_response_cache(self.config) if key is not None else None
+        if cache is None:
+            return None
+        return cache.get_memory(key) if memory_only else cache.get(key)
+
+    def _store_response(self, key: Optional[str], text: str) -> None:
+        cache = get_llm_response_cache(self.config) if key is not None else None
+        if cache is not None and text:
+            try:
+                cache.put(key, text)
+            except Exception as e:
+                print(f"[LLMBackend] Could not cache response: {e}")
+
+    def _build_langchain_llm(self, for_async: bool = False) -> Optional[BaseChatModel]:
         provider = self.config.llm_provider
 
         if provider in {"openrouter", "openai"}:
-            return self._build_openrouter_chat()
+            return self._build_openrouter_chat(for_async=for_async)
 
         if provider == "huggingface":
             return self._build_hf_chat()
 
         return None
 
+    def get_langchain_llm(self) -> Optional[BaseChatModel]:
+        """
+        Returns the pooled chat model for the current settings, building it on
+        first use. Failed builds (missing key, bad model id) are not cached.
+        """
+        key = self._client_key()
+        with _LLM_POOL_LOCK:
+            llm = _LLM_CLIENT_POOL.get(key)
+            if llm is not None:
+                return llm
+
+            llm = self._build_langchain_llm()
+            if llm is not None:
+                _LLM_CLIENT_POOL[key] = llm
+                http_client = getattr(llm, "http_client", None)
+                if isinstance(http_client, httpx.Client):
+                    _LLM_HTTP_CLIENTS[key] = http_client
+            return llm
+
+    def get_async_langchain_llm(self) -> Optional[BaseChatModel]:
+        """
+        Pooled chat model for async calls on the RUNNING event loop (one per
+        settings and loop, see `_LLM_ASYNC_POOL`). Clients of closed loops are
+        dropped on the next lookup.
+        """
+        loop = asyncio.get_running_loop()
+        key = (self._client_key(), id(loop))
+        with _LLM_POOL_LOCK:
+            _prune_async_pool()
+            entry = _LLM_ASYNC_POOL.get(key)
+            # id() of a closed loop can be reused: check it is the same loop
+            if entry is not None and entry[0]() is loop:
+                return entry[1]
+
+            llm = self._build_langchain_llm(for_async=True)
+            if llm is not None:
+                async_client = getattr(llm, "http_async_client", None)
+                _LLM_ASYNC_POOL[key] = (
+                    weakref.ref(loop),
+                    llm,
+                    async_client if isinstance(async_client, httpx.AsyncClient) else None,
+                )
+            return llm
+
     # ------------------------------------------------------------------
-    # High-level chat method used by rag_pipeline
+    # High-level chat methods used by rag_pipeline (sync + async + streaming)
     # ------------------------------------------------------------------
-    def chat(self, system_prompt: str, user_prompt: str) -> str:
-        llm = self.get_langchain_llm()
-        if llm is None:
+    @staticmethod
+    def _not_configured_message() -> str:
+        return (
+            "LLM provider is not correctly configured or the model could not be "
+            "loaded.\n\n"
+            "Please check your Configuration page:\n"
+            "- If provider = **huggingface**, set `llm_model_name` to a valid "
+            "Hugging Face repo id (e.g. `mistralai/Mistral-7B-Instruct-v0.3`) and "
+            "set `HUGGINGFACEHUB_API_TOKEN` in `.env` for private/gated models.\n"
+            "- If provider = **openrouter**, make sure `OPENROUTER_API_KEY` is set."
+        )
+
+    @staticmethod
+    def _format_error(e: Exception) -> str:
+        msg = str(e)
+        if "No endpoints found matching your data policy" in msg:
             return (
-                "LLM provider is not correctly configured or the model could not be "
-                "loaded.\n\n"
-                "Please check your Configuration page:\n"
-                "- If provider = **huggingface**, set `llm_model_name` to a valid "
-                "Hugging Face repo id (e.g. `mistralai/Mistral-7B-Instruct-v0.3`) and "
-                "set `HUGGINGFACEHUB_API_TOKEN` in `.env` for private/gated models.\n"
-                "- If provider = **openrouter**, make sure `OPENROUTER_API_KEY` is set."
+                "[LLM error] OpenRouter blocked the request because your "
+                "account data policy only allows free models. "
+                "Update your data policy at https://openrouter.ai/settings/privacy "
+                "or choose a model that matches your policy (see https://openrouter.ai/models)."
             )
+        return f"[LLM error] {e}"
+
+    @staticmethod
+    def _response_text(resp) -> str:
+        if hasattr(resp, "content"):
+            return resp.content
+        return str(resp)
+
+    def chat(self, system_prompt: str, user_prompt: str, cache: bool = False) -> str:
+        """
+        One chat completion. cache=True → exact-match response cache (for
+        prompts whose answer depends only on the prompt, e.g. classifiers).
+        """
+        cache_key = self._response_cache_key(system_prompt, user_prompt) if cache else None
+        cached = self._cached_response(cache_key)
+        if cached is not None:
+            return cached
+
+        llm = self.get_langchain_llm()
+        if llm is None:
+            return self._not_configured_message()
 
         try:
             # Preferred: role-based messages
@@ -133,16 +381,99 @@ class LLMBackend:
             except Exception as e:
                 return f"[LLM error] {e}"
         except Exception as e:
-            msg = str(e)
-            if "No endpoints found matching your data policy" in msg:
-                return (
-                    "[LLM error] OpenRouter blocked the request because your "
-                    "account data policy only allows free models. "
-                    "Update your data policy at https://openrouter.ai/settings/privacy "
-                    "or choose a model that matches your policy (see https://openrouter.ai/models)."
-                )
-            return f"[LLM error] {e}"
+            return self._format_error(e)
 
-        if hasattr(resp, "content"):
-            return resp.content
-        return str(resp)
+        text = self._response_text(resp)
+        self._store_response(cache_key, text)
+        return text
+
+    async def achat(self, system_prompt: str, user_prompt: str, cache: bool = False) -> str:
+        """
+        Async version of `chat` (uses `ainvoke`; same error handling and cache).
+        Only the in-memory cache lookup runs on the event loop; the SQLite
+        lookup / store run in a worker thread.
+        """
+        cache_key = self._response_cache_key(system_prompt, user_prompt) if cache else None
+        cached = self._cached_response(cache_key, memory_only=True)
+        if cached is None and cache_key is not None:
+            cached = await asyncio.to_thread(self._cached_response, cache_key)
+        if cached is not None:
+            return cached
+
+        llm = self.get_async_langchain_llm()
+        if llm is None:
+            return self._not_configured_message()
+
+        try:
+            messages = [
+                ("system", system_prompt),
+                ("user", user_prompt),
+            ]
+            resp = await llm.ainvoke(messages)
+        except TypeError:
+            combined_prompt = system_prompt + "\n\n" + user_prompt
+            try:
+                resp = await llm.ainvoke(combined_prompt)
+            except Exception as e:
+                return f"[LLM error] {e}"
+        except Exception as e:
+            return self._format_error(e)
+
+        text = self._response_text(resp)
+        if cache_key is not None:
+            await asyncio.to_thread(self._store_response, cache_key, text)
+        return text
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        content = getattr(chunk, "content", chunk)
+        if isinstance(content, str):
+            return content
+        if isinstance(content, list):
+            # Some providers send content blocks: [{"type": "text", "text": ...}]
+            return "".join(
+                b.get("text", "") if isinstance(b, dict) else str(b) for b in content
+            )
+        return str(content or "")
+
+    def stream(self, system_prompt: str, user_prompt: str) -> Iterator[str]:
+        """
+        Streaming version of `chat`: yields the answer text piece by piece as the
+        provider produces it. Errors are yielded as a single text piece (same
+        messages as `chat`), so callers can always just concatenate the pieces.
+        """
+        llm = self.get_langchain_llm()
+        if llm is None:
+            yield self._not_configured_message()
+            return
+
+        messages = [
+            ("system", system_prompt),
+            ("user", user_prompt),
+        ]
+        try:
+            for chunk in llm.stream(messages):
+                text = self._chunk_text(chunk)
+                if text:
+                    yield text
+        except Exception as e:
+            yield self._format_error(e)
+
+    async def astream(self, system_prompt: str, user_prompt: str) -> AsyncIterator[str]:
+        """Async version of `stream` (uses `astream`; same error handling)."""
+        llm = self.get_async_langchain_llm()
+        if llm is None:
+            yield self._not_configured_message()
+            return
+
+        messages = [
+            ("system", system_prompt),
+            ("user", user_prompt),
+        ]
+        try:
+            async for chunk in llm.astream(messages):
+                text = self._chunk_text(chunk)
+                if text:
+                    yield text
+        except Exception as e:
+            yield self._format_error(e)
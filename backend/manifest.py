@@ -0,0 +1,192 @@
+# backend/manifest.py
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Role of this module:
+# Every vector store directory gets a small `manifest.json` describing the WHOLE
+# corpus (metadata histograms, doc count, vector dimension). It is written when
+# the store is built, so routing/description code reads one tiny JSON file
+# instead of opening the store and scanning documents on every question.
+#
+# Stores built before manifests existed get one computed on first use, which is
+# then persisted next to the index (see `vector_store.get_db_manifest`).
+#
+# Version 2 adds a few k-means centroids of the stored (L2-normalized) vectors,
+# used by the local query router (backend/router.py); older manifests are
+# recomputed once.
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 2
+
+# Upper bound on the centroids kept per store (each is `dimension` floats)
+MAX_CENTROIDS = 8
+
+# Metadata fields summarized as {value -> number of documents}
+HISTOGRAM_FIELDS: Tuple[str, ...] = (
+    "law",
+    "type",
+    "corpus",
+    "state",
+    "civil_codes_used",
+    "subject_of_succession",
+    "succession_type",
+    "nature_of_separation",
+)
+
+
+def _values(value: Any) -> List[str]:
+    """Metadata value → list of histogram keys (lists count every element)."""
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [str(v).strip() for v in value if v is not None and str(v).strip()]
+    text = str(value).strip()
+    return [text] if text else []
+
+
+def index_fingerprint(index_path: str, block: int = 1 << 20) -> str:
+    """
+    Content fingerprint of index.faiss: size + sha256 of its first and last MiB.
+    Unlike mtime it survives copies / git checkouts, and it stays cheap for
+    multi-GB indexes (the header holds ntotal, so any add/remove changes it).
+    """
+    size = os.path.getsize(index_path)
+    h = hashlib.sha256(str(size).encode("ascii"))
+    with open(index_path, "rb") as f:
+        h.update(f.read(block))
+        if size > block:
+            f.seek(max(block, size - block))
+            h.update(f.read(block))
+    return f"{size}:{h.hexdigest()[:16]}"
+
+
+def compute_centroids(
+    vectors: np.ndarray,
+    max_k: int = MAX_CENTROIDS,
+    seed: int = 1234,
+) -> Tuple[np.ndarray, List[int]]:
+    """
+    Spherical k-means of the stored vectors: (k, d) unit-norm centroids and the
+    number of vectors assigned to each. k grows with sqrt(n), up to `max_k`;
+    a single centroid is just the normalized mean.
+    """
+    import faiss
+
+    x = np.ascontiguousarray(vectors, dtype=np.float32)
+    if x.ndim != 2 or x.shape[0] == 0:
+        return np.zeros((0, x.shape[-1] if x.ndim == 2 else 0), dtype=np.float32), []
+    faiss.normalize_L2(x)
+
+    k = max(1, min(int(max_k), int(math.sqrt(x.shape[0] / 2))))
+    if k == 1:
+        centroids = x.mean(axis=0, keepdims=True)
+    else:
+        km = faiss.Kmeans(
+            x.shape[1], k, niter=20, spherical=True, seed=seed,
+            min_points_per_centroid=1, verbose=False,
+        )
+        km.train(x)
+        centroids = km.centroids.copy()
+    faiss.normalize_L2(centroids)
+
+    assignment = np.argmax(x @ centroids.T, axis=1)
+    sizes = np.bincount(assignment, minlength=len(centroids))
+    keep = sizes > 0
+    return centroids[keep], [int(c) for c in sizes[keep]]
+
+
+def compute_manifest(
+    docs: Iterable[Document],
+    dimension: int,
+    index_type: str = "",
+    vectors: Optional[np.ndarray] = None,
+) -> Dict[str, Any]:
+    """
+    Full-corpus summary of a store's documents. For chunked stores (see
+    backend/chunking.py) documents are counted once, via their first chunk;
+    `chunk_count` is the number of stored vectors. With `vectors` (all stored
+    vectors, in index order) the manifest also gets their centroids.
+    """
+    histograms: Dict[str, Counter] = {f: Counter() for f in HISTOGRAM_FIELDS}
+    coverage: Counter = Counter()
+    doc_count = 0
+    chunk_count = 0
+
+    for d in docs:
+        chunk_count += 1
+        meta = d.metadata or {}
+        if meta.get("chunk_index", 0) != 0:
+            continue
+        doc_count += 1
+        coverage.update(k for k, v in meta.items() if v not in (None, "", []))
+        for f in HISTOGRAM_FIELDS:
+            histograms[f].update(_values(meta.get(f)))
+
+    manifest: Dict[str, Any] = {
+        "version": MANIFEST_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "doc_count": doc_count,
+        "chunk_count": chunk_count,
+        "dimension": int(dimension),
+        "index_type": index_type,
+        "histograms": {
+            f: dict(c.most_common()) for f, c in histograms.items() if c
+        },
+        "field_coverage": dict(coverage.most_common()),
+    }
+    if vectors is not None and len(vectors):
+        centroids, sizes = compute_centroids(vectors)
+        manifest["centroids"] = [[round(float(v), 5) for v in c] for c in centroids]
+        manifest["centroid_sizes"] = sizes
+    return manifest
+
+
+def write_manifest(store_dir: str, manifest: Dict[str, Any], index_path: str) -> None:
+    """Write manifest.json atomically, tagged with the fingerprint of `index_path`."""
+    manifest = dict(manifest)
+    if os.path.exists(index_path):
+        manifest["index_fingerprint"] = index_fingerprint(index_path)
+
+    path = os.path.join(store_dir, MANIFEST_FILENAME)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def read_manifest(store_dir: str, index_path: str) -> Optional[Dict[str, Any]]:
+    """
+    manifest.json of a store, or None if missing, unreadable, of an older
+    version, or stale (`index_path` changed since it was written).
+    """
+    path = os.path.join(store_dir, MANIFEST_FILENAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    if os.path.exists(index_path):
+        if manifest.get("index_fingerprint") != index_fingerprint(index_path):
+            return None
+    return manifest
+
+
+def format_histogram(hist: Dict[str, int], top: int = 5) -> str:
+    """'A (12), B (3), … +N more' for a {value -> count} histogram."""
+    items = sorted(hist.items(), key=lambda kv: (-kv[1], kv[0]))
+    text = ", ".join(f"{k} ({v})" for k, v in items[:top])
+    if len(items) > top:
+        text += f", … +{len(items) - top} more"
+    return text
@@ -0,0 +1,310 @@
+# backend/metadata_index.py
+from __future__ import annotations
+
+import json
+import os
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .civil_codes import code_intervals, normalize_civil_codes
+from .manifest import index_fingerprint
+
+# Role of this module:
+# Inverted metadata index of a vector store (`metadata_index.npz`, next to
+# index.faiss): for every (field, normalized value) of the filterable fields,
+# the sorted FAISS positions of the documents carrying it (CSR postings).
+#
+# At query time a metadata filter ({"law": ..., "civil_codes_used": ...}) is
+# turned into a bitset over FAISS positions and passed to the search as a FAISS
+# IDSelector (see `vector_store.similarity_search_with_ids`), so the search only
+# scores matching vectors and returns the exact top-k under the filter in one
+# pass, instead of post-filtering the top `fetch_k` hits.
+#
+# Postings, not one bitset per value, are stored: civil codes have thousands
+# of distinct values, and a bitset per value would cost n/8 bytes each.
+#
+# Civil codes are parsed (backend/civil_codes.py) into article intervals,
+# stored as (act id, lo, hi, position) rows sorted by (act id, lo): a
+# `civil_codes_used` filter matches documents citing any article of the same
+# act that overlaps any of the query's codes ("Art. 1430" matches a document
+# citing "Art. 1427 et seq."; "Family Act: 58" does not match article 58 of
+# another act). A query code without an act matches the article in any act.
+
+METADATA_INDEX_FILENAME = "metadata_index.npz"
+METADATA_INDEX_VERSION = 4
+
+CIVIL_CODES_FIELD = "civil_codes_used"
+
+# Fields that filters can be resolved on
+INDEXED_FIELDS: Tuple[str, ...] = (
+    "law",
+    "type",
+    "state",
+    "corpus",
+    "civil_codes_used",
+    "subject_of_succession",
+    "succession_type",
+    "nature_of_separation",
+)
+
+_WS_RE = re.compile(r"\s+")
+_CODE_SPLIT_RE = re.compile(r"[;,]")
+
+
+def _normalize_text(value: Any) -> str:
+    return _WS_RE.sub(" ", str(value)).strip().casefold()
+
+
+def _normalize_civil_codes(value: Any) -> List[str]:
+    # Canonical article keys ("1427+", "768-bis"); text that cites no article
+    # number is kept as plain normalized text
+    keys = normalize_civil_codes(value)
+    if keys:
+        return keys
+    return [t for t in (_normalize_text(p) for p in _CODE_SPLIT_RE.split(str(value))) if t]
+
+
+# field -> (one metadata / filter value → index keys); default: _normalize_text
+_FIELD_NORMALIZERS: Dict[str, Callable[[Any], List[str]]] = {
+    CIVIL_CODES_FIELD: _normalize_civil_codes,
+}
+
+
+def normalize_values(field: str, value: Any) -> List[str]:
+    """Metadata value → index keys (lists contribute every element)."""
+    if value is None:
+        return []
+    items = value if isinstance(value, (list, tuple, set)) else [value]
+    normalize = _FIELD_NORMALIZERS.get(field)
+    keys: List[str] = []
+    for item in items:
+        if item is None:
+            continue
+        if normalize is not None:
+            keys.extend(normalize(item))
+        else:
+            text = _normalize_text(item)
+            if text:
+                keys.append(text)
+    return list(dict.fromkeys(keys))
+
+
+class MetadataIndex:
+    """
+    {(field, normalized value) -> sorted FAISS positions} for one store.
+
+    `mask(filter)` resolves a LangChain-style metadata filter to a boolean
+    array over positions, or None when the filter uses fields or operators the
+    index does not cover (callers then post-filter as before).
+    """
+
+    def __init__(
+        self,
+        n: int,
+        keys: List[Tuple[str, str]],
+        offsets: np.ndarray,
+        positions: np.ndarray,
+        code_intervals: Optional[np.ndarray] = None,
+        acts: Optional[List[str]] = None,
+    ):
+        self.n = int(n)
+        self.offsets = offsets
+        self.positions = positions
+        # (act id, lo, hi, position) rows sorted by (act id, lo); act id = index in `acts`
+        self.code_intervals = (
+            code_intervals if code_intervals is not None else np.zeros((0, 4), dtype=np.int64)
+        )
+        self.acts = list(acts or [])
+        self._act_ids = {act: i for i, act in enumerate(self.acts)}
+        self._slots = {key: i for i, key in enumerate(keys)}
+        self.fields = frozenset(INDEXED_FIELDS)
+
+    # ---------------- Build / persist ----------------
+    @classmethod
+    def build(cls, docs: Iterable[Document]) -> "MetadataIndex":
+        """Index documents given in FAISS position order (position = enumeration index)."""
+        postings: Dict[Tuple[str, str], List[int]] = {}
+        intervals: List[Tuple[int, int, int, int]] = []
+        act_ids: Dict[str, int] = {}
+        n = 0
+        for pos, doc in enumerate(docs):
+            n = pos + 1
+            meta = doc.metadata or {}
+            for f in INDEXED_FIELDS:
+                for key in normalize_values(f, meta.get(f)):
+                    postings.setdefault((f, key), []).append(pos)
+            for act, lo, hi in code_intervals(meta.get(CIVIL_CODES_FIELD)):
+                intervals.append((act_ids.setdefault(act, len(act_ids)), lo, hi, pos))
+
+        keys = sorted(postings)
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        for i, key in enumerate(keys):
+            offsets[i + 1] = offsets[i] + len(postings[key])
+        positions = np.empty(int(offsets[-1]), dtype=np.int64)
+        for i, key in enumerate(keys):
+            positions[offsets[i]:offsets[i + 1]] = postings[key]
+        rows = np.array(sorted(intervals), dtype=np.int64).reshape(-1, 4)
+        return cls(n, keys, offsets, positions, rows, acts=sorted(act_ids, key=act_ids.get))
+
+    def save(self, store_dir: str, index_path: str) -> None:
+        """Write metadata_index.npz atomically, tagged with the fingerprint of `index_path`."""
+        header = {
+            "version": METADATA_INDEX_VERSION,
+            "n": self.n,
+            "keys": [list(k) for k in sorted(self._slots, key=self._slots.get)],
+            "acts": self.acts,
+            "index_fingerprint": index_fingerprint(index_path) if os.path.exists(index_path) else "",
+        }
+        path = os.path.join(store_dir, METADATA_INDEX_FILENAME)
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                header=np.array(json.dumps(header, ensure_ascii=False)),
+                offsets=self.offsets,
+                positions=self.positions,
+                code_intervals=self.code_intervals,
+            )
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, store_dir: str, index_path: str) -> Optional["MetadataIndex"]:
+        """
+        metadata_index.npz of a store, or None if missing, unreadable, of
+        another version, or stale (`index_path` changed since it was written).
+        """
+        path = os.path.join(store_dir, METADATA_INDEX_FILENAME)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                header = json.loads(str(data["header"]))
+                offsets = data["offsets"]
+                positions = data["positions"]
+                intervals = data["code_intervals"]
+        except (OSError, KeyError, ValueError):
+            return None
+
+        if not isinstance(header, dict) or header.get("version") != METADATA_INDEX_VERSION:
+            return None
+        if os.path.exists(index_path):
+            if header.get("index_fingerprint") != index_fingerprint(index_path):
+                return None
+        keys = [(f, v) for f, v in header["keys"]]
+        return cls(header["n"], keys, offsets, positions, intervals, acts=header.get("acts", []))
+
+    # ---------------- Filters ----------------
+    def postings(self, field: str, value: Any) -> np.ndarray:
+        """Positions of the documents whose `field` matches any key of `value`."""
+        parts = []
+        for key in normalize_values(field, value):
+            slot = self._slots.get((field, key))
+            if slot is not None:
+                parts.append(self.positions[self.offsets[slot]:self.offsets[slot + 1]])
+        if not parts:
+            return np.zeros(0, dtype=np.int64)
+        return parts[0] if len(parts) == 1 else np.unique(np.concatenate(parts))
+
+    def _field_mask(self, field: str, cond: Any) -> Optional[np.ndarray]:
+        if field not in self.fields:
+            return None
+        if isinstance(cond, dict):
+            if len(cond) != 1:
+                return None
+            (op, value), = cond.items()
+            if op in ("$eq", "$in"):
+                return self._field_mask(field, value)
+            if op in ("$ne", "$nin"):
+                m = self._field_mask(field, value)
+                return None if m is None else ~m
+            return None  # range / other operators: not indexable
+        mask = np.zeros(self.n, dtype=bool)
+        if field == CIVIL_CODES_FIELD:
+            query = code_intervals(cond)
+            if query:
+                rows = self.code_intervals
+                for act, lo, hi in query:
+                    if act:
+                        act_id = self._act_ids.get(act)
+                        act_ids = [] if act_id is None else [act_id]
+                    else:
+                        act_ids = range(len(self.acts))
+                    for act_id in act_ids:
+                        segment = rows[
+                            int(np.searchsorted(rows[:, 0], act_id, side="left")):
+                            int(np.searchsorted(rows[:, 0], act_id, side="right"))
+                        ]
+                        # Rows with row.lo <= hi are a prefix (sorted by lo within the act)
+                        head = segment[: int(np.searchsorted(segment[:, 1], hi, side="right"))]
+                        mask[head[head[:, 2] >= lo, 3]] = True
+                return mask
+        mask[self.postings(field, cond)] = True
+        return mask
+
+    def _clause_mask(self, key: str, cond: Any) -> Optional[np.ndarray]:
+        if key in ("$and", "$or"):
+            if not isinstance(cond, list) or not cond:
+                return None
+            subs = [self.mask(c) if isinstance(c, dict) else None for c in cond]
+            if any(s is None for s in subs):
+                return None
+            combined = subs[0]
+            for s in subs[1:]:
+                combined = combined & s if key == "$and" else combined | s
+            return combined
+        if key == "$not":
+            inner = self.mask(cond) if isinstance(cond, dict) else None
+            return None if inner is None else ~inner
+        return self._field_mask(key, cond)
+
+    def mask(self, filter: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        Boolean array over FAISS positions for a LangChain-style filter:
+        {field: value} (equality; a list means any-of), {field: {"$eq"|"$in"|
+        "$ne"|"$nin": ...}}, "$and" / "$or" / "$not". Values are compared
+        normalized (case, whitespace) and documents with list-valued metadata
+        match on any element; civil codes match by overlapping articles.
+        None → not resolvable with this index.
+        """
+        mask = np.ones(self.n, dtype=bool)
+        for key, cond in filter.items():
+            sub = self._clause_mask(key, cond)
+            if sub is None:
+                return None
+            mask &= sub
+        return mask
+
+    def selectivity(self, filter: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        {"n", "matches", "fraction", "clauses": {clause -> matches}} of a filter
+        (each top-level clause counted on its own), or None if not resolvable.
+        """
+        mask = np.ones(self.n, dtype=bool)
+        clauses: Dict[str, int] = {}
+        for key, cond in filter.items():
+            sub = self._clause_mask(key, cond)
+            if sub is None:
+                return None
+            clauses[key] = int(sub.sum())
+            mask &= sub
+        matches = int(mask.sum())
+        return {
+            "n": self.n,
+            "matches": matches,
+            "fraction": matches / self.n if self.n else 0.0,
+            "clauses": clauses,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        per_field: Dict[str, int] = {}
+        for f, _ in self._slots:
+            per_field[f] = per_field.get(f, 0) + 1
+        return {
+            "n": self.n,
+            "values": per_field,
+            "postings": int(self.positions.shape[0]),
+            "code_intervals": int(self.code_intervals.shape[0]),
+            "nbytes": int(
+                self.offsets.nbytes + self.positions.nbytes + self.code_intervals.nbytes
+            ),
+        }
@@ -1,56 +1,126 @@
 # backend/rag_multiagent.py
 from __future__ import annotations
 
+import asyncio
+import time
 from dataclasses import replace
 from typing import List, Tuple, Optional, Dict
 
 from langchain_core.documents import Document
 
 from .config import RAGConfig
-from .embeddings import get_embedding_model
+from .embeddings import embed_query_cached, get_embedding_model, QueryEmbeddingCache
 from .llm_provider import LLMBackend
 from .rag_utils import (
     _get_vector_db_dirs,
     _describe_databases,
-    _decide_which_dbs,
+    _adecide_which_dbs,
     _build_agent_config_log,
+    _run_coroutine_sync,
+    _agenerate_answer,
+    _latency_log,
+    EventSink,
 )
-from .rag_single_agent import single_agent_answer_question
+from .rag_single_agent import _search_collection, asingle_agent_answer_question
+from .router import record_routing, route_question_for_dbs
+from .sharded_collection import CollectionSearchResult, ShardedCollection
 
 
-def _multiagent_answer_question_core(
+async def _amultiagent_answer_question_core(
     question: str,
     config: RAGConfig,
     show_reasoning: bool = False,
+    on_event: Optional[EventSink] = None,
 ) -> Tuple[str, List[Document], Optional[str]]:
     """
     Multi-agent pipeline (tool-calling style):
 
-    - Supervisor LLM chooses which specialized RAG agents (DBs) to call.
-    - Each specialized agent runs the single-agent RAG on its own DB.
-    - Supervisor synthesizes a final answer from sub-agent answers.
+    - The local router (backend/router.py) chooses which specialized RAG agents
+      (DBs) to call, or the supervisor LLM when the router is unsure.
+    - The supervisor searches all chosen DBs at once (one scatter-gather over
+      the sharded collection, see backend/sharded_collection.py); each agent
+      gets the hits of its own DB and runs the rest of the single-agent RAG
+      (post-processing + answer) on them.
+      Agents run CONCURRENTLY (at most config.max_concurrent_agents at a time),
+      each bounded by config.subagent_timeout_s; a timed-out agent is cancelled
+      and simply left out of the synthesis. Cancelling does not stop a worker
+      thread already running its retrieval: that thread gets the same deadline
+      and stops at its next step (search / ranking / reranking / expansion),
+      while a single blocking call in flight (e.g. one reranker batch) still
+      runs to completion in the background.
+    - Supervisor synthesizes a final answer as soon as all sub-agents finish.
+      With `on_event`, the merged sub-agent docs are emitted as a "retrieval"
+      event and only the synthesis is streamed (sub-agents never stream).
     """
+    t_start = time.perf_counter()
     supervisor_backend = LLMBackend(config)
     db_map = _get_vector_db_dirs(config)  # {db_name -> path}
 
     # Build descriptions for each DB (used to define "subagent" specializations)
-    embedding_model = get_embedding_model(config)
-    db_descriptions = _describe_databases(db_map, embedding_model)
-
-    # Decide which DBs / sub-agents to use
-    chosen_db_names, routing_log = _decide_which_dbs(
-        question=question,
-        db_map=db_map,
-        db_descriptions=db_descriptions,
-        llm_backend=supervisor_backend,
+    embedding_model = await asyncio.to_thread(get_embedding_model, config)
+    db_descriptions = await asyncio.to_thread(
+        _describe_databases, db_map, embedding_model
     )
 
+    # Per-request query vector cache: the question is embedded once for all sub-agents
+    query_cache = QueryEmbeddingCache(maxsize=None)
+    q_vec = await asyncio.to_thread(
+        embed_query_cached,
+        embedding_model,
+        question,
+        request_cache=query_cache,
+        use_process_cache=getattr(config, "use_query_embedding_cache", True),
+    )
+
+    # Decide which DBs / sub-agents to use: local router first, LLM when it is unsure
+    route = await asyncio.to_thread(
+        route_question_for_dbs, question, q_vec, db_map, config, embedding_model
+    )
+    if route is not None and route.db_names is not None and len(db_map) > 1:
+        chosen_db_names, routing_log = list(route.db_names), route.selection_log()
+    else:
+        chosen_db_names, routing_log = await _adecide_which_dbs(
+            question=question,
+            db_map=db_map,
+            db_descriptions=db_descriptions,
+            llm_backend=supervisor_backend,
+        )
+        if route is not None and len(db_map) > 1:
+            routing_log = route.selection_log() + "\n" + routing_log
+    if route is not None:
+        # Sub-agents get the supervisor's search, so DB selection is the only routing call
+        needs_selection = int(len(db_map) > 1)
+        routing_log += "\n" + record_routing(
+            needs_selection * int(route.db_names is not None), needs_selection
+        )
+
     per_agent_answers: List[Tuple[str, str]] = []
     all_docs: List[Document] = []
     sub_traces: Dict[str, str] = {}
 
-    # Call each selected sub-agent (single-agent RAG restricted to that DB)
-    for db_name in chosen_db_names:
+    # One scatter-gather search over every chosen DB instead of one per sub-agent
+    search_result: Optional[CollectionSearchResult] = None
+    if chosen_db_names:
+        collection = ShardedCollection(
+            {n: db_map[n] for n in chosen_db_names},
+            embedding_model,
+            max_workers=getattr(config, "retrieval_max_workers", 4),
+        )
+        try:
+            search_result = await asyncio.to_thread(
+                _search_collection, question, config, collection, chosen_db_names, q_vec
+            )
+            routing_log += "\n\nShared retrieval:\n" + "\n".join(search_result.log_lines())
+        except Exception as e:
+            # Sub-agents then search their own DB
+            routing_log += f"\n\nShared retrieval failed ({e!r}) → each sub-agent searches its DB."
+
+    max_concurrent = max(1, int(getattr(config, "max_concurrent_agents", 4)))
+    timeout_s = getattr(config, "subagent_timeout_s", None)
+    semaphore = asyncio.Semaphore(max_concurrent)
+    agent_logs: List[str] = []
+
+    async def _run_sub_agent(db_name: str):
         db_path = db_map[db_name]
 
         local_cfg = replace(config)
@@ -60,24 +130,73 @@ def _multiagent_answer_question_core(
         if hasattr(local_cfg, "use_multiagent"):
             local_cfg.use_multiagent = False
 
-        sub_answer, sub_docs, sub_trace = single_agent_answer_question(
-            question, local_cfg, show_reasoning=True
-        )
+        async with semaphore:
+            t0 = time.perf_counter()
+            deadline = time.monotonic() + timeout_s if timeout_s else None
+            result = await asyncio.wait_for(
+                asingle_agent_answer_question(
+                    question,
+                    local_cfg,
+                    show_reasoning=True,
+                    query_cache=query_cache,
+                    search_result=(
+                        search_result.for_shard(db_name) if search_result is not None else None
+                    ),
+                    deadline=deadline,
+                ),
+                timeout=timeout_s,
+            )
+            return result, time.perf_counter() - t0
+
+    # Call the selected sub-agents (single-agent RAG restricted to each DB) concurrently
+    results = await asyncio.gather(
+        *(_run_sub_agent(db_name) for db_name in chosen_db_names),
+        return_exceptions=True,
+    )
+
+    # Merge in the supervisor's routing order (deterministic)
+    for db_name, result in zip(chosen_db_names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            agent_logs.append(
+                f"Sub-agent `{db_name}`: timed out after {timeout_s}s → cancelled, skipped "
+                "(its retrieval thread stops at its next step)."
+            )
+            continue
+        if isinstance(result, BaseException):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            agent_logs.append(f"Sub-agent `{db_name}`: failed ({result!r}) → skipped.")
+            continue
+
+        (sub_answer, sub_docs, sub_trace), elapsed = result
+        agent_logs.append(f"Sub-agent `{db_name}`: finished in {elapsed:.2f}s.")
         per_agent_answers.append((db_name, sub_answer))
         all_docs.extend(sub_docs)
         if sub_trace:
             sub_traces[db_name] = sub_trace
 
+    if agent_logs:
+        routing_log += (
+            f"\n\nSub-agent execution (concurrent, max {max_concurrent} at a time):\n"
+            + "\n".join(agent_logs)
+        )
+
     # If no sub-agents were chosen or produced answers, fallback to single-agent
     if not per_agent_answers:
-        fallback_answer, fallback_docs, fallback_trace = single_agent_answer_question(
-            question, config, show_reasoning=show_reasoning
+        fallback_answer, fallback_docs, fallback_trace = await asingle_agent_answer_question(
+            question,
+            config,
+            show_reasoning=show_reasoning,
+            query_cache=query_cache,
+            on_event=on_event,
         )
         reasoning_trace = None
         if show_reasoning and fallback_trace:
             reasoning_trace = (
-                "**Multi-agent Supervisor**: No specialized agents were selected; "
+                "**Multi-agent Supervisor**: No specialized agents were selected "
+                "or none of them produced an answer; "
                 "falling back to single-agent RAG over all databases.\n\n"
+                f"**Supervisor Routing Log**:\n```text\n{routing_log}\n```\n\n"
                 + fallback_trace
             )
         return fallback_answer, fallback_docs, reasoning_trace
@@ -102,7 +221,19 @@ def _multiagent_answer_question_core(
         "Now provide a single final answer to the user, in your own words."
     )
 
-    final_answer = supervisor_backend.chat(system_prompt, user_prompt)
+    if on_event is not None:
+        on_event({
+            "type": "retrieval",
+            "docs": all_docs,
+            "db_names": [n for n, _ in per_agent_answers],
+        })
+
+    final_answer, t_first_token = await _agenerate_answer(
+        supervisor_backend, system_prompt, user_prompt, on_event=on_event
+    )
+    routing_log += "\n\n" + _latency_log(
+        t_start, t_first_token, streaming=on_event is not None
+    )
 
     # Optional high-level reasoning trace (including agent settings + sub-agent logs)
     reasoning_trace: Optional[str] = None
@@ -156,9 +287,22 @@ def _multiagent_answer_question_core(
     return final_answer, all_docs, reasoning_trace
 
 
+async def amultiagent_answer_question(
+    question: str,
+    config: RAGConfig,
+    show_reasoning: bool = False,
+    on_event: Optional[EventSink] = None,
+) -> Tuple[str, List[Document], Optional[str]]:
+    return await _amultiagent_answer_question_core(
+        question, config, show_reasoning, on_event=on_event
+    )
+
+
 def multiagent_answer_question(
     question: str,
     config: RAGConfig,
     show_reasoning: bool = False,
 ) -> Tuple[str, List[Document], Optional[str]]:
-    return _multiagent_answer_question_core(question, config, show_reasoning)
+    return _run_coroutine_sync(
+        amultiagent_answer_question(question, config, show_reasoning)
+    )
@@ -1,13 +1,63 @@
 # backend/rag_pipeline.py
 from __future__ import annotations
 
-from typing import List, Tuple, Optional
+import asyncio
+from typing import Any, Dict, Iterator, List, Tuple, Optional
 
 from langchain_core.documents import Document
 
+from .answer_cache import lookup_answer, serve_cached_answer, store_answer
 from .config import RAGConfig
-from .rag_single_agent import single_agent_answer_question
-from .rag_multiagent import multiagent_answer_question
+from .embeddings import get_embedding_model
+from .rag_single_agent import asingle_agent_answer_question
+from .rag_multiagent import amultiagent_answer_question
+from .rag_utils import (
+    _get_vector_db_dirs,
+    _run_coroutine_sync,
+    _submit_coroutine,
+    _iter_events,
+    EventSink,
+)
+
+
+async def aanswer_question(
+    question: str,
+    config: RAGConfig,
+    show_reasoning: bool = False,
+    on_event: Optional[EventSink] = None,
+) -> Tuple[str, List[Document], Optional[str]]:
+    """
+    Async entrypoint (asyncio-native, LLM calls via `ainvoke`).
+
+    - If config.use_multiagent is False → single-agent RAG.
+    - If config.use_multiagent is True  → multi-agent supervisor pipeline
+      (sub-agents run concurrently).
+    - on_event given → retrieval/token events are reported while it runs
+      (see `stream_answer_question`).
+    - config.use_answer_cache → a near-duplicate of an earlier question is
+      answered from the semantic answer cache (backend/answer_cache.py).
+    """
+    cache_key = None
+    if getattr(config, "use_answer_cache", False):
+        embedding_model = await asyncio.to_thread(get_embedding_model, config)
+        cache_key, hit = await asyncio.to_thread(
+            lookup_answer, config, "rag", question, embedding_model, _get_vector_db_dirs(config)
+        )
+        if hit is not None:
+            return serve_cached_answer(hit, show_reasoning, on_event=on_event)
+
+    if getattr(config, "use_multiagent", False):
+        result = await amultiagent_answer_question(
+            question, config, show_reasoning, on_event=on_event
+        )
+    else:
+        result = await asingle_agent_answer_question(
+            question, config, show_reasoning, on_event=on_event
+        )
+
+    if cache_key is not None:
+        await asyncio.to_thread(store_answer, cache_key, *result)
+    return result
 
 
 def answer_question(
@@ -20,8 +70,29 @@ def answer_question(
 
     - If config.use_multiagent is False → single-agent RAG (previous behavior).
     - If config.use_multiagent is True  → multi-agent supervisor pipeline.
+
+    Thin sync wrapper over `aanswer_question`.
     """
-    if getattr(config, "use_multiagent", False):
-        return multiagent_answer_question(question, config, show_reasoning)
+    return _run_coroutine_sync(aanswer_question(question, config, show_reasoning))
 
-    return single_agent_answer_question(question, config, show_reasoning)
+
+def stream_answer_question(
+    question: str,
+    config: RAGConfig,
+    show_reasoning: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming version of `answer_question` (generator of events):
+
+      {"type": "retrieval", "docs": [...], "db_names": [...]}   before the answer
+      {"type": "token", "text": "..."}                          answer pieces
+      {"type": "done", "result": (answer, docs, reasoning_trace),
+       "ttft_s": ..., "total_s": ...}                           last event
+
+    `ttft_s` is the time to the first answer token, `total_s` the full latency.
+    """
+    return _iter_events(
+        lambda on_event: _submit_coroutine(
+            aanswer_question(question, config, show_reasoning, on_event=on_event)
+        )
+    )
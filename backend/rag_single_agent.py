@@ -1,20 +1,37 @@
 # backend/rag_single_agent.py
 from __future__ import annotations
 
+import asyncio
+import time
+from collections import Counter
 from typing import List, Tuple, Optional, Dict
 
 import numpy as np
 from langchain_core.documents import Document
 
+from .chunking import expand_chunk_hits, is_chunk
 from .config import RAGConfig
-from .embeddings import get_embedding_model
+from .embedding_cache import embed_documents_cached
+from .embeddings import (
+    get_embedding_model,
+    embed_query_cached,
+    get_query_embedding_cache_stats,
+    QueryEmbeddingCache,
+)
+from .index_spec import query_parameters
 from .llm_provider import LLMBackend
-from .vector_store import load_vector_store
+from .reranker import rerank_documents
+from .router import record_routing, route_question_for_dbs
+from .sharded_collection import CollectionSearchResult, ShardedCollection
 from .rag_utils import (
     _get_vector_db_dirs,
     _describe_databases,
-    _decide_which_dbs,
+    _adecide_which_dbs,
     _build_agent_config_log,
+    _run_coroutine_sync,
+    _agenerate_answer,
+    _latency_log,
+    EventSink,
 )
 
 
@@ -44,9 +61,14 @@ def _similarity_rank_and_filter(
     embedding_model,
     top_k: int,
     min_sim: float = 0.1,
+    query_vector: Optional[np.ndarray] = None,
+    doc_vectors: Optional[np.ndarray] = None,
 ) -> Tuple[List[Document], str]:
     """
     Rank docs by cosine similarity and filter below min_sim.
+
+    If `doc_vectors` (vectors already stored in the FAISS index, one row per doc)
+    is given, the documents are NOT re-embedded; same for `query_vector`.
     Returns (filtered_docs, log_string).
     """
     log_lines: List[str] = []
@@ -55,9 +77,17 @@ def _similarity_rank_and_filter(
         log_lines.append("No documents returned from base retriever.")
         return [], "\n".join(log_lines)
 
-    q_vec = np.array(embedding_model.embed_query(question), dtype="float32")
-    doc_texts = [d.page_content for d in docs]
-    doc_vecs = np.array(embedding_model.embed_documents(doc_texts), dtype="float32")
+    if query_vector is None:
+        query_vector = embedding_model.embed_query(question)
+    q_vec = np.asarray(query_vector, dtype="float32")
+
+    if doc_vectors is not None and len(doc_vectors) == len(docs):
+        doc_vecs = np.asarray(doc_vectors, dtype="float32")
+        vec_source = "stored FAISS vectors"
+    else:
+        doc_texts = [d.page_content for d in docs]
+        doc_vecs = embed_documents_cached(embedding_model, doc_texts)
+        vec_source = "re-embedded documents (embedding cache)"
 
     q_norm = np.linalg.norm(q_vec)
     doc_norms = np.linalg.norm(doc_vecs, axis=1)
@@ -69,10 +99,10 @@ def _similarity_rank_and_filter(
     sims_max = float(np.max(sims))
     sims_mean = float(np.mean(sims))
 
-    indices = [i for i, s in enumerate(sims) if s >= min_sim]
+    indices = np.flatnonzero(sims >= min_sim)
     num_after_threshold = len(indices)
 
-    if not indices:
+    if num_after_threshold == 0:
         log_lines.append(
             f"Similarity filtering: {num_raw} raw docs → 0 kept "
             f"(threshold={min_sim:.3f}, "
@@ -80,7 +110,7 @@ def _similarity_rank_and_filter(
         )
         return [], "\n".join(log_lines)
 
-    indices_sorted = sorted(indices, key=lambda i: sims[i], reverse=True)[:top_k]
+    indices_sorted = indices[np.argsort(-sims[indices], kind="stable")][:top_k]
     final_docs = [docs[i] for i in indices_sorted]
 
     sims_kept = sims[indices_sorted]
@@ -90,7 +120,7 @@ def _similarity_rank_and_filter(
 
     log_lines.append(
         "Similarity filtering + reranking:\n"
-        f"- Raw docs from retriever: {num_raw}\n"
+        f"- Raw docs from retriever: {num_raw} (scored with {vec_source})\n"
         f"- Docs above threshold {min_sim:.3f}: {num_after_threshold}\n"
         f"- Final top_k={top_k} docs kept: {len(final_docs)}\n"
         f"- Similarity stats (all raw): min={sims_min:.3f}, max={sims_max:.3f}, "
@@ -102,47 +132,142 @@ def _similarity_rank_and_filter(
     return final_docs, "\n".join(log_lines)
 
 
-def _retrieve_documents_from_db(
+def _check_deadline(deadline: Optional[float], step: str) -> None:
+    """
+    Raise TimeoutError once `deadline` (a time.monotonic() value) has passed.
+    Called between the steps of threaded work: cancelling the asyncio task that
+    awaits a worker thread does not stop the thread itself.
+    """
+    if deadline is not None and time.monotonic() > deadline:
+        raise TimeoutError(f"deadline passed before {step}")
+
+
+def _search_collection(
+    question: str,
+    config: RAGConfig,
+    collection: ShardedCollection,
+    db_names: List[str],
+    query_vector: np.ndarray,
+) -> CollectionSearchResult:
+    """One scatter-gather search of the question over the shards `db_names`."""
+    return collection.search(
+        question,
+        query_vector,
+        k=max(config.top_k * 3, config.top_k),
+        names=db_names,
+        retrieval_mode=getattr(config, "retrieval_mode", "dense"),
+        rrf_k=getattr(config, "rrf_k", 60),
+        **query_parameters(config),
+    )
+
+
+def _retrieve_documents_from_collection(
     question: str,
     config: RAGConfig,
     embedding_model,
-    db_name: str,
-    db_path: str,
+    collection: ShardedCollection,
+    db_names: List[str],
+    query_vector: Optional[np.ndarray] = None,
+    search_result: Optional[CollectionSearchResult] = None,
+    deadline: Optional[float] = None,
 ) -> Tuple[List[Document], str]:
     """
-    Retrieve docs from a single FAISS DB at db_path, single-query only.
+    Retrieve docs from the shards `db_names` of the collection with ONE
+    scatter-gather search (merged top-k over all of them), single-query only.
+    `query_vector` is the already-embedded question (embedded here if None);
+    `search_result` is an already run search (e.g. by the multi-agent
+    supervisor), post-processed instead of searching again.
+    Past `deadline` (time.monotonic()), TimeoutError is raised before the next
+    step (search, similarity ranking, reranking, chunk expansion).
     Returns (docs_kept, log_string).
     """
-    log_lines: List[str] = [f"[DB {db_name}] path={db_path}"]
-
-    vector_store = load_vector_store(db_path, embedding_model)
-
+    label = ", ".join(db_names)
     k_base = max(config.top_k * 3, config.top_k)
-    base_retriever = vector_store.as_retriever(search_kwargs={"k": k_base})
-    log_lines.append(f"[DB {db_name}] Base retriever k={k_base} (top_k={config.top_k}).")
+    log_lines: List[str] = [
+        f"[Shards {label}] Base retriever k={k_base} (top_k={config.top_k}), merged over all shards."
+    ]
+
+    log_lines.append("Multi-query retrieval DISABLED.")
+    q_vec = query_vector
+    if q_vec is None:
+        q_vec = embed_query_cached(embedding_model, question)
+    fusion = getattr(config, "retrieval_mode", "dense") == "fusion"
+    if search_result is None:
+        _check_deadline(deadline, "the search")
+        search_result = _search_collection(question, config, collection, db_names, q_vec)
+    else:
+        log_lines.append("Reusing the supervisor's scatter-gather search.")
+    log_lines.extend(search_result.log_lines())
+    if fusion:
+        log_lines.append(
+            f"Retrieval mode: fusion (FAISS + BM25, reciprocal rank fusion, "
+            f"k={getattr(config, 'rrf_k', 60)})."
+        )
+    hits = search_result.hits
+    raw_docs = [h.doc for h in hits]
 
-    log_lines.append(f"[DB {db_name}] Multi-query retrieval DISABLED.")
-    raw_docs = base_retriever.invoke(question)
+    log_lines.append(f"Raw docs from retriever: {len(raw_docs)}")
 
-    log_lines.append(f"[DB {db_name}] Raw docs from retriever: {len(raw_docs)}")
+    # Chunked store: rank every hit, then fold chunks into top_k parents
+    chunk_mode = getattr(config, "chunk_retrieval_mode", "neighbors")
+    expand = chunk_mode != "chunks" and any(is_chunk(d) for d in raw_docs)
 
-    docs, sim_log = _similarity_rank_and_filter(
-        question=question,
-        docs=raw_docs,
-        embedding_model=embedding_model,
-        top_k=config.top_k,
-        min_sim=0.1,
-    )
-    log_lines.append(sim_log)
+    keep = k_base if expand else config.top_k
+    if fusion:
+        # The fused ranking is the ranking: a dense-similarity pass would push
+        # back exactly the lexical matches fusion is meant to surface
+        docs = raw_docs
+        log_lines.append(f"Fused ranking kept: {len(docs)} candidate(s) (no similarity filtering).")
+    else:
+        _check_deadline(deadline, "similarity ranking")
+        # Reuse the vectors already stored in the shards instead of re-embedding docs
+        doc_vecs = collection.stored_vectors(hits)
+        docs, sim_log = _similarity_rank_and_filter(
+            question=question,
+            docs=raw_docs,
+            embedding_model=embedding_model,
+            top_k=k_base,
+            min_sim=0.1,
+            query_vector=q_vec,
+            doc_vectors=doc_vecs,
+        )
+        log_lines.append(sim_log)
+
+    if config.use_rerank and docs:
+        _check_deadline(deadline, "reranking")
+        docs, rerank_log = rerank_documents(question, docs, config, top_k=keep)
+        log_lines.append(rerank_log)
+    docs = docs[:keep]
+
+    if expand and docs:
+        _check_deadline(deadline, "chunk expansion")
+        n_chunks = len(docs)
+        expanded: List[Document] = []
+        # Chunks are folded within their own shard, in rank order of shards
+        for db_name in dict.fromkeys(d.metadata.get("db_name", "") for d in docs):
+            shard_docs = [d for d in docs if d.metadata.get("db_name", "") == db_name]
+            for d in expand_chunk_hits(
+                collection.docstore(db_name),
+                shard_docs,
+                mode=chunk_mode,
+                window=getattr(config, "chunk_neighbor_window", 1),
+            ):
+                d.metadata["db_name"] = db_name
+                expanded.append(d)
+        docs = expanded[: config.top_k]
+        log_lines.append(
+            f"Chunk expansion ({chunk_mode}): {n_chunks} chunk hit(s) → {len(docs)} document(s)."
+        )
 
     if not docs:
-        log_lines.append(f"[DB {db_name}] Result: no docs kept after filtering.")
+        log_lines.append("Result: no docs kept after filtering.")
     else:
-        log_lines.append(f"[DB {db_name}] Result: {len(docs)} doc(s) kept for context.")
-
-    for d in docs:
-        d.metadata = d.metadata or {}
-        d.metadata["db_name"] = db_name
+        per_shard = Counter(d.metadata.get("db_name", "") for d in docs)
+        log_lines.append(
+            f"Result: {len(docs)} doc(s) kept for context ("
+            + ", ".join(f"{n}={c}" for n, c in per_shard.items())
+            + ")."
+        )
 
     return docs, "\n".join(log_lines)
 
@@ -150,7 +275,7 @@ def _retrieve_documents_from_db(
 # =====================================================================
 # Agentic decision: do we need retrieval?
 # =====================================================================
-def _decide_need_retrieval(
+async def _adecide_need_retrieval(
     question: str,
     config: RAGConfig,
     llm_backend: LLMBackend,
@@ -164,7 +289,7 @@ def _decide_need_retrieval(
     )
     user_prompt = f"Question:\n{question}\n\nAnswer YES or NO only."
 
-    resp = llm_backend.chat(system_prompt, user_prompt).strip().lower()
+    resp = (await llm_backend.achat(system_prompt, user_prompt, cache=True)).strip().lower()
 
     if "yes" in resp and "no" not in resp:
         return True, f"Retrieval decision: model answered '{resp}' → USE retrieval."
@@ -177,7 +302,7 @@ def _decide_need_retrieval(
 # =====================================================================
 # Helper: summarized Observation text (using content + LLM)
 # =====================================================================
-def _build_observation_text(
+async def _abuild_observation_text(
     question: str,
     need_retrieval: bool,
     used_db_names: List[str],
@@ -231,28 +356,72 @@ def _build_observation_text(
         "- (optional) bullet point 3\n"
     )
 
-    explanation = llm_backend.chat(system_prompt, user_prompt)
+    explanation = await llm_backend.achat(system_prompt, user_prompt)
     return explanation
 
 
 # =====================================================================
-# SINGLE-AGENT CORE (ReAct-style)
+# SINGLE-AGENT CORE (ReAct-style, asyncio-native)
 # =====================================================================
-def _single_agent_answer_question_core(
+async def _asingle_agent_answer_question_core(
     question: str,
     config: RAGConfig,
     show_reasoning: bool = False,
+    query_cache: Optional[QueryEmbeddingCache] = None,
+    on_event: Optional[EventSink] = None,
+    search_result: Optional[CollectionSearchResult] = None,
+    deadline: Optional[float] = None,
 ) -> Tuple[str, List[Document], Optional[str]]:
     """
     Original ReAct-style single-agent RAG pipeline (no multi-agent supervisor).
+
+    LLM calls use `ainvoke`; blocking work (embedding model, FAISS search) runs
+    in worker threads so many agents can share one event loop.
+    `query_cache` is an optional per-request cache of query vectors, shared by
+    the multi-agent supervisor with all of its sub-agents.
+    `on_event` (optional) receives a "retrieval" event once the context docs are
+    known and then the final answer as streamed "token" events.
+    `search_result` is the supervisor's search restricted to this agent's
+    shard(s): retrieval is then already decided and done (no decision / DB
+    selection LLM calls), only post-processed here.
+    `deadline` (time.monotonic(), optional) is passed to the threaded retrieval,
+    which stops between its steps once it has passed: a caller that cancels
+    this coroutine on a timeout cannot stop the worker thread otherwise.
     """
+    t_start = time.perf_counter()
     llm_backend = LLMBackend(config)
     db_map = _get_vector_db_dirs(config)  # {db_name -> path}
 
+    # ---- Local router: both routing decisions without the LLM when confident ----
+    route = None
+    q_vec = None
+    if search_result is None and getattr(config, "use_local_router", True):
+        embedding_model = await asyncio.to_thread(get_embedding_model, config)
+        q_vec = await asyncio.to_thread(
+            embed_query_cached,
+            embedding_model,
+            question,
+            request_cache=query_cache,
+            use_process_cache=getattr(config, "use_query_embedding_cache", True),
+        )
+        route = await asyncio.to_thread(
+            route_question_for_dbs, question, q_vec, db_map, config, embedding_model
+        )
+
     # ---- Thought: need retrieval? ----
-    need_retrieval, decision_log = _decide_need_retrieval(
-        question, config, llm_backend
-    )
+    if search_result is not None:
+        need_retrieval, decision_log = True, (
+            "Retrieval decision: the supervisor already searched this agent's "
+            "shard(s) → USE retrieval."
+        )
+    elif route is not None and route.need_retrieval is not None:
+        need_retrieval, decision_log = route.need_retrieval, route.retrieval_log()
+    else:
+        need_retrieval, decision_log = await _adecide_need_retrieval(
+            question, config, llm_backend
+        )
+        if route is not None:
+            decision_log = route.retrieval_log() + "\n" + decision_log
 
     retrieved_docs: List[Document] = []
     used_db_names: List[str] = []
@@ -263,29 +432,63 @@ def _single_agent_answer_question_core(
     # ---- Action: if needed, pick DBs & retrieve ----
     db_descriptions: Dict[str, str] = {}
     if need_retrieval:
-        embedding_model = get_embedding_model(config)
-        db_descriptions = _describe_databases(db_map, embedding_model)
+        embedding_model = await asyncio.to_thread(get_embedding_model, config)
+        db_descriptions = await asyncio.to_thread(
+            _describe_databases, db_map, embedding_model
+        )
 
-        used_db_names, db_selection_log = _decide_which_dbs(
-            question=question,
-            db_map=db_map,
-            db_descriptions=db_descriptions,
-            llm_backend=llm_backend,
+        if search_result is not None:
+            used_db_names = [n for n in db_map if n in search_result.searched] or list(db_map)
+            db_selection_log = "DB selection: assigned by the supervisor → " + ", ".join(used_db_names)
+        elif route is not None and route.db_names is not None and len(db_map) > 1:
+            used_db_names, db_selection_log = list(route.db_names), route.selection_log()
+        else:
+            used_db_names, db_selection_log = await _adecide_which_dbs(
+                question=question,
+                db_map=db_map,
+                db_descriptions=db_descriptions,
+                llm_backend=llm_backend,
+            )
+            if route is not None and len(db_map) > 1:
+                db_selection_log = route.selection_log() + "\n" + db_selection_log
+
+    if route is not None:
+        # Without the router: the retrieval decision, plus DB selection when
+        # retrieval is used over several DBs
+        needs_selection = need_retrieval and len(db_map) > 1
+        saved = int(route.need_retrieval is not None) + int(
+            needs_selection and route.db_names is not None
         )
+        decision_log += "\n" + record_routing(saved, 1 + int(needs_selection))
 
+    if need_retrieval:
         if used_db_names:
-            all_docs: List[Document] = []
-            for db_name in used_db_names:
-                db_path = db_map[db_name]
-                docs_db, log_db = _retrieve_documents_from_db(
-                    question=question,
-                    config=config,
-                    embedding_model=embedding_model,
-                    db_name=db_name,
-                    db_path=db_path,
+            # Embed the question ONCE and reuse the vector for every shard + reranking
+            if q_vec is None:
+                q_vec = await asyncio.to_thread(
+                    embed_query_cached,
+                    embedding_model,
+                    question,
+                    request_cache=query_cache,
+                    use_process_cache=getattr(config, "use_query_embedding_cache", True),
                 )
-                per_db_logs[db_name] = log_db
-                all_docs.extend(docs_db)
+            collection = ShardedCollection(
+                {n: db_map[n] for n in used_db_names},
+                embedding_model,
+                max_workers=getattr(config, "retrieval_max_workers", 4),
+            )
+            all_docs, log_db = await asyncio.to_thread(
+                _retrieve_documents_from_collection,
+                question=question,
+                config=config,
+                embedding_model=embedding_model,
+                collection=collection,
+                db_names=used_db_names,
+                query_vector=q_vec,
+                search_result=search_result,
+                deadline=deadline,
+            )
+            per_db_logs[", ".join(used_db_names)] = log_db
 
             retrieved_docs = all_docs
             context = _build_context(retrieved_docs)
@@ -323,7 +526,13 @@ def _single_agent_answer_question_core(
         user_parts.append("Provide a concise, accurate answer.")
         user_prompt = "\n\n".join(user_parts)
 
-    answer = llm_backend.chat(system_prompt, user_prompt)
+    if on_event is not None:
+        on_event({"type": "retrieval", "docs": retrieved_docs, "db_names": used_db_names})
+
+    answer, t_first_token = await _agenerate_answer(
+        llm_backend, system_prompt, user_prompt, on_event=on_event
+    )
+    latency_log = _latency_log(t_start, t_first_token, streaming=on_event is not None)
 
     # ---- Optional ReAct-style trace + retrieval + agent config logs ----
     reasoning_trace: Optional[str] = None
@@ -356,7 +565,7 @@ def _single_agent_answer_question_core(
                 "The agent skipped retrieval and relied solely on its own knowledge."
             )
 
-        observation_str = _build_observation_text(
+        observation_str = await _abuild_observation_text(
             question=question,
             need_retrieval=need_retrieval,
             used_db_names=used_db_names,
@@ -369,10 +578,23 @@ def _single_agent_answer_question_core(
             for db_name, log in per_db_logs.items():
                 per_db_log_block += f"\n\n[DB {db_name}]\n{log}"
 
+        cache_stats = get_query_embedding_cache_stats()
+        query_cache_log = (
+            f"Query embedding cache (process-wide): hits={cache_stats['hits']}, "
+            f"misses={cache_stats['misses']}, size={cache_stats['size']}"
+        )
+        if query_cache is not None:
+            req_stats = query_cache.stats()
+            query_cache_log += (
+                f" | per-request: hits={req_stats['hits']}, misses={req_stats['misses']}"
+            )
+
         retrieval_log_block = (
             f"{decision_log}\n\n"
             f"{db_selection_log}\n"
-            f"{per_db_log_block.strip()}"
+            f"{per_db_log_block.strip()}\n\n"
+            f"{query_cache_log}\n"
+            f"{latency_log}"
         ).strip()
 
         agent_config_log = _build_agent_config_log(
@@ -394,10 +616,35 @@ def _single_agent_answer_question_core(
     return answer, retrieved_docs, reasoning_trace
 
 
-# Public alias
+# Public aliases (async + thin sync wrapper)
+async def asingle_agent_answer_question(
+    question: str,
+    config: RAGConfig,
+    show_reasoning: bool = False,
+    query_cache: Optional[QueryEmbeddingCache] = None,
+    on_event: Optional[EventSink] = None,
+    search_result: Optional[CollectionSearchResult] = None,
+    deadline: Optional[float] = None,
+) -> Tuple[str, List[Document], Optional[str]]:
+    return await _asingle_agent_answer_question_core(
+        question,
+        config,
+        show_reasoning,
+        query_cache=query_cache,
+        on_event=on_event,
+        search_result=search_result,
+        deadline=deadline,
+    )
+
+
 def single_agent_answer_question(
     question: str,
     config: RAGConfig,
     show_reasoning: bool = False,
+    query_cache: Optional[QueryEmbeddingCache] = None,
 ) -> Tuple[str, List[Document], Optional[str]]:
-    return _single_agent_answer_question_core(question, config, show_reasoning)
+    return _run_coroutine_sync(
+        asingle_agent_answer_question(
+            question, config, show_reasoning, query_cache=query_cache
+        )
+    )
@@ -1,14 +1,151 @@
 # backend/rag_utils.py
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import List, Dict, Optional, Tuple
-
-from langchain_core.documents import Document
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Iterator, List, Dict, Optional, Tuple, TypeVar
 
 from .config import RAGConfig
 from .llm_provider import LLMBackend
-from .vector_store import load_vector_store
+from .manifest import format_histogram
+from .vector_store import get_db_manifest
+
+T = TypeVar("T")
+
+# Background event loop used by the sync API (thin wrappers over the async
+# pipelines). One long-lived loop keeps async HTTP connections reusable across
+# calls and works even if the caller already runs its own event loop.
+_ASYNC_LOOP: Optional[asyncio.AbstractEventLoop] = None
+_ASYNC_LOOP_LOCK = threading.Lock()
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _ASYNC_LOOP
+    with _ASYNC_LOOP_LOCK:
+        if _ASYNC_LOOP is None or _ASYNC_LOOP.is_closed():
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(
+                target=loop.run_forever, name="rag-async-loop", daemon=True
+            )
+            thread.start()
+            _ASYNC_LOOP = loop
+        return _ASYNC_LOOP
+
+
+def _run_coroutine_sync(coro: Awaitable[T]) -> T:
+    """Run an async pipeline to completion from synchronous code."""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_background_loop())
+    return future.result()
+
+
+# =====================================================================
+# Streaming helpers (event callback → generator)
+# =====================================================================
+# Pipelines report progress through an optional `on_event` callback:
+#   {"type": "retrieval", "docs": [...], "db_names": [...]}  once docs are known
+#   {"type": "token", "text": "..."}                          answer pieces
+# The `stream_*` generators turn those callbacks into events for the UI.
+EventSink = Callable[[Dict[str, Any]], None]
+
+_STREAM_END = object()
+
+
+def _submit_coroutine(coro: Awaitable[T]) -> "Future[T]":
+    """Start an async pipeline on the background loop without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_background_loop())
+
+
+def _submit_in_thread(fn: Callable[[], T], name: str = "rag-stream") -> "Future[T]":
+    """Start a sync pipeline on a daemon thread without waiting for it."""
+    future: "Future[T]" = Future()
+
+    def _target() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=_target, name=name, daemon=True).start()
+    return future
+
+
+def _iter_events(submit: Callable[[EventSink], "Future[Any]"]) -> Iterator[Dict[str, Any]]:
+    """
+    Run a pipeline in the background (`submit(on_event)` must start it and return
+    its Future) and yield its events as they happen, followed by:
+
+        {"type": "done", "result": <pipeline return value>,
+         "ttft_s": <seconds to first answer token>, "total_s": <seconds>}
+
+    Errors raised by the pipeline are re-raised here. Closing the generator early
+    cancels the pipeline if it supports it (async pipelines do).
+    """
+    events: "queue.Queue[Any]" = queue.Queue()
+    t0 = time.perf_counter()
+    future = submit(events.put)
+    future.add_done_callback(lambda _f: events.put(_STREAM_END))
+
+    ttft: Optional[float] = None
+    try:
+        while True:
+            event = events.get()
+            if event is _STREAM_END:
+                break
+            if ttft is None and event.get("type") == "token":
+                ttft = time.perf_counter() - t0
+            yield event
+    finally:
+        if not future.done():
+            future.cancel()
+
+    result = future.result()
+    total = time.perf_counter() - t0
+    yield {
+        "type": "done",
+        "result": result,
+        "ttft_s": ttft if ttft is not None else total,
+        "total_s": total,
+    }
+
+
+async def _agenerate_answer(
+    llm_backend: LLMBackend,
+    system_prompt: str,
+    user_prompt: str,
+    on_event: Optional[EventSink] = None,
+) -> Tuple[str, float]:
+    """
+    Final answer LLM call. With `on_event`, the answer is streamed and every
+    piece is emitted as a token event. Returns (answer, perf_counter() time at
+    which the first piece arrived; the whole answer when not streaming).
+    """
+    if on_event is None:
+        answer = await llm_backend.achat(system_prompt, user_prompt)
+        return answer, time.perf_counter()
+
+    pieces: List[str] = []
+    t_first: Optional[float] = None
+    async for piece in llm_backend.astream(system_prompt, user_prompt):
+        if t_first is None:
+            t_first = time.perf_counter()
+        pieces.append(piece)
+        on_event({"type": "token", "text": piece})
+    return "".join(pieces), t_first if t_first is not None else time.perf_counter()
+
+
+def _latency_log(t_start: float, t_first_token: float, streaming: bool) -> str:
+    """One trace line with time-to-first-token and total latency (both from t_start)."""
+    return (
+        f"Answer latency: time-to-first-token={(t_first_token - t_start) * 1000:.0f} ms, "
+        f"total={(time.perf_counter() - t_start) * 1000:.0f} ms "
+        f"(streaming: {streaming})"
+    )
 
 
 def _get_vector_db_dirs(config: RAGConfig) -> Dict[str, str]:
@@ -40,65 +177,51 @@ def _describe_databases(
     embedding_model,
 ) -> Dict[str, str]:
     """
-    Build a SHORT description for each DB based on a few documents' metadata.
+    Build a SHORT description for each DB from its manifest (full-corpus
+    metadata histograms written at build time, see backend/manifest.py).
     Used so the LLM (single agent or supervisor) can choose the right DB(s).
+    Reading a manifest is O(1); stores without one get it computed once.
     """
     descriptions: Dict[str, str] = {}
 
     for db_name, path in db_map.items():
         try:
-            vs = load_vector_store(path, embedding_model)
+            manifest = get_db_manifest(path, embedding_model)
         except Exception:
             descriptions[db_name] = "Database could not be loaded."
             continue
 
-# If the vector store vs has a docstore with an internal _dict,
-# take all the Document objects from that internal dictionary
-# and put them into a list called all_docs. Then take the first 20 documents
-# from all_docs and put them into a list called docs. If any error occurs   
-
-        docs: List[Document] = []
-        try:
-            if hasattr(vs, "docstore") and hasattr(vs.docstore, "_dict"):
-                all_docs = list(vs.docstore._dict.values())
-                docs = all_docs[:20]
-        except Exception:
-            docs = []
-
-        corpus_names = set()
-        laws = set()
-        types_ = set()
-        other_tags = set()
-
-        for d in docs:
-            meta = d.metadata or {}
-            if "law" in meta:
-                laws.add(str(meta["law"]))
-            if "type" in meta:
-                types_.add(str(meta["type"]))
-            for k in ("presence_of_children", "disputed_issues", "subject_of_succession", "financial_support", "subject_of_succession"):
-                if k in meta:
-                    other_tags.add(f"{k}={meta[k]}")
-
+        hist = manifest.get("histograms", {})
         parts = []
-        if corpus_names:
-            parts.append("corpus: " + ", ".join(sorted(corpus_names)))
-        if laws:
-            parts.append("law: " + ", ".join(sorted(laws)))
-        if types_:
-            parts.append("type: " + ", ".join(sorted(types_)))
-        if other_tags:
-            parts.append("tags: " + ", ".join(sorted(other_tags)))
+        if hist.get("corpus"):
+            parts.append("corpus: " + format_histogram(hist["corpus"], top=3))
+        if hist.get("law"):
+            parts.append("law: " + format_histogram(hist["law"]))
+        if hist.get("type"):
+            parts.append("type: " + format_histogram(hist["type"]))
+        if hist.get("state"):
+            parts.append("state: " + format_histogram(hist["state"]))
+        if hist.get("subject_of_succession"):
+            parts.append(
+                "subject_of_succession: "
+                + format_histogram(hist["subject_of_succession"], top=3)
+            )
+        if hist.get("civil_codes_used"):
+            parts.append(
+                "top civil codes: " + format_histogram(hist["civil_codes_used"], top=5)
+            )
 
         if parts:
-            descriptions[db_name] = "; ".join(parts)
+            descriptions[db_name] = (
+                f"{manifest.get('doc_count', 0)} docs; " + "; ".join(parts)
+            )
         else:
             descriptions[db_name] = "general corpus with mixed content."
 
     return descriptions
 
 
-def _decide_which_dbs(
+async def _adecide_which_dbs(
     question: str,
     db_map: Dict[str, str],
     db_descriptions: Dict[str, str],
@@ -128,7 +251,7 @@ def _decide_which_dbs(
         "or 'NONE'."
     )
 
-    resp = llm_backend.chat(system_prompt, user_prompt).strip()
+    resp = (await llm_backend.achat(system_prompt, user_prompt, cache=True)).strip()
     resp_lower = resp.lower()
 
     if "none" in resp_lower:
@@ -0,0 +1,236 @@
+# backend/reranker.py
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from .config import RAGConfig
+
+# Role of this module:
+# Second retrieval stage behind `RAGConfig.use_rerank`: a cross-encoder reads
+# the question and each candidate document together and scores their
+# relevance, which a bi-encoder (FAISS similarity) cannot do. Used the same way
+# by the single-agent (and so multi-agent) and hybrid pipelines through
+# `rerank_documents`.
+#
+# - Candidates are scored on CPU in batches, in first-stage order, with the
+#   document text truncated to `max_length` tokens.
+# - Scores are cached per (question hash, document id), so a repeated question
+#   or a fallback pass over the same documents costs nothing.
+# - A latency budget stops scoring before the batch that would exceed it;
+#   unscored candidates keep their first-stage order after the scored ones.
+
+# Characters kept per document before tokenization (the model truncates to
+# max_length tokens anyway; this only avoids tokenizing very long texts)
+_CHARS_PER_TOKEN = 6
+
+
+@dataclass
+class RerankStats:
+    model: str
+    candidates: int = 0
+    scored: int = 0
+    cached: int = 0
+    skipped_budget: int = 0
+    batches: int = 0
+    elapsed_ms: float = 0.0
+
+    def summary(self) -> str:
+        text = (
+            f"Cross-encoder reranking ({self.model}): {self.candidates} candidate(s), "
+            f"{self.scored} scored in {self.batches} batch(es), {self.cached} from cache, "
+            f"{self.elapsed_ms:.0f} ms"
+        )
+        if self.skipped_budget:
+            text += f"; latency budget hit → {self.skipped_budget} left in first-stage order"
+        return text + "."
+
+
+def _doc_key(doc: Document) -> str:
+    digest = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+    return f"{doc.id}:{digest}" if getattr(doc, "id", None) else digest
+
+
+class CrossEncoderReranker:
+    """sentence-transformers CrossEncoder with batching, a score cache and a latency budget."""
+
+    def __init__(
+        self,
+        model_name: str,
+        max_length: int = 256,
+        batch_size: int = 16,
+        device: str = "cpu",
+        cache_size: int = 4096,
+    ):
+        self.model_name = model_name
+        self.max_length = int(max_length)
+        self.batch_size = max(1, int(batch_size))
+        self.device = device
+        self.cache_size = int(cache_size)
+        self._model: Any = None
+        self._load_error: Optional[str] = None
+        self._load_lock = threading.Lock()
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        """The CrossEncoder, loaded on first use. A failed load is not retried."""
+        if self._model is None:
+            with self._load_lock:
+                if self._load_error is not None:
+                    raise RuntimeError(self._load_error)
+                if self._model is None:
+                    try:
+                        from sentence_transformers import CrossEncoder
+
+                        self._model = CrossEncoder(
+                            self.model_name, device=self.device, max_length=self.max_length
+                        )
+                    except Exception as e:
+                        self._load_error = f"could not load {self.model_name}: {type(e).__name__}: {e}"
+                        raise
+        return self._model
+
+    # ---------------- Score cache ----------------
+    def _cache_get(self, key: Tuple[str, str]) -> Optional[float]:
+        with self._cache_lock:
+            score = self._cache.get(key)
+            if score is not None:
+                self._cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, items: Sequence[Tuple[Tuple[str, str], float]]) -> None:
+        with self._cache_lock:
+            for key, score in items:
+                self._cache[key] = score
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ---------------- Scoring ----------------
+    def score(
+        self,
+        query: str,
+        docs: Sequence[Document],
+        budget_ms: Optional[float] = None,
+    ) -> Tuple[List[Optional[float]], RerankStats]:
+        """
+        Relevance scores for `docs` (None for candidates cut by the budget).
+        The model is loaded before the clock starts.
+        """
+        model = self.model
+        stats = RerankStats(model=self.model_name, candidates=len(docs))
+        t0 = time.perf_counter()
+
+        qhash = hashlib.sha256(query.encode("utf-8")).hexdigest()[:16]
+        keys = [(qhash, _doc_key(d)) for d in docs]
+        scores: List[Optional[float]] = [self._cache_get(k) for k in keys]
+        stats.cached = sum(s is not None for s in scores)
+        todo = [i for i, s in enumerate(scores) if s is None]
+
+        max_chars = self.max_length * _CHARS_PER_TOKEN
+        last_batch_ms = 0.0
+        for start in range(0, len(todo), self.batch_size):
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            if budget_ms and stats.batches and elapsed_ms + last_batch_ms > budget_ms:
+                stats.skipped_budget = len(todo) - start
+                break
+            batch = todo[start:start + self.batch_size]
+            t_batch = time.perf_counter()
+            values = model.predict(
+                [(query, docs[i].page_content[:max_chars]) for i in batch],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            last_batch_ms = (time.perf_counter() - t_batch) * 1000.0
+            fresh = [(keys[i], float(v)) for i, v in zip(batch, values)]
+            for i, (_, v) in zip(batch, fresh):
+                scores[i] = v
+            self._cache_put(fresh)
+            stats.scored += len(batch)
+            stats.batches += 1
+
+        stats.elapsed_ms = (time.perf_counter() - t0) * 1000.0
+        return scores, stats
+
+    def rerank(
+        self,
+        query: str,
+        docs: Sequence[Document],
+        top_k: int,
+        budget_ms: Optional[float] = None,
+    ) -> Tuple[List[Document], RerankStats]:
+        """Scored docs by descending score, then unscored ones in their original order; top_k kept."""
+        scores, stats = self.score(query, docs, budget_ms=budget_ms)
+        scored = sorted(
+            (i for i, s in enumerate(scores) if s is not None), key=lambda i: -scores[i]
+        )
+        unscored = [i for i, s in enumerate(scores) if s is None]
+        return [docs[i] for i in (scored + unscored)[:top_k]], stats
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+
+# =====================================================================
+# Process-wide rerankers
+# =====================================================================
+# {(model, max_length, device) -> reranker}
+_RERANKERS: Dict[Tuple[str, int, str], CrossEncoderReranker] = {}
+_RERANKERS_LOCK = threading.Lock()
+
+
+def get_reranker(config: RAGConfig) -> CrossEncoderReranker:
+    """Shared reranker for the config's model settings (weights are loaded on first use)."""
+    key = (
+        config.rerank_model_name,
+        int(config.rerank_max_length),
+        getattr(config, "rerank_device", "cpu"),
+    )
+    with _RERANKERS_LOCK:
+        reranker = _RERANKERS.get(key)
+        if reranker is None:
+            reranker = CrossEncoderReranker(
+                key[0],
+                max_length=key[1],
+                batch_size=config.rerank_batch_size,
+                device=key[2],
+                cache_size=config.rerank_cache_size,
+            )
+            _RERANKERS[key] = reranker
+        reranker.batch_size = max(1, int(config.rerank_batch_size))
+        reranker.cache_size = int(config.rerank_cache_size)
+        return reranker
+
+
+def rerank_documents(
+    question: str,
+    docs: List[Document],
+    config: RAGConfig,
+    top_k: int,
+) -> Tuple[List[Document], str]:
+    """
+    Cross-encoder rerank of first-stage candidates → (top_k docs, log line).
+    If the model cannot be loaded, the first-stage order is kept (and logged).
+    """
+    if not docs:
+        return docs, "Cross-encoder reranking: no candidates."
+    try:
+        reranker = get_reranker(config)
+        budget = float(getattr(config, "rerank_budget_ms", 0) or 0) or None
+        ranked, stats = reranker.rerank(question, docs, top_k, budget_ms=budget)
+    except Exception as e:
+        print(f"[reranker] {config.rerank_model_name}: {type(e).__name__}: {e}")
+        return docs[:top_k], (
+            f"Cross-encoder reranking unavailable ({type(e).__name__}); "
+            f"keeping first-stage order."
+        )
+    return ranked, stats.summary()
@@ -0,0 +1,258 @@
+# backend/router.py
+from __future__ import annotations
+
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .config import RAGConfig
+from .vector_store import get_db_manifest
+
+# Role of this module:
+# Local (no LLM) routing of a question before retrieval: "does it need the
+# documents at all?" and "which DB(s)?". Each DB is profiled from its manifest
+# (backend/manifest.py): the k-means centroids of its stored vectors and
+# keyword priors (DB name, metadata histogram values, 'law' synonyms). The
+# question vector — computed anyway for retrieval — is compared to every
+# centroid, so routing costs a few dot products on CPU. Keywords only add
+# `router_keyword_boost` to a DB's score: they break ties between DBs but
+# never decide on their own that a question needs retrieval.
+#
+# Each decision comes back as None when the router is unsure (similarity
+# between the skip / retrieve thresholds, or several DBs within the margin
+# without keywords naming them); the pipelines then ask the LLM as before.
+# Routing counters (`get_router_stats`) report the LLM calls saved.
+
+# Stems of 'law' values (matched against the manifest's 'law' histogram); the
+# same vocabulary the hybrid pipeline's heuristic law classifier uses
+LAW_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "succession": (
+        "succession", "successione", "eredit", "inherit", "heir", "testament", "legittima",
+    ),
+    "divorce": (
+        "divorce", "divorz", "separat", "matrimon", "marital", "alimony", "custody",
+    ),
+}
+
+# Histogram fields whose values become keyword priors: short categorical
+# labels only (free-text fields such as subject_of_succession bring in
+# everyday words like "book" or "flat")
+_KEYWORD_FIELDS = (
+    "law", "type", "corpus", "state", "succession_type", "nature_of_separation",
+)
+# Tokens of DB names / metadata values that say nothing about the content,
+# and common words that would match ordinary questions
+_STOPWORDS = {
+    "vector", "store", "stores", "index", "corpus", "data", "default",
+    "with", "without", "other", "none", "unknown", "true", "false",
+    "legal", "from", "based", "area", "areas", "book", "books", "common",
+    "flat", "open", "small", "under", "three", "various", "value", "works",
+    "piece", "unit", "units", "room", "rooms", "paid", "real", "shared",
+    "personal", "ordinary", "limited", "interest", "rights", "golden",
+    "about", "what", "which", "where", "when", "there", "this", "that",
+    "have", "does", "some", "more", "most", "good", "recommend",
+}
+_MIN_KEYWORD_LEN = 4
+_TOKEN_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+
+def _tokens(text: str) -> List[str]:
+    return [t.lower() for t in _TOKEN_RE.findall(text or "")]
+
+
+@dataclass
+class DBProfile:
+    """What the router knows about one DB: unit-norm centroids + keyword stems."""
+
+    name: str
+    centroids: np.ndarray  # (k, d) float32, may be empty
+    keywords: Set[str] = field(default_factory=set)
+
+
+def build_db_profile(name: str, manifest: Dict[str, Any]) -> DBProfile:
+    """Router profile of a DB from its manifest (no centroids for pre-v2 manifests)."""
+    centroids = np.asarray(manifest.get("centroids") or [], dtype=np.float32)
+    if centroids.ndim != 2:
+        centroids = np.zeros((0, int(manifest.get("dimension", 0))), dtype=np.float32)
+
+    keywords: Set[str] = {t for t in _tokens(name) if len(t) >= _MIN_KEYWORD_LEN}
+    hist = manifest.get("histograms", {})
+    for f in _KEYWORD_FIELDS:
+        for value in hist.get(f, {}):
+            keywords.update(t for t in _tokens(value) if len(t) >= _MIN_KEYWORD_LEN)
+    for law_value in hist.get("law", {}):
+        law_value = law_value.lower()
+        for stems in LAW_KEYWORDS.values():
+            if any(s in law_value for s in stems):
+                keywords.update(stems)
+    return DBProfile(name=name, centroids=centroids, keywords=keywords - _STOPWORDS)
+
+
+@dataclass
+class RouteDecision:
+    """
+    Local routing of one question. `need_retrieval` / `db_names` are None when
+    the router is unsure and the LLM has to decide.
+    """
+
+    need_retrieval: Optional[bool]
+    db_names: Optional[List[str]]
+    similarities: Dict[str, float]  # best centroid cosine per DB
+    keyword_hits: Dict[str, List[str]]  # discriminative keywords found per DB
+    scores: Dict[str, float]  # similarity + keyword boost, used for ranking
+    elapsed_ms: float
+
+    def _scores_text(self) -> str:
+        parts = []
+        for name, score in sorted(self.scores.items(), key=lambda kv: -kv[1]):
+            text = f"{name}={self.similarities[name]:.3f}"
+            if self.keyword_hits.get(name):
+                text += f"+kw({', '.join(self.keyword_hits[name][:3])})"
+            parts.append(text)
+        return ", ".join(parts)
+
+    def retrieval_log(self) -> str:
+        if self.need_retrieval is None:
+            verdict = "unsure → asking the LLM"
+        else:
+            verdict = "USE retrieval" if self.need_retrieval else "NO retrieval"
+        return (
+            f"Retrieval decision: local router ({self.elapsed_ms:.1f} ms, "
+            f"centroid similarity {self._scores_text()}) → {verdict}."
+        )
+
+    def selection_log(self) -> str:
+        if self.db_names is None:
+            return "DB selection: local router unsure (no clear winner) → asking the LLM."
+        return "DB selection: local router → using DBs: " + ", ".join(self.db_names)
+
+
+def route_question(
+    question: str,
+    query_vector: Sequence[float],
+    profiles: Sequence[DBProfile],
+    config: RAGConfig,
+) -> RouteDecision:
+    """
+    Score every DB (max cosine of the question to its centroids, plus
+    `router_keyword_boost` when the question contains one of its keywords that
+    the other DBs do not share) and decide both routing steps:
+
+    - retrieval: NO when the best similarity is below `router_skip_similarity`
+      (whatever the keywords); USE when the best score reaches
+      `router_min_similarity`; unsure between.
+    - DBs: every DB scoring within `router_margin` of the best one. Confident
+      when that is a single DB, or when keywords name each of them.
+    """
+    t0 = time.perf_counter()
+    q = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+    norm = float(np.linalg.norm(q))
+    if norm > 0:
+        q = q / norm
+
+    q_tokens = set(_tokens(question))
+
+    def _hits(keywords: Set[str]) -> List[str]:
+        return sorted(k for k in keywords if any(t.startswith(k) for t in q_tokens))
+
+    shared = set.intersection(*(p.keywords for p in profiles)) if profiles else set()
+    boost = float(getattr(config, "router_keyword_boost", 0.1))
+
+    similarities: Dict[str, float] = {}
+    keyword_hits: Dict[str, List[str]] = {}
+    scores: Dict[str, float] = {}
+    for p in profiles:
+        if len(p.centroids) and p.centroids.shape[1] == q.shape[0]:
+            sim = float(np.max(p.centroids @ q))
+        else:
+            sim = 0.0
+        discriminative = [h for h in _hits(p.keywords) if h not in shared]
+        similarities[p.name] = sim
+        keyword_hits[p.name] = discriminative
+        scores[p.name] = sim + (boost if discriminative else 0.0)
+
+    best_sim = max(similarities.values(), default=0.0)
+    best_score = max(scores.values(), default=0.0)
+    if best_sim < float(getattr(config, "router_skip_similarity", 0.15)):
+        need_retrieval: Optional[bool] = False
+    elif best_score >= float(getattr(config, "router_min_similarity", 0.35)):
+        need_retrieval = True
+    else:
+        need_retrieval = None
+
+    db_names: Optional[List[str]] = None
+    if scores:
+        best = max(scores.values())
+        margin = float(getattr(config, "router_margin", 0.05))
+        # Keep the caller's DB order
+        close = [p.name for p in profiles if scores[p.name] >= best - margin]
+        if len(close) == 1 or all(keyword_hits[n] for n in close):
+            db_names = close
+
+    return RouteDecision(
+        need_retrieval=need_retrieval,
+        db_names=db_names,
+        similarities=similarities,
+        keyword_hits=keyword_hits,
+        scores=scores,
+        elapsed_ms=(time.perf_counter() - t0) * 1000.0,
+    )
+
+
+def route_question_for_dbs(
+    question: str,
+    query_vector: Sequence[float],
+    db_map: Dict[str, str],
+    config: RAGConfig,
+    embedding_model=None,
+) -> Optional[RouteDecision]:
+    """
+    `route_question` over the DBs of `db_map` (profiles from their manifests).
+    None when the router is disabled or a manifest cannot be read.
+    """
+    if not getattr(config, "use_local_router", True) or not db_map:
+        return None
+    try:
+        profiles = [
+            build_db_profile(name, get_db_manifest(path, embedding_model))
+            for name, path in db_map.items()
+        ]
+    except Exception as e:
+        print(f"[router] Could not profile the DBs, falling back to the LLM: {e}")
+        return None
+    return route_question(question, query_vector, profiles, config)
+
+
+# =====================================================================
+# Process-wide counters
+# =====================================================================
+_STATS = {"questions": 0, "llm_calls_needed": 0, "llm_calls_saved": 0}
+_STATS_LOCK = threading.Lock()
+
+
+def record_routing(llm_calls_saved: int, llm_calls_needed: int) -> str:
+    """
+    Count one routed question (LLM routing calls the pipeline needed without
+    the router vs. calls the router answered) and return its trace line.
+    """
+    with _STATS_LOCK:
+        _STATS["questions"] += 1
+        _STATS["llm_calls_needed"] += int(llm_calls_needed)
+        _STATS["llm_calls_saved"] += int(llm_calls_saved)
+    return (
+        f"Local router: saved {llm_calls_saved} of {llm_calls_needed} "
+        "LLM routing call(s) for this question."
+    )
+
+
+def get_router_stats() -> Dict[str, Any]:
+    with _STATS_LOCK:
+        stats = dict(_STATS)
+    stats["saved_per_question"] = (
+        round(stats["llm_calls_saved"] / stats["questions"], 2) if stats["questions"] else 0.0
+    )
+    return stats
@@ -0,0 +1,457 @@
+# backend/sharded_collection.py
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from .lexical_index import reciprocal_rank_fusion
+from .manifest import HISTOGRAM_FIELDS
+from .metadata_index import CIVIL_CODES_FIELD, normalize_values
+from .vector_store import (
+    get_db_manifest,
+    get_lexical_index,
+    get_metadata_index,
+    get_stored_vectors,
+    lexical_search_with_ids,
+    load_vector_store,
+    sample_documents,
+    save_vector_store,
+    similarity_search_with_ids,
+)
+
+# Role of this module:
+# One logical collection over several physical vector stores ("shards", e.g.
+# one per law or country), searched with a single call:
+#
+#   - prune: shards that cannot match the metadata filter are skipped, first
+#     from their manifest histograms (no store opened), then from their
+#     metadata index (exact count of matching vectors),
+#   - scatter: the query vector is searched in every remaining shard on a
+#     thread pool (FAISS releases the GIL),
+#   - gather: hits are merged into one top-k by distance (dense) or by
+#     reciprocal rank fusion of the global dense and BM25 rankings (fusion);
+#     the same text found in several shards counts once, at its best rank.
+#
+# The shards are the configured vector store directories
+# (`rag_utils._get_vector_db_dirs`); `split_vector_store` turns one large store
+# into physical shards per metadata value without re-embedding anything.
+
+
+def _content_key(doc: Document) -> str:
+    return hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+
+
+# (dense hits, BM25 hits, L2 metric?) of one shard; hits are (doc, score, position)
+_ShardOutput = Tuple[List[Tuple[Document, float, int]], List[Tuple[Document, float, int]], bool]
+
+
+@dataclass
+class ShardHit:
+    doc: Document
+    score: float      # L2 distance (dense) or RRF score (fusion)
+    shard: str
+    pos: int          # FAISS position in the shard
+
+
+@dataclass
+class CollectionSearchResult:
+    hits: List[ShardHit]
+    searched: List[str]
+    pruned: Dict[str, str] = field(default_factory=dict)        # shard -> reason
+    errors: Dict[str, str] = field(default_factory=dict)        # shard -> error
+    prune_errors: Dict[str, str] = field(default_factory=dict)  # shard -> failed pruning check
+    per_shard_hits: Dict[str, int] = field(default_factory=dict)
+    per_shard_ms: Dict[str, float] = field(default_factory=dict)
+    duplicates: int = 0
+    wall_ms: float = 0.0
+    k: int = 0
+    fusion: bool = False
+    rrf_k: int = 60
+    # Raw (dense, BM25, L2 metric?) hits of every searched shard
+    shard_outputs: Dict[str, "_ShardOutput"] = field(default_factory=dict, repr=False)
+
+    @property
+    def docs(self) -> List[Document]:
+        return [h.doc for h in self.hits]
+
+    def for_shard(self, name: str) -> "CollectionSearchResult":
+        """The same search restricted to one shard (its own top-k), without searching again."""
+        part = CollectionSearchResult(
+            hits=[], searched=[], k=self.k, fusion=self.fusion, rrf_k=self.rrf_k
+        )
+        if name in self.pruned:
+            part.pruned[name] = self.pruned[name]
+        if name in self.errors:
+            part.errors[name] = self.errors[name]
+        if name in self.prune_errors:
+            part.prune_errors[name] = self.prune_errors[name]
+        if name in self.shard_outputs:
+            part.searched = [name]
+            part.shard_outputs = {name: self.shard_outputs[name]}
+            part.per_shard_hits[name] = self.per_shard_hits.get(name, 0)
+            part.per_shard_ms[name] = self.per_shard_ms.get(name, 0.0)
+            part.hits, part.duplicates = _merge(part.shard_outputs, self.k, self.fusion, self.rrf_k)
+        return part
+
+    def log_lines(self) -> List[str]:
+        lines = []
+        for name, reason in self.pruned.items():
+            lines.append(f"[Shard {name}] pruned: {reason}.")
+        for name, err in self.prune_errors.items():
+            lines.append(f"[Shard {name}] could not be checked for pruning: {err} → searched.")
+        for name, err in self.errors.items():
+            lines.append(f"[Shard {name}] ERROR during search: {err} → shard skipped.")
+        if self.searched:
+            per_shard = ", ".join(
+                f"{n}={self.per_shard_hits.get(n, 0)} hit(s)/{self.per_shard_ms.get(n, 0.0):.1f} ms"
+                for n in self.searched
+            )
+            lines.append(
+                f"Scatter over {len(self.searched)} shard(s) ({per_shard}), "
+                f"wall={self.wall_ms:.1f} ms → merged top {len(self.hits)}"
+                + (f", {self.duplicates} duplicate(s) across shards dropped" if self.duplicates else "")
+                + "."
+            )
+        else:
+            lines.append("No shard left to search.")
+        return lines
+
+
+def _filter_values(cond: Any) -> Optional[List[Any]]:
+    """Values an equality-style filter condition accepts (None = cannot tell)."""
+    if isinstance(cond, dict):
+        if set(cond) == {"$eq"}:
+            return [cond["$eq"]]
+        if set(cond) == {"$in"} and isinstance(cond["$in"], (list, tuple, set)):
+            return list(cond["$in"])
+        return None
+    if isinstance(cond, (list, tuple, set)):
+        return list(cond)
+    return [cond]
+
+
+def manifest_excludes(manifest: Dict[str, Any], filter: Dict[str, Any]) -> Optional[str]:
+    """
+    Reason why no document of a store can match `filter` according to its
+    manifest histograms, or None. Only top-level equality / $in clauses on
+    histogram fields are checked (civil codes match on article ranges, which
+    only the metadata index resolves).
+    """
+    histograms = manifest.get("histograms", {})
+    for key, cond in filter.items():
+        if key.startswith("$") or key not in HISTOGRAM_FIELDS or key == CIVIL_CODES_FIELD:
+            continue
+        wanted = _filter_values(cond)
+        if wanted is None:
+            continue
+        wanted_keys = {k for v in wanted for k in normalize_values(key, v)}
+        present = {k for v in histograms.get(key, {}) for k in normalize_values(key, v)}
+        if wanted_keys and not wanted_keys & present:
+            return f"manifest has no {key} in {sorted(wanted_keys)}"
+    return None
+
+
+class ShardedCollection:
+    """Several vector stores searched as one (see the module comment)."""
+
+    def __init__(self, shards: Dict[str, str], embedding_model, max_workers: int = 4):
+        self.shards = dict(shards)           # {shard name -> store path}
+        self.embedding_model = embedding_model
+        self.max_workers = max(1, int(max_workers))
+
+    def __len__(self) -> int:
+        return len(self.shards)
+
+    # ---------------- Shard access ----------------
+    def store(self, name: str) -> FAISS:
+        return load_vector_store(self.shards[name], self.embedding_model)
+
+    def docstore(self, name: str):
+        return self.store(name).docstore
+
+    def stored_vectors(self, hits: Sequence[ShardHit]) -> Optional[np.ndarray]:
+        """Vectors stored in the shards for `hits` (in order), or None if a shard cannot reconstruct."""
+        if not hits:
+            return None
+        out: Optional[np.ndarray] = None
+        by_shard: Dict[str, List[int]] = {}
+        for i, h in enumerate(hits):
+            by_shard.setdefault(h.shard, []).append(i)
+        for name, rows in by_shard.items():
+            vecs = get_stored_vectors(self.store(name), [hits[i].pos for i in rows])
+            if vecs is None:
+                return None
+            if out is None:
+                out = np.empty((len(hits), vecs.shape[1]), dtype=np.float32)
+            out[rows] = vecs
+        return out
+
+    # ---------------- Pruning ----------------
+    def prune(
+        self,
+        filter: Optional[Dict[str, Any]] = None,
+        names: Optional[Iterable[str]] = None,
+    ) -> Tuple[List[str], Dict[str, str], Dict[str, str]]:
+        """
+        (shards to search, {pruned shard -> reason}, {shard -> error}) for
+        `filter`, among `names` (default all). A shard whose manifest or
+        metadata index cannot be read is searched, and its error reported.
+        """
+        candidates = [n for n in (names if names is not None else self.shards) if n in self.shards]
+        if not filter:
+            return candidates, {}, {}
+        keep: List[str] = []
+        pruned: Dict[str, str] = {}
+        errors: Dict[str, str] = {}
+        for name in candidates:
+            path = self.shards[name]
+            try:
+                reason = manifest_excludes(get_db_manifest(path, self.embedding_model), filter)
+                if reason is None:
+                    mi = get_metadata_index(path, self.embedding_model)
+                    mask = mi.mask(filter)
+                    if mask is not None and not mask.any():
+                        reason = f"metadata index: 0/{mi.n} vectors match the filter"
+            except Exception as e:
+                # Cannot tell: search it (the search reports real failures)
+                errors[name] = repr(e)
+                reason = None
+            if reason is None:
+                keep.append(name)
+            else:
+                pruned[name] = reason
+        return keep, pruned, errors
+
+    # ---------------- Search ----------------
+    def _search_shard(
+        self,
+        name: str,
+        query_text: str,
+        query_vector: Sequence[float],
+        k: int,
+        filter: Optional[Dict[str, Any]],
+        fusion: bool,
+        fetch_k: int,
+        nprobe: int,
+        ef_search: int,
+    ) -> _ShardOutput:
+        path = self.shards[name]
+        vs = self.store(name)
+        metadata_index = get_metadata_index(path, self.embedding_model) if filter else None
+        dense = similarity_search_with_ids(
+            vs,
+            query_vector,
+            k,
+            filter=filter,
+            fetch_k=fetch_k,
+            metadata_index=metadata_index,
+            nprobe=nprobe,
+            ef_search=ef_search,
+        )
+        lexical: List[Tuple[Document, float, int]] = []
+        if fusion:
+            lexical_index = get_lexical_index(path, self.embedding_model)
+            if lexical_index.n == vs.index.ntotal:
+                lexical = lexical_search_with_ids(
+                    vs,
+                    query_text,
+                    k,
+                    lexical_index,
+                    filter=filter,
+                    fetch_k=fetch_k,
+                    metadata_index=metadata_index,
+                    known={pos: doc for doc, _, pos in dense},
+                )
+        return dense, lexical, vs.index.metric_type == faiss.METRIC_L2
+
+    def search(
+        self,
+        query_text: str,
+        query_vector: Sequence[float],
+        k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        names: Optional[Iterable[str]] = None,
+        retrieval_mode: str = "dense",
+        fetch_k: int = 20,
+        rrf_k: int = 60,
+        nprobe: int = 0,
+        ef_search: int = 0,
+    ) -> CollectionSearchResult:
+        """
+        Top-k over the shards `names` (default all) that can match `filter`.
+        Every shard returns its own top-k, so the merged top-k is exact for
+        dense search. Hits carry their shard name (also set as
+        doc.metadata["db_name"]).
+        """
+        t0 = time.perf_counter()
+        fusion = retrieval_mode == "fusion"
+        searched, pruned, prune_errors = self.prune(filter, names)
+        result = CollectionSearchResult(
+            hits=[],
+            searched=searched,
+            pruned=pruned,
+            prune_errors=prune_errors,
+            k=k,
+            fusion=fusion,
+            rrf_k=rrf_k,
+        )
+        if not searched or k <= 0:
+            result.wall_ms = (time.perf_counter() - t0) * 1000.0
+            return result
+
+        def _timed(name: str):
+            t_shard = time.perf_counter()
+            try:
+                out = self._search_shard(
+                    name, query_text, query_vector, k, filter, fusion, fetch_k, nprobe, ef_search
+                )
+            except Exception as e:
+                out = e
+            return out, (time.perf_counter() - t_shard) * 1000.0
+
+        if len(searched) == 1:
+            outputs = [_timed(searched[0])]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.max_workers, len(searched)),
+                thread_name_prefix="shard-search",
+            ) as pool:
+                outputs = list(pool.map(_timed, searched))
+
+        for name, (out, ms) in zip(searched, outputs):
+            result.per_shard_ms[name] = ms
+            if isinstance(out, Exception):
+                result.errors[name] = repr(out)
+                continue
+            result.per_shard_hits[name] = len(out[0])
+            result.shard_outputs[name] = out
+        result.searched = [n for n in searched if n not in result.errors]
+        result.hits, result.duplicates = _merge(result.shard_outputs, k, fusion, rrf_k)
+        result.wall_ms = (time.perf_counter() - t0) * 1000.0
+        return result
+
+
+def _merge(
+    shard_outputs: Dict[str, _ShardOutput],
+    k: int,
+    fusion: bool,
+    rrf_k: int,
+) -> Tuple[List[ShardHit], int]:
+    """Per-shard hits → (global top-k, number of duplicate texts dropped)."""
+    # Global rankings keyed by text, best occurrence first
+    dense_all: List[Tuple[float, str, ShardHit]] = []
+    lexical_all: List[Tuple[float, str, ShardHit]] = []
+    for name, (dense, lexical, is_l2) in shard_outputs.items():
+        for doc, score, pos in dense:
+            # Lower is better for L2, higher for inner product
+            rank_key = score if is_l2 else -score
+            dense_all.append((rank_key, _content_key(doc), ShardHit(doc, score, name, pos)))
+        for doc, score, pos in lexical:
+            lexical_all.append((-score, _content_key(doc), ShardHit(doc, score, name, pos)))
+
+    dense_all.sort(key=lambda t: t[0])
+    lexical_all.sort(key=lambda t: t[0])
+    duplicates = 0
+    hit_by_key: Dict[str, ShardHit] = {}
+    dense_keys: List[str] = []
+    for _, key, hit in dense_all:
+        if key in hit_by_key:
+            duplicates += 1
+            continue
+        hit_by_key[key] = hit
+        dense_keys.append(key)
+
+    if fusion and lexical_all:
+        lexical_keys = list(dict.fromkeys(key for _, key, _ in lexical_all))
+        for _, key, hit in lexical_all:
+            hit_by_key.setdefault(key, hit)
+        fused = reciprocal_rank_fusion([dense_keys[:k], lexical_keys[:k]], k=rrf_k)
+        hits = [
+            ShardHit(hit_by_key[key].doc, score, hit_by_key[key].shard, hit_by_key[key].pos)
+            for key, score in fused[:k]
+        ]
+    else:
+        hits = [hit_by_key[key] for key in dense_keys[:k]]
+
+    for h in hits:
+        h.doc.metadata = h.doc.metadata or {}
+        h.doc.metadata["db_name"] = h.shard
+    return hits, duplicates
+
+
+# =====================================================================
+# Physical sharding of one store
+# =====================================================================
+def _shard_name(prefix: str, values: Sequence[str]) -> str:
+    slug = "_".join(
+        "".join(ch if ch.isalnum() else "-" for ch in v.casefold()).strip("-") or "none"
+        for v in values
+    )
+    return f"{prefix}_{slug}"
+
+
+def split_vector_store(
+    source_path: str,
+    target_root: str,
+    fields: Sequence[str] = ("law",),
+    embedding_model=None,
+) -> Dict[str, str]:
+    """
+    Write one store per distinct combination of `fields` values of the
+    documents in `source_path`, under `target_root`, reusing the stored vectors
+    (nothing is re-embedded; the index type of the source is not kept, shards
+    are flat). Returns {shard name -> path}, ready for `ShardedCollection` /
+    `RAGConfig.vector_store_dirs`.
+    """
+    vs = load_vector_store(source_path, embedding_model)
+    docs = sample_documents(vs, None)
+    vectors = get_stored_vectors(vs, list(range(len(docs))))
+    if vectors is None:
+        raise ValueError(f"{source_path}: index type cannot reconstruct its vectors")
+
+    prefix = os.path.basename(os.path.normpath(source_path))
+    groups: Dict[Tuple[str, ...], List[int]] = {}
+    for pos, doc in enumerate(docs):
+        meta = doc.metadata or {}
+        key = tuple(str(meta.get(f) or "none") for f in fields)
+        groups.setdefault(key, []).append(pos)
+
+    shards: Dict[str, str] = {}
+    for key, positions in sorted(groups.items()):
+        name = _shard_name(prefix, key)
+        shard = FAISS.from_embeddings(
+            [(docs[p].page_content, vectors[p]) for p in positions],
+            embedding_model,
+            metadatas=[docs[p].metadata for p in positions],
+            ids=[docs[p].id or vs.index_to_docstore_id[p] for p in positions],
+            distance_strategy=vs.distance_strategy,
+            normalize_L2=getattr(vs, "_normalize_L2", False),
+        )
+        path = os.path.join(target_root, name)
+        save_vector_store(shard, path)
+        shards[name] = path
+    return shards
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Split a vector store into physical shards per metadata value (no re-embedding)."
+    )
+    parser.add_argument("--split", required=True, metavar="PATH", help="store to split")
+    parser.add_argument("--by", nargs="+", default=["law"], metavar="FIELD")
+    parser.add_argument("--out", required=True, metavar="DIR", help="directory for the shards")
+    args = parser.parse_args()
+
+    for shard_name, shard_path in split_vector_store(args.split, args.out, args.by).items():
+        print(f"{shard_name}: {shard_path}")
@@ -1,55 +1,1077 @@
 from __future__ import annotations
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 import os
+import threading
+import time
+import faiss
+import numpy as np
 from langchain_core.documents import Document  
 from langchain_core.embeddings import Embeddings
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 import shutil
+import uuid
+
+from .chunking import ChunkingSpec, chunk_document_batches
+from .docstore import DOCSTORE_FILENAME, SQLiteDocstore, write_docstore
+from .document_loader import IngestionReport, iter_document_batches, list_json_files
+from .embedding_cache import get_default_embedding_cache
+from .embeddings import BatchEmbedder, embedding_model_id
+from .index_spec import IndexSpec, convert_index, is_flat_index, search_parameters
+from .fingerprints import (
+    document_fingerprint,
+    file_changed,
+    file_fingerprint,
+    new_table,
+    read_fingerprints,
+    write_fingerprints,
+)
+from .manifest import compute_manifest, index_fingerprint, read_manifest, write_manifest
+from .lexical_index import LexicalIndex
+from .metadata_index import MetadataIndex
 
 # This is the vector database layer: which builds and loads FAISS vector stores using LangChain-Documents.
 
 # During offline step, called by the Vector DB Builder page to create FAISS DBs.
 # During online step, called by RAG pipelines to load the correct DB and create retrievers.
 
+# On-disk layout of a store directory:
+#   index.faiss      FAISS index, opened memory-mapped (pages shared by all processes);
+#                    flat by default, or IVF / HNSW / SQ8 (see backend/index_spec.py)
+#   docstore.sqlite  documents + metadata as JSON rows, read lazily by id
+#   manifest.json    full-corpus metadata histograms, doc count, dimension
+#   fingerprints.json per source file: hashes + ids of its documents (incremental builds)
+#   metadata_index.npz inverted index {field value -> FAISS positions} (filtered search)
+#   lexical_index.npz BM25 postings over FAISS positions (lexical + dense fusion)
+# Older stores have index.pkl (pickled docstore) instead of docstore.sqlite.
+# Unpickling runs arbitrary code, so they are only opened after an explicit
+# opt-in (`RAGConfig.allow_legacy_pickle_stores` → `set_allow_legacy_pickle_stores`);
+# `python -m backend.vector_store --convert <path>` migrates them once.
+INDEX_FILENAME = "index.faiss"
+LEGACY_PICKLE_FILENAME = "index.pkl"
+
 
 # backend/vector_store.py
-# Simple in-memory cache: {path -> FAISS vector store}
-_VECTOR_STORE_CACHE: dict[str, FAISS] = {}
+# In-memory LRU cache of opened stores: {normalized absolute path -> _CachedStore}.
+# Every entry remembers the on-disk stamp (mtime, size, inode) of its files; a
+# store rebuilt on disk (by this or another process) is reopened automatically.
+# Entries are evicted least-recently-used first once their total size exceeds
+# the budget (see `set_vector_store_cache_budget`).
+StoreStamp = Tuple[Tuple[str, int, int, int], ...]
+
+
+@dataclass
+class _CachedStore:
+    store: FAISS
+    path: str
+    stamp: StoreStamp
+    nbytes: int
+    layout: str
+    loaded_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+_VECTOR_STORE_CACHE: "OrderedDict[str, _CachedStore]" = OrderedDict()
+_VECTOR_STORE_LOCK = threading.RLock()
+# {store path -> lock held while that store opens}: a store is never opened
+# twice at once, and lookups of other (cached) stores are not blocked.
+_STORE_LOAD_LOCKS: Dict[str, threading.Lock] = {}
+_VECTOR_STORE_CACHE_BUDGET_BYTES = 2048 * 1024 * 1024
+# Whether legacy index.pkl stores may be unpickled (off by default)
+_ALLOW_LEGACY_PICKLE = False
+
+
+class LegacyStoreError(RuntimeError):
+    """A store only has the legacy pickle layout and unpickling is not allowed."""
+
+
+def set_allow_legacy_pickle_stores(allow: bool) -> None:
+    """Opt in to (or out of) opening legacy index.pkl stores by unpickling them."""
+    global _ALLOW_LEGACY_PICKLE
+    _ALLOW_LEGACY_PICKLE = bool(allow)
+
+
+def _load_legacy_store(path: str, embedding_model) -> FAISS:
+    if not _ALLOW_LEGACY_PICKLE:
+        raise LegacyStoreError(
+            f"{path}: legacy pickle layout (index.pkl) and no docstore.sqlite. "
+            "Run `python -m backend.vector_store --convert <path>` to migrate it, "
+            "or enable allow_legacy_pickle_stores for stores you created yourself."
+        )
+    print(
+        f"[vector_store] {path}: legacy pickle layout (index.pkl), unpickled "
+        "(allow_legacy_pickle_stores). Run `python -m backend.vector_store "
+        "--convert <path>` to migrate it."
+    )
+    return FAISS.load_local(path, embedding_model, allow_dangerous_deserialization=True)
+
+
+def _normalize_store_path(path: str) -> str:
+    return os.path.realpath(os.path.abspath(os.path.expanduser(path)))
+
+
+def _store_stamp(path: str) -> StoreStamp:
+    """(name, mtime_ns, size, inode) of the files a store is loaded from."""
+    stamp = []
+    for name in (INDEX_FILENAME, DOCSTORE_FILENAME, LEGACY_PICKLE_FILENAME):
+        try:
+            st = os.stat(os.path.join(path, name))
+        except FileNotFoundError:
+            continue
+        stamp.append((name, st.st_mtime_ns, st.st_size, st.st_ino))
+    return tuple(stamp)
+
+
+def _estimate_store_bytes(vs: FAISS, stamp: StoreStamp) -> int:
+    """
+    Memory attributed to a cached store: the index data (file size; mapped pages
+    for mmap'd indexes) + the id map + the pickled docstore for legacy stores.
+    SQLite documents are read on demand and not counted.
+    """
+    sizes = {name: size for name, _, size, _ in stamp}
+    nbytes = sizes.get(INDEX_FILENAME, 0)
+    nbytes += 100 * len(vs.index_to_docstore_id)
+    if not isinstance(vs.docstore, SQLiteDocstore):
+        nbytes += sizes.get(LEGACY_PICKLE_FILENAME, 0)
+    return int(nbytes)
+
+
+def _evict_over_budget() -> None:
+    # Caller holds _VECTOR_STORE_LOCK. The most recently used store always stays.
+    total = sum(e.nbytes for e in _VECTOR_STORE_CACHE.values())
+    while total > _VECTOR_STORE_CACHE_BUDGET_BYTES and len(_VECTOR_STORE_CACHE) > 1:
+        _, entry = _VECTOR_STORE_CACHE.popitem(last=False)
+        total -= entry.nbytes
+
+
+def set_vector_store_cache_budget(max_mb: float) -> None:
+    """Set the memory budget of the vector store cache (MB) and evict if needed."""
+    global _VECTOR_STORE_CACHE_BUDGET_BYTES
+    with _VECTOR_STORE_LOCK:
+        _VECTOR_STORE_CACHE_BUDGET_BYTES = int(max_mb * 1024 * 1024)
+        _evict_over_budget()
+
+
+def get_resident_vector_stores() -> List[Dict[str, Any]]:
+    """Snapshot of the cached stores, most recently used last (for logs / pages)."""
+    with _VECTOR_STORE_LOCK:
+        return [
+            {
+                "path": entry.path,
+                "layout": entry.layout,
+                "n_vectors": int(entry.store.index.ntotal),
+                "dim": int(entry.store.index.d),
+                "nbytes": entry.nbytes,
+                "hits": entry.hits,
+                "loaded_at": entry.loaded_at,
+                "last_used": entry.last_used,
+            }
+            for entry in _VECTOR_STORE_CACHE.values()
+        ]
+
+
+def evict_vector_store(path: Optional[str] = None) -> int:
+    """
+    Drop stores from the in-memory cache (disk is untouched).
+    path None → every store. Returns the number of evicted stores.
+    """
+    with _VECTOR_STORE_LOCK:
+        if path is None:
+            n = len(_VECTOR_STORE_CACHE)
+            _VECTOR_STORE_CACHE.clear()
+            return n
+        return 1 if _VECTOR_STORE_CACHE.pop(_normalize_store_path(path), None) else 0
+
+
+def _read_index_mmap(index_path: str):
+    """
+    Open a FAISS index without copying it into RAM:
+      - IO_FLAG_MMAP_IFC maps the vectors of flat indexes (IndexFlat*) zero-copy,
+      - IO_FLAG_MMAP maps the inverted lists of IVF indexes.
+    Falls back to a plain read for index types that support neither.
+    """
+    flags = faiss.IO_FLAG_READ_ONLY
+    for mmap_flag in (
+        getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_MMAP,
+        faiss.IO_FLAG_MMAP,
+    ):
+        try:
+            return faiss.read_index(index_path, flags | mmap_flag)
+        except RuntimeError:
+            continue
+    return faiss.read_index(index_path)
+
+
+def save_vector_store(vs: FAISS, target_dir: str, index_spec: Optional[IndexSpec] = None) -> None:
+    """
+    Write `vs` in the mmap + SQLite layout. Every file is written to a temp file
+    and renamed into place, so processes that still have the old store mapped
+    keep working until they reload it. With a non-flat `index_spec`, the index
+    is converted (trained on a sample of the vectors) before it is written.
+
+    The side indexes and the docstore are published first, all tagged with the
+    fingerprint of the new index; renaming index.faiss into place is the
+    commit point (readers check the pairing, see `_read_index_and_docstore`).
+    """
+    os.makedirs(target_dir, exist_ok=True)
+
+    index = vs.index
+    if index_spec is not None and is_flat_index(index):
+        index = convert_index(index, index_spec)
+
+    index_path = os.path.join(target_dir, INDEX_FILENAME)
+    staged_index_path = index_path + ".tmp"
+    faiss.write_index(index, staged_index_path)
+
+    # Same bytes as the final index.faiss → same fingerprint in every side file
+    docs = sample_documents(vs, None)
+    write_manifest(
+        target_dir,
+        compute_manifest(
+            docs,
+            dimension=index.d,
+            index_type=type(index).__name__,
+            vectors=_centroid_sample(vs),
+        ),
+        staged_index_path,
+    )
+    MetadataIndex.build(docs).save(target_dir, staged_index_path)
+    LexicalIndex.build(docs).save(target_dir, staged_index_path)
+    write_docstore(
+        os.path.join(target_dir, DOCSTORE_FILENAME),
+        vs.index_to_docstore_id,
+        vs.docstore,
+        index_fingerprint=index_fingerprint(staged_index_path),
+    )
+
+    os.replace(staged_index_path, index_path)
+
+    # A stale pickle next to the new files would only be confusing (and unsafe)
+    legacy = os.path.join(target_dir, LEGACY_PICKLE_FILENAME)
+    if os.path.exists(legacy):
+        os.remove(legacy)
+
+
+def _read_index_and_docstore(
+    path: str,
+    read_index: Callable[[str], Any],
+    attempts: int = 50,
+) -> Tuple[Any, SQLiteDocstore]:
+    """
+    Read index.faiss and open docstore.sqlite as a matching pair.
+
+    A writer publishes the docstore before it renames the new index into place,
+    so a reader can briefly see a docstore newer than the index it read. The
+    docstore's recorded index fingerprint is compared with the fingerprint of
+    the index actually read; on a mismatch both are read again. Docstores
+    written before the fingerprint was recorded are accepted as they are.
+    """
+    index_path = os.path.join(path, INDEX_FILENAME)
+    for _ in range(attempts):
+        fingerprint = index_fingerprint(index_path)
+        index = read_index(index_path)
+        if index_fingerprint(index_path) != fingerprint:
+            continue  # index.faiss was replaced while we read it
+        docstore = SQLiteDocstore(os.path.join(path, DOCSTORE_FILENAME))
+        expected = docstore.index_fingerprint()
+        if expected is None or expected == fingerprint:
+            return index, docstore
+        docstore.close()
+        time.sleep(0.02)
+    raise RuntimeError(
+        f"{path}: docstore.sqlite does not match index.faiss (store is being "
+        f"rewritten, or a previous write was interrupted); rebuild the store."
+    )
+
+
+def open_vector_store(path: str, embedding_model) -> FAISS:
+    """
+    Open a store from disk (no cache):
+      - docstore.sqlite present → memory-mapped index + lazy SQLite docstore,
+      - otherwise legacy index.pkl → FAISS.load_local (unpickles the docstore),
+        only with `set_allow_legacy_pickle_stores(True)`; else LegacyStoreError.
+    """
+    docstore_path = os.path.join(path, DOCSTORE_FILENAME)
+    if os.path.exists(docstore_path):
+        index, docstore = _read_index_and_docstore(path, _read_index_mmap)
+        return FAISS(
+            embedding_function=embedding_model,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=docstore.index_to_docstore_id(),
+        )
+
+    return _load_legacy_store(path, embedding_model)
+
+
+def convert_legacy_vector_store(path: str, remove_pickle: bool = False) -> bool:
+    """
+    Migrate a legacy store (index.faiss + index.pkl) to the SQLite docstore
+    layout in place. index.faiss is kept as is (same file format).
+    Only run this on stores you created yourself: it unpickles index.pkl.
+    Returns False if there was nothing to convert.
+    """
+    legacy = os.path.join(path, LEGACY_PICKLE_FILENAME)
+    if not os.path.exists(legacy):
+        return False
+
+    vs = FAISS.load_local(path, None, allow_dangerous_deserialization=True)
+    write_docstore(
+        os.path.join(path, DOCSTORE_FILENAME),
+        vs.index_to_docstore_id,
+        vs.docstore,
+        index_fingerprint=index_fingerprint(os.path.join(path, INDEX_FILENAME)),
+    )
+    if remove_pickle:
+        os.remove(legacy)
+    evict_vector_store(path)
+    return True
+
 
 def build_vector_store(
     docs: List[Document],
     embedding_model,
     target_dir: str,
+    batch_size: int = 64,
+    num_workers: int = 1,
+    incremental: bool = False,
+    index_spec: Optional[IndexSpec] = None,
 ) -> None:
-    os.makedirs(target_dir, exist_ok=True)
+    """
+    Build (or, incremental=True, update) the store at `target_dir` so that it
+    holds exactly `docs`. See `build_vector_store_from_batches`.
+    """
+    build_vector_store_from_batches(
+        [docs],
+        embedding_model,
+        target_dir,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        incremental=incremental,
+        index_spec=index_spec,
+    )
+
+
+def build_vector_store_from_batches(
+    doc_batches: Iterable[List[Document]],
+    embedding_model,
+    target_dir: str,
+    on_batch: Optional[Callable[[int, int], None]] = None,
+    batch_size: int = 64,
+    num_workers: int = 1,
+    incremental: bool = False,
+    index_spec: Optional[IndexSpec] = None,
+) -> int:
+    """
+    Build a store from a stream of Document batches (e.g.
+    `document_loader.iter_document_batches`): each batch is embedded and added
+    to the index as soon as it arrives, so embedding overlaps with parsing of
+    later files.
+
+    Embedding goes through `embeddings.BatchEmbedder` (length-sorted batches of
+    `batch_size`, `num_workers` sentence-transformers processes for HF models);
+    texts found in the persistent embedding cache (backend/embedding_cache.py)
+    are not embedded again. `on_batch(batch_docs, total_docs)` is called as documents are processed.
+
+    incremental=True → documents already in the store (same content + metadata,
+    see backend/fingerprints.py) are kept as they are, and only new or changed
+    ones are embedded. Returns the number of documents in the store.
+
+    `index_spec` selects the saved FAISS index type (backend/index_spec.py;
+    default flat).
+    """
+    stats = _sync_vector_store(
+        doc_batches,
+        embedding_model,
+        target_dir,
+        incremental=incremental,
+        on_batch=on_batch,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        index_spec=index_spec,
+    )
+    return stats["doc_count"]
+
+
+def update_vector_store(
+    folders: List[str],
+    embedding_model,
+    target_dir: str,
+    corpus_name: Optional[str] = None,
+    incremental: bool = True,
+    report: Optional[IngestionReport] = None,
+    on_batch: Optional[Callable[[int, int], None]] = None,
+    batch_size: int = 64,
+    num_workers: int = 1,
+    chunking: Optional[ChunkingSpec] = None,
+    index_spec: Optional[IndexSpec] = None,
+) -> Dict[str, Any]:
+    """
+    Build the store at `target_dir` from the JSON files under `folders`
+    (split into chunks first when `chunking` is given, see backend/chunking.py),
+    saved as the FAISS index type of `index_spec` (see backend/index_spec.py).
+
+    incremental=True and a fingerprint table from an earlier build with the same
+    embedding model → files whose size/mtime (or content hash) did not change
+    are not even parsed, documents of changed files are re-embedded only if
+    their content changed, and documents of removed files are deleted.
+    Otherwise everything is (re)built. Returns build statistics.
+    """
+    # Settings that change the documents of unchanged files: any difference
+    # means every file is parsed again (vectors are still reused by content)
+    table_extra = {
+        "corpus_name": corpus_name,
+        "chunking": chunking.signature() if chunking is not None else None,
+        "index": index_spec.signature() if index_spec is not None and not index_spec.is_flat else None,
+    }
+    table = read_fingerprints(target_dir) if incremental else None
+    if table is not None and (
+        table.get("embedding") != embedding_model_id(embedding_model)
+        or any(table.get(k) != v for k, v in table_extra.items())
+        or not os.path.isfile(os.path.join(target_dir, INDEX_FILENAME))
+    ):
+        table = None
+
+    # Non-flat stores are rebuilt from scratch by `_sync_vector_store`, so every
+    # file has to be parsed (vectors of known texts come from the embedding cache)
+    rebuild = index_spec is not None and not index_spec.is_flat
+
+    files = list_json_files(folders, report)
+    unchanged: List[str] = []
+    changed: List[str] = []
+    file_stats: Dict[str, Dict[str, Any]] = {}
+    for path in files:
+        is_changed, fresh = file_changed(path, (table or {}).get("files", {}).get(path))
+        (changed if is_changed or rebuild else unchanged).append(path)
+        if fresh is not None:
+            file_stats[path] = fresh
+
+    doc_batches = iter_document_batches(
+        folders,
+        corpus_name=corpus_name,
+        report=report,
+        files=changed,
+    )
+    if chunking is not None:
+        doc_batches = chunk_document_batches(doc_batches, chunking)
+    if report is not None:
+        doc_batches = _count_chunks(doc_batches, report)
+
+    stats = _sync_vector_store(
+        doc_batches,
+        embedding_model,
+        target_dir,
+        incremental=incremental,
+        unchanged_sources=unchanged,
+        file_stats=file_stats,
+        table_extra=table_extra,
+        on_batch=on_batch,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        index_spec=index_spec,
+        scanned_folders=folders,
+    )
+    stats["files_unchanged"] = len(unchanged)
+    stats["files_parsed"] = len(changed)
+    return stats
+
+
+def _recorded_sources_removed(
+    recorded: Dict[str, Any],
+    scanned_folders: Optional[Sequence[str]],
+) -> bool:
+    """
+    True when a store's recorded sources were really all deleted: the table
+    lists at least one source, and each one is gone from disk and lay under a
+    folder that still exists and was scanned by this build.
+    """
+    roots = [os.path.abspath(f) for f in (scanned_folders or ()) if os.path.isdir(f)]
+    if not recorded or not roots:
+        return False
+    for src in recorded:
+        if not src or os.path.exists(src):
+            return False
+        src_path = os.path.abspath(src)
+        if not any(os.path.commonpath([root, src_path]) == root for root in roots):
+            return False
+    return True
 
-    vs = FAISS.from_documents(docs, embedding_model)
-    vs.save_local(target_dir)
 
-    _VECTOR_STORE_CACHE[target_dir] = vs
+def _count_chunks(
+    doc_batches: Iterable[List[Document]], report: IngestionReport
+) -> Iterator[List[Document]]:
+    """Pass the batches through, counting their documents in `report.chunks`."""
+    for batch in doc_batches:
+        report.chunks += len(batch)
+        yield batch
+
+
+def _open_vector_store_in_memory(path: str, embedding_model) -> FAISS:
+    """Writable in-RAM copy of a store (index + documents), for incremental updates."""
+    docstore_path = os.path.join(path, DOCSTORE_FILENAME)
+    if not os.path.exists(docstore_path):
+        return _load_legacy_store(path, embedding_model)
+
+    index, sqlite_docstore = _read_index_and_docstore(path, faiss.read_index)
+    try:
+        index_to_docstore_id = sqlite_docstore.index_to_docstore_id()
+        docs = {d.id: d for d in sqlite_docstore.iter_documents()}
+    finally:
+        sqlite_docstore.close()
+    return FAISS(
+        embedding_function=embedding_model,
+        index=index,
+        docstore=InMemoryDocstore(docs),
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+def _sync_vector_store(
+    doc_batches: Iterable[List[Document]],
+    embedding_model,
+    target_dir: str,
+    incremental: bool,
+    unchanged_sources: Iterable[str] = (),
+    file_stats: Optional[Dict[str, Dict[str, Any]]] = None,
+    table_extra: Optional[Dict[str, Any]] = None,
+    on_batch: Optional[Callable[[int, int], None]] = None,
+    batch_size: int = 64,
+    num_workers: int = 1,
+    index_spec: Optional[IndexSpec] = None,
+    scanned_folders: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Make the store at `target_dir` hold the documents of `unchanged_sources`
+    (taken from the existing store as they are) + the documents in `doc_batches`;
+    everything else is deleted. Documents are grouped by metadata['source'].
+
+    Without a usable fingerprint table (or incremental=False) the store is built
+    from scratch. Otherwise a document whose (content, metadata) fingerprint is
+    already recorded for its source keeps its vector and id; a new document
+    whose content exists somewhere in the store reuses that vector; only the
+    rest is embedded.
+
+    Only flat indexes are updated in place: a store saved as another index type
+    (lossy or not editable vector by vector) is rebuilt from `doc_batches` alone,
+    which must then hold every document (`update_vector_store` parses all files
+    for such stores), with the vectors of known texts coming from the embedding
+    cache. A non-flat `index_spec` is applied when the store is saved.
+
+    A sync that ends without any document only removes the existing store when
+    every source recorded in its fingerprint table was deleted from one of the
+    `scanned_folders` (see `_recorded_sources_removed`); otherwise (missing or
+    mistyped folder, files that failed to parse, no fingerprint table) nothing
+    is written and the old store is kept (stats["store_kept"]).
+    """
+    t0 = time.perf_counter()
+    file_stats = file_stats or {}
+    emb_id = embedding_model_id(embedding_model)
+    stats: Dict[str, Any] = {
+        "mode": "incremental",
+        "docs_kept": 0,
+        "docs_embedded": 0,
+        "docs_reused_vectors": 0,
+        "docs_deleted": 0,
+        "doc_count": 0,
+        "store_kept": False,
+        "store_removed": False,
+        "elapsed_s": 0.0,
+    }
+
+    vs: Optional[FAISS] = None
+    old_files: Dict[str, Dict[str, Any]] = {}
+    table = read_fingerprints(target_dir) if incremental else None
+    if (
+        table is not None
+        and table.get("embedding") == emb_id
+        and os.path.isfile(os.path.join(target_dir, INDEX_FILENAME))
+    ):
+        vs = _open_vector_store_in_memory(target_dir, embedding_model)
+        old_files = table.get("files", {})
+        if not is_flat_index(vs.index):
+            print(
+                f"[vector_store] {target_dir}: {type(vs.index).__name__} cannot be "
+                "updated in place → full rebuild."
+            )
+            vs = None
+            old_files = {}
+            stats["mode"] = "full"
+    else:
+        if incremental and os.path.isfile(os.path.join(target_dir, INDEX_FILENAME)):
+            print(
+                f"[vector_store] {target_dir}: no fingerprint table for this embedding "
+                "model → full rebuild."
+            )
+        stats["mode"] = "full"
+
+    # Existing documents: per source {(content, metadata) hash -> [ids]}, and
+    # {content hash -> index position} to reuse vectors of moved/edited docs
+    unchanged = {s for s in unchanged_sources if s in old_files}
+    old_pos: Dict[str, int] = {}
+    if vs is not None:
+        old_pos = {doc_id: pos for pos, doc_id in vs.index_to_docstore_id.items()}
+    reusable: Dict[str, Dict[Tuple[str, str], List[str]]] = {}
+    pos_by_content: Dict[str, int] = {}
+    for src, entry in old_files.items():
+        for doc_id, ch, mh in entry.get("docs", []):
+            if doc_id not in old_pos:
+                continue
+            pos_by_content.setdefault(ch, old_pos[doc_id])
+            if src not in unchanged:
+                reusable.setdefault(src, {}).setdefault((ch, mh), []).append(doc_id)
+
+    new_files: Dict[str, Dict[str, Any]] = {s: old_files[s] for s in unchanged}
+    kept_ids: set = set()
+    processed = 0
+
+    def _progress(n: int) -> None:
+        nonlocal processed
+        processed += n
+        if on_batch is not None and n:
+            on_batch(n, processed)
+
+    cache = get_default_embedding_cache()
+    cache_hits0 = cache.hits if cache is not None else 0
+    with BatchEmbedder(
+        embedding_model, batch_size=batch_size, num_workers=num_workers, cache=cache
+    ) as embedder:
+        for batch in doc_batches:
+            to_add: List[Tuple[Document, str, Optional[int]]] = []
+            for doc in batch:
+                src = str((doc.metadata or {}).get("source", ""))
+                ch, mh = document_fingerprint(doc)
+                entry = new_files.setdefault(src, {"docs": []})
+
+                ids = reusable.get(src, {}).get((ch, mh))
+                if ids:
+                    doc_id = ids.pop()
+                    kept_ids.add(doc_id)
+                    stats["docs_kept"] += 1
+                else:
+                    doc_id = doc.id or str(uuid.uuid4())
+                    to_add.append((doc, doc_id, pos_by_content.get(ch)))
+                entry["docs"].append([doc_id, ch, mh])
+            _progress(len(batch) - len(to_add))
+            if not to_add:
+                continue
+
+            # Vectors: reconstructed from the index when the content is known
+            vectors: List[Optional[np.ndarray]] = [None] * len(to_add)
+            for i, (_, _, pos) in enumerate(to_add):
+                if pos is not None:
+                    try:
+                        vectors[i] = vs.index.reconstruct(int(pos))
+                    except RuntimeError:  # index type without reconstruct
+                        pass
+            missing = [i for i, v in enumerate(vectors) if v is None]
+            stats["docs_reused_vectors"] += len(to_add) - len(missing)
+            _progress(len(to_add) - len(missing))
+            if missing:
+                embedded = embedder.embed(
+                    [to_add[i][0].page_content for i in missing], on_step=_progress
+                )
+                for i, vec in zip(missing, embedded):
+                    vectors[i] = vec
+                stats["docs_embedded"] += len(missing)
+
+            text_embeddings = [(d.page_content, v) for (d, _, _), v in zip(to_add, vectors)]
+            metadatas = [d.metadata for d, _, _ in to_add]
+            ids = [doc_id for _, doc_id, _ in to_add]
+            if vs is None:
+                vs = FAISS.from_embeddings(
+                    text_embeddings, embedding_model, metadatas=metadatas, ids=ids
+                )
+            else:
+                vs.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+
+    # Documents of re-parsed or removed sources that were not matched again
+    to_delete = [
+        doc_id
+        for src, entry in old_files.items()
+        if src not in unchanged
+        for doc_id, _, _ in entry.get("docs", [])
+        if doc_id in old_pos and doc_id not in kept_ids
+    ]
+    if vs is not None and to_delete:
+        vs.delete(to_delete)
+    stats["docs_deleted"] = len(to_delete)
+    stats["embedding_cache_hits"] = (cache.hits - cache_hits0) if cache is not None else 0
+
+    for src, entry in new_files.items():
+        if src in file_stats:
+            entry.update(file_stats[src])
+        elif src not in unchanged and os.path.isfile(src):
+            entry.update(file_fingerprint(src))
+
+    if vs is None or vs.index.ntotal == 0:
+        if os.path.isfile(os.path.join(target_dir, INDEX_FILENAME)):
+            recorded = (read_fingerprints(target_dir) or {}).get("files", {})
+            if _recorded_sources_removed(recorded, scanned_folders):
+                # Every source is gone: keeping the old index would serve deleted documents
+                print(f"[vector_store] {target_dir}: no documents left → store removed.")
+                clear_vector_store_cache(target_dir)
+                stats["store_removed"] = True
+            else:
+                print(f"[vector_store] {target_dir}: no documents found → existing store kept.")
+                stats["store_kept"] = True
+                stats["docs_deleted"] = 0
+        stats["elapsed_s"] = time.perf_counter() - t0
+        return stats
+
+    table = new_table(emb_id, vs.index.d)
+    table.update(table_extra or {})
+    table["files"] = new_files
+
+    if (
+        stats["mode"] == "full"
+        or stats["docs_embedded"]
+        or stats["docs_reused_vectors"]
+        or to_delete
+        or (index_spec is not None and not index_spec.is_flat)
+    ):
+        save_vector_store(vs, target_dir, index_spec=index_spec)
+        # Next load reopens it memory-mapped instead of keeping the build copy in RAM
+        evict_vector_store(target_dir)
+    write_fingerprints(target_dir, table)
+
+    stats["doc_count"] = int(vs.index.ntotal)
+    stats["elapsed_s"] = time.perf_counter() - t0
+    return stats
 
 
 def load_vector_store(
     path: str,
     embedding_model,
 ) -> FAISS:
-    cached = _VECTOR_STORE_CACHE.get(path)
-    if cached is not None:
-        return cached
+    """
+    Cached `open_vector_store`. The cache key is the normalized absolute path;
+    a cached store is reused only while its files on disk are unchanged.
+    The store is opened outside the cache lock, under a per-path load lock.
+    """
+    key = _normalize_store_path(path)
+    stamp = _store_stamp(key)
 
-    vs = FAISS.load_local(
-        path,
-        embedding_model,
-        allow_dangerous_deserialization=True,
-    )
-    _VECTOR_STORE_CACHE[path] = vs
-    return vs
+    def _cached() -> Optional[FAISS]:
+        # Caller holds _VECTOR_STORE_LOCK
+        entry = _VECTOR_STORE_CACHE.get(key)
+        if entry is None or entry.stamp != stamp:
+            return None
+        _VECTOR_STORE_CACHE.move_to_end(key)
+        entry.hits += 1
+        entry.last_used = time.time()
+        return entry.store
+
+    with _VECTOR_STORE_LOCK:
+        vs = _cached()
+        if vs is not None:
+            return vs
+        if key in _VECTOR_STORE_CACHE:
+            print(f"[vector_store] {path}: files changed on disk → reloading.")
+            del _VECTOR_STORE_CACHE[key]
+        load_lock = _STORE_LOAD_LOCKS.setdefault(key, threading.Lock())
+
+    with load_lock:
+        # Another thread may have opened it while we waited
+        with _VECTOR_STORE_LOCK:
+            vs = _cached()
+            if vs is not None:
+                return vs
+
+        vs = open_vector_store(path, embedding_model)
+        entry = _CachedStore(
+            store=vs,
+            path=key,
+            stamp=stamp,
+            nbytes=_estimate_store_bytes(vs, stamp),
+            layout="sqlite+mmap" if isinstance(vs.docstore, SQLiteDocstore) else "legacy-pickle",
+        )
+        with _VECTOR_STORE_LOCK:
+            _VECTOR_STORE_CACHE[key] = entry
+            _VECTOR_STORE_CACHE.move_to_end(key)
+            _STORE_LOAD_LOCKS.pop(key, None)
+            _evict_over_budget()
+        return vs
 
 
 def clear_vector_store_cache(path: str) -> None:
     """Delete vector store from disk and from in-memory cache."""
-    if path in _VECTOR_STORE_CACHE:
-        del _VECTOR_STORE_CACHE[path]
+    evict_vector_store(path)
     if os.path.isdir(path):
-        shutil.rmtree(path)
\ No newline at end of file
+        shutil.rmtree(path)
+
+
+def sample_documents(vector_store: FAISS, n: Optional[int] = 20) -> List[Document]:
+    """First `n` documents of a store (all if n is None) in index order, whatever its docstore type."""
+    docstore = vector_store.docstore
+    if isinstance(docstore, SQLiteDocstore):
+        return list(docstore.iter_documents(limit=n))
+    docs: List[Document] = []
+    for pos in sorted(vector_store.index_to_docstore_id)[:n]:
+        doc = docstore.search(vector_store.index_to_docstore_id[pos])
+        if isinstance(doc, Document):
+            docs.append(doc)
+    return docs
+
+
+# Stored vectors read to compute a manifest's centroids (evenly spaced sample above it)
+_CENTROID_SAMPLE_SIZE = 50_000
+
+
+def _centroid_sample(vector_store: FAISS) -> Optional[np.ndarray]:
+    """Stored vectors for the manifest centroids (None if the index cannot reconstruct)."""
+    n = vector_store.index.ntotal
+    if n <= _CENTROID_SAMPLE_SIZE:
+        positions = list(range(n))
+    else:
+        positions = np.linspace(0, n - 1, _CENTROID_SAMPLE_SIZE).astype(np.int64).tolist()
+    return get_stored_vectors(vector_store, positions)
+
+
+# {normalized store path -> (index.faiss stat stamp, manifest)}
+_MANIFEST_CACHE: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+_MANIFEST_LOCK = threading.Lock()
+
+
+def get_db_manifest(path: str, embedding_model=None) -> Dict[str, Any]:
+    """
+    Manifest (see backend/manifest.py) of a store, cached in-process until
+    index.faiss changes on disk. A missing or stale manifest is computed once
+    from the store and persisted next to it (best effort).
+    """
+    key = _normalize_store_path(path)
+    index_path = os.path.join(key, INDEX_FILENAME)
+    st = os.stat(index_path)
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    with _MANIFEST_LOCK:
+        cached = _MANIFEST_CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    manifest = read_manifest(key, index_path)
+    if manifest is None:
+        vs = load_vector_store(path, embedding_model)
+        manifest = compute_manifest(
+            sample_documents(vs, None),
+            dimension=vs.index.d,
+            index_type=type(vs.index).__name__,
+            vectors=_centroid_sample(vs),
+        )
+        try:
+            write_manifest(key, manifest, index_path)
+        except OSError as e:
+            print(f"[vector_store] Could not persist manifest for {path}: {e}")
+
+    with _MANIFEST_LOCK:
+        _MANIFEST_CACHE[key] = (stamp, manifest)
+    return manifest
+
+
+# {(index class, normalized store path) -> (index.faiss stat stamp, index)}
+_SIDE_INDEX_CACHE: Dict[Tuple[type, str], Tuple[Tuple[int, int, int], Any]] = {}
+
+
+def _get_side_index(cls: type, label: str, path: str, embedding_model=None) -> Any:
+    """
+    A per-store index file next to index.faiss (`cls` with load / build / save),
+    cached in-process until index.faiss changes on disk. A missing or stale one
+    is built once from the store's documents and persisted (best effort).
+    """
+    key = _normalize_store_path(path)
+    index_path = os.path.join(key, INDEX_FILENAME)
+    st = os.stat(index_path)
+    stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    with _MANIFEST_LOCK:
+        cached = _SIDE_INDEX_CACHE.get((cls, key))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    side = cls.load(key, index_path)
+    if side is None:
+        vs = load_vector_store(path, embedding_model)
+        side = cls.build(sample_documents(vs, None))
+        try:
+            side.save(key, index_path)
+        except OSError as e:
+            print(f"[vector_store] Could not persist {label} for {path}: {e}")
+
+    with _MANIFEST_LOCK:
+        _SIDE_INDEX_CACHE[(cls, key)] = (stamp, side)
+    return side
+
+
+def get_metadata_index(path: str, embedding_model=None) -> MetadataIndex:
+    """Inverted metadata index of a store (see backend/metadata_index.py)."""
+    return _get_side_index(MetadataIndex, "metadata index", path, embedding_model)
+
+
+def get_lexical_index(path: str, embedding_model=None) -> LexicalIndex:
+    """BM25 index of a store (see backend/lexical_index.py)."""
+    return _get_side_index(LexicalIndex, "lexical index", path, embedding_model)
+
+
+def similarity_search_with_ids(
+    vector_store: FAISS,
+    query_vector: Sequence[float],
+    k: int,
+    filter: Optional[Dict[str, Any]] = None,
+    fetch_k: int = 20,
+    metadata_index: Optional[MetadataIndex] = None,
+    nprobe: int = 0,
+    ef_search: int = 0,
+) -> List[Tuple[Document, float, int]]:
+    """
+    Same search as `FAISS.similarity_search_with_score_by_vector`, but also
+    returns the FAISS index position of every hit so the stored vector can be
+    reused later (see `get_stored_vectors`).
+
+    With a `metadata_index` of the store that can resolve `filter`, the filter
+    is applied inside the FAISS search (IDSelector over the matching positions):
+    exact top-k among matching documents. Otherwise the top `fetch_k` hits are
+    post-filtered (may return fewer than k).
+
+    `nprobe` / `ef_search` override the search settings stored in IVF / HNSW
+    indexes (0 = keep them); flat indexes ignore them.
+
+    Returns a list of (document, L2 distance, index position), best first.
+    """
+    vector = np.array([query_vector], dtype=np.float32)
+    if getattr(vector_store, "_normalize_L2", False):
+        faiss.normalize_L2(vector)
+
+    index = vector_store.index
+    mask = None
+    if filter is not None and metadata_index is not None and metadata_index.n == index.ntotal:
+        mask = metadata_index.mask(filter)
+
+    filter_func = None
+    if mask is not None:
+        if not mask.any():
+            return []
+        # Bit i of byte i // 8 (little bit order) = position i; `bitmap` must
+        # stay alive for the duration of the search
+        bitmap = np.packbits(mask, bitorder="little")
+        selector = faiss.IDSelectorBitmap(index.ntotal, faiss.swig_ptr(bitmap))
+        params = search_parameters(
+            index, nprobe, ef_search, selector=selector, selectivity=float(mask.mean())
+        )
+        scores, indices = index.search(vector, k, params=params)
+    else:
+        n_search = k if filter is None else max(fetch_k, k)
+        params = search_parameters(index, nprobe, ef_search)
+        if params is None:
+            scores, indices = index.search(vector, n_search)
+        else:
+            scores, indices = index.search(vector, n_search, params=params)
+        if filter is not None:
+            filter_func = vector_store._create_filter_func(filter)
+
+    # Not enough vectors in the index → FAISS pads with -1
+    hits = [(j, int(i)) for j, i in enumerate(indices[0]) if i != -1]
+    ids = [vector_store.index_to_docstore_id[i] for _, i in hits]
+    docstore = vector_store.docstore
+    if isinstance(docstore, SQLiteDocstore):
+        # One SQLite query for all hits instead of one per hit
+        docs = docstore.mget(ids)
+    else:
+        docs = [docstore.search(_id) for _id in ids]
+
+    results: List[Tuple[Document, float, int]] = []
+    for (j, i), _id, doc in zip(hits, ids, docs):
+        if not isinstance(doc, Document):
+            raise ValueError(f"Could not find document for id {_id}, got {doc}")
+        if filter_func is not None and not filter_func(doc.metadata):
+            continue
+        results.append((doc, float(scores[0][j]), i))
+
+    return results[:k]
+
+
+def lexical_search_with_ids(
+    vector_store: FAISS,
+    query_text: str,
+    k: int,
+    lexical_index: LexicalIndex,
+    filter: Optional[Dict[str, Any]] = None,
+    fetch_k: int = 20,
+    metadata_index: Optional[MetadataIndex] = None,
+    known: Optional[Dict[int, Document]] = None,
+) -> List[Tuple[Document, float, int]]:
+    """
+    BM25 top-k of `query_text` as (document, BM25 score, index position), best
+    first. The filter is applied via `metadata_index` when it can resolve it,
+    else the top `fetch_k` hits are post-filtered. Documents already loaded
+    (`known`, by position) are not read from the docstore again.
+    """
+    mask = None
+    if filter is not None and metadata_index is not None and metadata_index.n == lexical_index.n:
+        mask = metadata_index.mask(filter)
+    post_filter = filter is not None and mask is None
+    lexical = lexical_index.search(query_text, max(fetch_k, k) if post_filter else k, mask=mask)
+
+    docs_by_pos: Dict[int, Document] = dict(known or {})
+    missing = [pos for pos, _ in lexical if pos not in docs_by_pos]
+    if missing:
+        ids = [vector_store.index_to_docstore_id[pos] for pos in missing]
+        docstore = vector_store.docstore
+        if isinstance(docstore, SQLiteDocstore):
+            found = docstore.mget(ids)
+        else:
+            found = [docstore.search(_id) for _id in ids]
+        filter_func = vector_store._create_filter_func(filter) if post_filter else None
+        for pos, doc in zip(missing, found):
+            if not isinstance(doc, Document):
+                continue
+            if filter_func is not None and not filter_func(doc.metadata):
+                continue
+            docs_by_pos[pos] = doc
+
+    return [(docs_by_pos[pos], score, pos) for pos, score in lexical if pos in docs_by_pos][:k]
+
+
+def get_stored_vectors(
+    vector_store: FAISS,
+    positions: Sequence[int],
+) -> Optional[np.ndarray]:
+    """
+    Read the vectors already stored in the FAISS index for the given positions.
+
+    Returns a float32 array of shape (len(positions), dim), or None if the index
+    type cannot reconstruct vectors (callers then fall back to re-embedding).
+    """
+    if not positions:
+        return np.zeros((0, vector_store.index.d), dtype=np.float32)
+
+    ids = np.asarray(positions, dtype=np.int64)
+    try:
+        vecs = vector_store.index.reconstruct_batch(ids)
+    except Exception:
+        try:
+            vecs = np.vstack([vector_store.index.reconstruct(int(i)) for i in ids])
+        except Exception:
+            return None
+    return np.asarray(vecs, dtype=np.float32)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Migrate legacy (index.pkl) vector stores to the mmap + SQLite layout."
+    )
+    parser.add_argument("--convert", nargs="+", metavar="PATH", required=True)
+    parser.add_argument(
+        "--remove-pickle",
+        action="store_true",
+        help="Delete index.pkl after a successful conversion.",
+    )
+    args = parser.parse_args()
+
+    for store_path in args.convert:
+        done = convert_legacy_vector_store(store_path, remove_pickle=args.remove_pickle)
+        print(f"{store_path}: {'converted' if done else 'nothing to convert'}")
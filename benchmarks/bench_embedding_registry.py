@@ -0,0 +1,100 @@
+# benchmarks/bench_embedding_registry.py
+"""
+Per-query retrieval latency: fresh embedding model per question (old behavior)
+vs. the shared process-wide embedding registry.
+
+For every question it embeds the query and searches the bundled
+`vector_store_div` and `vector_store_inh` FAISS stores, exactly like the
+retrieval step of the chat pipelines (LLM calls are not included).
+
+Usage (from the repo root):
+    python benchmarks/bench_embedding_registry.py --repeats 5
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import RAGConfig  # noqa: E402
+from backend.embeddings import (  # noqa: E402
+    _build_embedding_model,
+    evict_embedding_model,
+    get_embedding_model,
+    warm_up_embedding_model,
+)
+from backend.vector_store import load_vector_store  # noqa: E402
+
+QUESTIONS: List[str] = [
+    "Can I sell my half of the marital property during the divorce?",
+    "Who inherits if the deceased left no will and has two children?",
+    "How long does a contentious separation usually last in Italy?",
+    "What is the reserved share (legittima) of a surviving spouse?",
+    "Is a handwritten will valid without witnesses?",
+]
+
+STORES = ["vector_store/vector_store_div", "vector_store/vector_store_inh"]
+
+
+def _run(label: str, get_model: Callable[[], object], repeats: int, top_k: int) -> List[float]:
+    timings: List[float] = []
+    for _ in range(repeats):
+        for q in QUESTIONS:
+            t0 = time.perf_counter()
+            model = get_model()
+            q_vec = model.embed_query(q)
+            for path in STORES:
+                vs = load_vector_store(path, model)
+                vs.similarity_search_by_vector(q_vec, k=top_k * 3)
+            timings.append((time.perf_counter() - t0) * 1000.0)
+    print(
+        f"{label:<28} n={len(timings):>3}  "
+        f"mean={statistics.mean(timings):8.1f} ms  "
+        f"median={statistics.median(timings):8.1f} ms  "
+        f"p95={sorted(timings)[int(0.95 * (len(timings) - 1))]:8.1f} ms"
+    )
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--model", default=RAGConfig.embedding_model_name)
+    args = parser.parse_args()
+
+    config = RAGConfig(embedding_model_name=args.model)
+
+    # Load the stores once so both variants measure only the embedding side.
+    warm = get_embedding_model(config)
+    for path in STORES:
+        load_vector_store(path, warm)
+    evict_embedding_model(config)
+
+    before = _run(
+        "before: model per question",
+        lambda: _build_embedding_model(config),
+        args.repeats,
+        args.top_k,
+    )
+
+    t_warm = warm_up_embedding_model(config)
+    print(f"registry warm-up (one-off): {t_warm * 1000.0:.1f} ms")
+    after = _run(
+        "after: shared registry",
+        lambda: get_embedding_model(config),
+        args.repeats,
+        args.top_k,
+    )
+
+    speedup = statistics.mean(before) / max(statistics.mean(after), 1e-9)
+    print(f"mean speed-up: x{speedup:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_index_specs.py
+"""
+Recall@k, query latency and memory of the FAISS index types of
+backend/index_spec.py (flat, IVF-Flat, IVF-PQ, HNSW, SQ8).
+
+The vectors are the ones stored in the bundled stores (no embedding model
+needed). Queries are --queries stored vectors with a little Gaussian noise;
+ground truth is the exact (flat) top k, so recall@k = share of the exact
+neighbours an index returns. `--scale N` adds noisy copies of the vectors up
+to N vectors per store, to see how the index types behave on a corpus the size
+of a chunked multi-country production store. Memory is the serialized index
+size (what index.faiss takes on disk and in RAM / page cache).
+
+IVF types are evaluated at several nprobe values and HNSW at several efSearch
+values (--nprobe / --ef), which is the recall / latency trade-off exposed by
+RAGConfig.index_nprobe / index_ef_search.
+
+Usage (from the repo root):
+    python benchmarks/bench_index_specs.py --k 10 --queries 200
+    python benchmarks/bench_index_specs.py --scale 200000 --nprobe 4 16 64
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import List, Tuple
+
+import faiss
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.index_spec import IndexSpec, build_index, search_parameters  # noqa: E402
+
+STORES = [
+    "vector_store/vector_store",
+    "vector_store/vector_store_div",
+    "vector_store/vector_store_inh",
+]
+
+
+def _load_vectors(store: str) -> np.ndarray:
+    index = faiss.read_index(os.path.join(ROOT, store, "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def _scaled(vectors: np.ndarray, n: int, rng: np.random.Generator) -> np.ndarray:
+    """`vectors` plus noisy copies of them, n vectors in total."""
+    if n <= len(vectors):
+        return vectors
+    scale = float(vectors.std()) * 0.5
+    extra = vectors[rng.integers(0, len(vectors), n - len(vectors))]
+    extra = extra + rng.normal(0.0, scale, extra.shape).astype(np.float32)
+    return np.vstack([vectors, extra]).astype(np.float32)
+
+
+def _measure(
+    index: faiss.Index,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    k: int,
+    params,
+) -> Tuple[float, float, float]:
+    """(recall@k, median ms, p95 ms), one query at a time like the app does."""
+    timings: List[float] = []
+    found = 0
+    for q, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        if params is None:
+            _, ids = index.search(q[None, :], k)
+        else:
+            _, ids = index.search(q[None, :], k, params=params)
+        timings.append((time.perf_counter() - t0) * 1000.0)
+        found += len(set(ids[0].tolist()) & set(expected.tolist()))
+    timings.sort()
+    return (
+        found / truth.size,
+        statistics.median(timings),
+        timings[int(0.95 * (len(timings) - 1))],
+    )
+
+
+def _bench_store(store: str, args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(args.seed)
+    vectors = _scaled(_load_vectors(store), args.scale, rng)
+    n, d = vectors.shape
+    picks = rng.choice(n, min(args.queries, n), replace=False)
+    noise = float(vectors.std()) * 0.1
+    queries = (vectors[picks] + rng.normal(0.0, noise, (len(picks), d))).astype(np.float32)
+    k = min(args.k, n)
+
+    exact = faiss.IndexFlatL2(d)
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    print(f"\n{store}: n={n} d={d} queries={len(queries)} k={k}")
+    print(f"{'index':<22} {'param':<12} {'recall@k':>8} {'median ms':>10} {'p95 ms':>8} "
+          f"{'MB':>8} {'build s':>8}")
+
+    specs = [
+        (IndexSpec(kind="flat"), [("", None)]),
+        (IndexSpec(kind="sq8"), [("", None)]),
+        (IndexSpec(kind="ivf_flat"), [(f"nprobe={p}", ("nprobe", p)) for p in args.nprobe]),
+        (IndexSpec(kind="ivf_pq"), [(f"nprobe={p}", ("nprobe", p)) for p in args.nprobe]),
+        (IndexSpec(kind="hnsw", hnsw_m=args.hnsw_m), [(f"ef={e}", ("ef_search", e)) for e in args.ef]),
+    ]
+    for spec, settings in specs:
+        t0 = time.perf_counter()
+        try:
+            index = build_index(vectors, spec)
+        except (RuntimeError, ValueError) as e:
+            print(f"{spec.kind:<22} skipped: {e}")
+            continue
+        build_s = time.perf_counter() - t0
+        mb = len(faiss.serialize_index(index)) / 1e6
+        label = spec.factory_string(d, n)
+        for name, setting in settings:
+            kwargs = {setting[0]: setting[1]} if setting else {}
+            params = search_parameters(index, **kwargs)
+            recall, median, p95 = _measure(index, queries, truth, k, params)
+            print(f"{label:<22} {name:<12} {recall:8.3f} {median:10.3f} {p95:8.3f} "
+                  f"{mb:8.2f} {build_s:8.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--stores", nargs="+", default=STORES)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--scale", type=int, default=0, help="vectors per store (noisy copies added)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(1)
+    for store in args.stores:
+        _bench_store(store, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# benchmarks/bench_lexical_fusion.py
+"""
+Recall and latency of pure dense retrieval vs. dense + BM25 fusion (RRF).
+
+Both modes run through `ShardedCollection.search` (retrieval_mode="dense" /
+"fusion"), the call the pipelines make, over one or more stores as shards.
+
+Known-item evaluation: queries are generated from the stores' own documents
+and the document they come from is the target (a hit = a document with the
+same text among the top k):
+  - "phrase":     a random span of --phrase-words consecutive words,
+  - "identifier": the document's civil code citation + 3 of its content words
+                  (what a user asking about "art. 738 ... spouse" types).
+
+Latency is the search only (the query is embedded once, before timing).
+
+Usage (from the repo root):
+    python benchmarks/bench_lexical_fusion.py --queries 200 --k 5
+    # several stores searched as one collection:
+    python benchmarks/bench_lexical_fusion.py --store vector_store/a vector_store/b
+    # model other than the one the store was built with → rebuild a temp copy:
+    python benchmarks/bench_lexical_fusion.py --model /path/to/model --rebuild
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.config import RAGConfig  # noqa: E402
+from backend.embeddings import get_embedding_model  # noqa: E402
+from backend.sharded_collection import ShardedCollection  # noqa: E402
+from backend.vector_store import (  # noqa: E402
+    build_vector_store,
+    get_lexical_index,
+    load_vector_store,
+    sample_documents,
+)
+
+STORE = "vector_store/vector_store"
+
+
+def _make_queries(docs, n: int, phrase_words: int, rng: random.Random) -> List[Tuple[str, str, str]]:
+    """(kind, query, target text) known-item queries."""
+    queries: List[Tuple[str, str, str]] = []
+    candidates = [i for i, d in enumerate(docs) if len(d.page_content.split()) >= phrase_words + 2]
+    for pos in rng.sample(candidates, min(n, len(candidates))):
+        words = docs[pos].page_content.split()
+        start = rng.randrange(0, len(words) - phrase_words)
+        target = docs[pos].page_content
+        queries.append(("phrase", " ".join(words[start:start + phrase_words]), target))
+
+        code = docs[pos].metadata.get("civil_codes_used")
+        if isinstance(code, list):
+            code = code[0] if code else None
+        if code:
+            content = [w for w in words if w.isalpha() and len(w) > 4]
+            picked = rng.sample(content, min(3, len(content)))
+            queries.append(("identifier", f"{code} {' '.join(picked)}", target))
+    return queries
+
+
+def _evaluate(
+    label: str,
+    search: Callable[[str, object], List[str]],
+    queries: List[Tuple[str, str, str]],
+    vectors: Dict[str, object],
+) -> None:
+    hits: Dict[str, List[int]] = {}
+    timings: List[float] = []
+    for kind, query, target in queries:
+        t0 = time.perf_counter()
+        found_texts = search(query, vectors[query])
+        timings.append((time.perf_counter() - t0) * 1000.0)
+        found = target in found_texts
+        hits.setdefault(kind, []).append(int(found))
+
+    recall = "  ".join(
+        f"{kind}={sum(v) / len(v):.3f} (n={len(v)})" for kind, v in sorted(hits.items())
+    )
+    timings.sort()
+    print(
+        f"{label:<8} recall@k: {recall}  |  latency "
+        f"median={statistics.median(timings):6.2f} ms  "
+        f"p95={timings[int(0.95 * (len(timings) - 1))]:6.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--store", nargs="+", default=[STORE], help="store(s), one shard each")
+    parser.add_argument("--model", default=RAGConfig.embedding_model_name)
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Re-embed the store's documents with --model into a temp store first.",
+    )
+    parser.add_argument("--queries", type=int, default=200, help="documents to draw queries from")
+    parser.add_argument("--phrase-words", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rrf-k", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = get_embedding_model(RAGConfig(embedding_model_name=args.model))
+    stores = list(args.store)
+    tmp = None
+    if args.rebuild:
+        tmp = tempfile.TemporaryDirectory(prefix="bench_lexical_")
+        rebuilt = []
+        for i, source in enumerate(stores):
+            target = os.path.join(tmp.name, f"store{i}")
+            docs = sample_documents(load_vector_store(source, model), None)
+            t0 = time.perf_counter()
+            build_vector_store(docs, model, target)
+            print(f"rebuilt {source}: {len(docs)} docs with {args.model} in {time.perf_counter() - t0:.1f}s")
+            rebuilt.append(target)
+        stores = rebuilt
+
+    # Shard names as the pipelines use them: one per store directory
+    shards = {f"{os.path.basename(os.path.normpath(p))}_{i}": p for i, p in enumerate(stores)}
+    collection = ShardedCollection(shards, model)
+    docs = [d for name in shards for d in sample_documents(collection.store(name), None)]
+    t0 = time.perf_counter()
+    lexical = [get_lexical_index(p, model).stats() for p in shards.values()]
+    print(f"stores: {', '.join(stores)}  docs={len(docs)}  lexical indexes ready in "
+          f"{time.perf_counter() - t0:.2f}s ({sum(s['terms'] for s in lexical)} terms, "
+          f"{sum(s['postings'] for s in lexical)} postings)")
+
+    queries = _make_queries(docs, args.queries, args.phrase_words, random.Random(args.seed))
+    vectors = {q: model.embed_query(q) for _, q, _ in queries}
+
+    def searcher(mode: str) -> Callable[[str, object], List[str]]:
+        def search(query: str, vec) -> List[str]:
+            result = collection.search(
+                query, vec, k=args.k, retrieval_mode=mode, rrf_k=args.rrf_k
+            )
+            return [h.doc.page_content for h in result.hits]
+        return search
+
+    _evaluate("dense", searcher("dense"), queries, vectors)
+    _evaluate("fusion", searcher("fusion"), queries, vectors)
+    if tmp is not None:
+        tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
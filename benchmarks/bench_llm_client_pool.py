@@ -0,0 +1,65 @@
+# benchmarks/bench_llm_client_pool.py
+"""
+Offline check of LLM client pooling against the local fake OpenAI server.
+
+Compares the old behavior (a new ChatOpenAI client per call) with the pooled
+LLMBackend client: number of TCP connections opened and mean latency per call.
+
+Usage (from the repo root):
+    python benchmarks/bench_llm_client_pool.py --calls 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import RAGConfig  # noqa: E402
+from backend.llm_provider import LLMBackend, close_llm_clients  # noqa: E402
+from benchmarks.fake_openai_server import FakeOpenAIServer  # noqa: E402
+
+
+def _measure(label: str, server: FakeOpenAIServer, calls: int, call: Callable[[], str]) -> None:
+    conn_before = server.connections
+    timings: List[float] = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - t0) * 1000.0)
+    print(
+        f"{label:<26} calls={calls:>3}  "
+        f"connections opened={server.connections - conn_before:>3}  "
+        f"mean={statistics.mean(timings):7.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="LLM client pool benchmark")
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENROUTER_API_KEY", "sk-fake")
+
+    with FakeOpenAIServer(reply="pong") as server:
+        config = RAGConfig(llm_provider="openrouter", llm_base_url=server.base_url)
+
+        def fresh_client_call() -> str:
+            # Old behavior: build a brand new client (and HTTP pool) on every call
+            llm = LLMBackend(config)._build_langchain_llm()
+            return llm.invoke([("system", "s"), ("user", "ping")]).content
+
+        def pooled_call() -> str:
+            return LLMBackend(config).chat("s", "ping")
+
+        _measure("before: client per call", server, args.calls, fresh_client_call)
+        _measure("after: pooled client", server, args.calls, pooled_call)
+        close_llm_clients()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/bench_router.py
+"""
+Accuracy, coverage and latency of the local query router (backend/router.py).
+
+Held-out evaluation over the bundled `vector_store_div` and `vector_store_inh`
+stores: each store's centroids are computed from (1 - --holdout) of its stored
+vectors, and every held-out document is routed as a pseudo-question (its stored
+vector + its first --words words as text). The correct DB is the one it comes
+from. No embedding model or LLM is needed.
+
+Reported: how often the router decides alone (vs. falling back to the LLM),
+how often its DB choice is right, the routing latency, and the LLM routing
+calls saved per question in the single-agent pipeline (retrieval decision +
+DB selection = 2 calls without the router).
+
+Usage (from the repo root):
+    python benchmarks/bench_router.py --holdout 0.2 --words 25
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.config import RAGConfig  # noqa: E402
+from backend.manifest import compute_centroids  # noqa: E402
+from backend.router import build_db_profile, route_question  # noqa: E402
+from backend.vector_store import (  # noqa: E402
+    get_db_manifest,
+    get_stored_vectors,
+    load_vector_store,
+)
+
+STORES = ["vector_store/vector_store_div", "vector_store/vector_store_inh"]
+
+
+def _split(path: str, holdout: float, rng: random.Random):
+    vs = load_vector_store(os.path.join(ROOT, path), None)
+    positions = sorted(vs.index_to_docstore_id)
+    rng.shuffle(positions)
+    n_test = max(1, int(len(positions) * holdout))
+    test, train = positions[:n_test], positions[n_test:]
+    train_vecs = get_stored_vectors(vs, train)
+    queries = []
+    for pos, vec in zip(test, get_stored_vectors(vs, test)):
+        doc = vs.docstore.search(vs.index_to_docstore_id[pos])
+        queries.append((getattr(doc, "page_content", ""), vec))
+    return train_vecs, queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of each store routed")
+    parser.add_argument("--words", type=int, default=25, help="words of the document used as text")
+    parser.add_argument("--margin", type=float, default=RAGConfig.router_margin)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    config = RAGConfig(router_margin=args.margin)
+
+    profiles = []
+    queries: List[Tuple[str, str, np.ndarray]] = []
+    for path in STORES:
+        name = os.path.basename(path)
+        train_vecs, store_queries = _split(path, args.holdout, rng)
+        manifest = dict(get_db_manifest(os.path.join(ROOT, path), None))
+        manifest["centroids"] = compute_centroids(train_vecs)[0].tolist()
+        profiles.append(build_db_profile(name, manifest))
+        queries.extend((name, " ".join(text.split()[: args.words]), vec) for text, vec in store_queries)
+
+    counts: Dict[str, int] = {"retrieval": 0, "selection": 0, "correct": 0, "wrong": 0}
+    timings: List[float] = []
+    saved: List[int] = []
+    for target, text, vec in queries:
+        decision = route_question(text, vec, profiles, config)
+        timings.append(decision.elapsed_ms)
+        counts["retrieval"] += decision.need_retrieval is not None
+        if decision.db_names is not None:
+            counts["selection"] += 1
+            counts["correct" if decision.db_names == [target] else "wrong"] += 1
+        saved.append(int(decision.need_retrieval is not None) + int(decision.db_names is not None))
+
+    n = len(queries)
+    print(f"questions routed:          {n} ({', '.join(p.name for p in profiles)})")
+    print(f"retrieval decided locally: {counts['retrieval'] / n:6.1%}")
+    print(f"DBs selected locally:      {counts['selection'] / n:6.1%}")
+    if counts["selection"]:
+        print(f"  exactly the right DB:    {counts['correct'] / counts['selection']:6.1%}")
+    print(
+        f"routing latency:           median={statistics.median(timings):.3f} ms  "
+        f"p95={sorted(timings)[int(0.95 * (n - 1))]:.3f} ms"
+    )
+    print(f"LLM calls saved/question:  {statistics.mean(saved):.2f} of 2")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+# benchmarks/bench_vector_store_load.py
+"""
+Cold-start time and memory of opening a vector store: legacy layout
+(FAISS.load_local → index read into RAM + pickled docstore) vs. the new layout
+(memory-mapped index.faiss + lazy docstore.sqlite).
+
+Every measurement runs in a fresh subprocess (open the store + one search), so
+import time and earlier loads do not leak between variants. The bundled stores
+are copied to a temp dir, where the legacy index.pkl they no longer ship is
+rebuilt from docstore.sqlite (and converted the other way for the synthetic
+store); `--synthetic N` additionally
+builds an N-vector store to show how RSS scales. Memory is reported as private
+pages vs. shared file-backed pages (the mmap'd index, shared by all processes).
+
+Usage (from the repo root):
+    python benchmarks/bench_vector_store_load.py --repeats 3 --synthetic 200000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STORES = [
+    "vector_store/vector_store",
+    "vector_store/vector_store_div",
+    "vector_store/vector_store_inh",
+]
+
+
+def _rss_mb() -> Dict[str, float]:
+    """Resident memory split into private pages and shared (file-backed, e.g. mmap) pages."""
+    with open("/proc/self/statm") as f:
+        fields = [int(x) for x in f.read().split()]
+    page_mb = os.sysconf("SC_PAGE_SIZE") / 1e6
+    return {"private": (fields[1] - fields[2]) * page_mb, "shared": fields[2] * page_mb}
+
+
+def _child(mode: str, path: str) -> None:
+    """Runs in the subprocess: open one store, search once, print a JSON line."""
+    import warnings
+
+    warnings.filterwarnings("ignore")
+    import numpy as np
+    from langchain_community.vectorstores import FAISS
+
+    from backend.vector_store import open_vector_store, similarity_search_with_ids
+
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    if mode == "legacy":
+        vs = FAISS.load_local(path, None, allow_dangerous_deserialization=True)
+    else:
+        vs = open_vector_store(path, None)
+    t_open = time.perf_counter() - t0
+
+    q = np.random.default_rng(0).random(vs.index.d, dtype=np.float32)
+    t1 = time.perf_counter()
+    similarity_search_with_ids(vs, q, k=5)
+    t_search = time.perf_counter() - t1
+
+    rss1 = _rss_mb()
+    print(json.dumps({
+        "open_ms": t_open * 1000.0,
+        "search_ms": t_search * 1000.0,
+        "private_mb": rss1["private"] - rss0["private"],
+        "shared_mb": rss1["shared"] - rss0["shared"],
+    }))
+
+
+def _measure(mode: str, path: str, repeats: int) -> Dict[str, float]:
+    runs: List[Dict[str, float]] = []
+    for _ in range(repeats):
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, path],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=ROOT,
+        )
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+
+
+def _build_synthetic(target_dir: str, n: int, dim: int = 384) -> None:
+    """Legacy-layout store with n random vectors and small documents."""
+    import faiss
+    import numpy as np
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.documents import Document
+
+    index = faiss.IndexFlatL2(dim)
+    index.add(np.random.default_rng(0).random((n, dim), dtype=np.float32))
+    ids = [str(uuid.uuid4()) for _ in range(n)]
+    docstore = InMemoryDocstore({
+        i: Document(page_content=f"synthetic document {k} " * 20, metadata={"law": "Divorce", "k": k})
+        for k, i in enumerate(ids)
+    })
+    FAISS(None, index, docstore, dict(enumerate(ids))).save_local(target_dir)
+
+
+def _write_legacy_pickle(path: str) -> None:
+    """Recreate the legacy index.pkl of a converted store (index.faiss is left as is)."""
+    import pickle
+
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    from backend.vector_store import open_vector_store
+
+    vs = open_vector_store(path, None)
+    ids = dict(vs.index_to_docstore_id)
+    docstore = InMemoryDocstore({i: vs.docstore.search(i) for i in ids.values()})
+    with open(os.path.join(path, "index.pkl"), "wb") as f:
+        pickle.dump((docstore, ids), f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Vector store cold-start benchmark")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--synthetic", type=int, default=0, help="also test an N-vector store")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    from backend.vector_store import convert_legacy_vector_store
+
+    tmp = tempfile.mkdtemp(prefix="bench_vs_")
+    try:
+        paths = []
+        for store in STORES:
+            dst = os.path.join(tmp, os.path.basename(store))
+            shutil.copytree(os.path.join(ROOT, store), dst)
+            paths.append(dst)
+        if args.synthetic:
+            dst = os.path.join(tmp, f"synthetic_{args.synthetic}")
+            _build_synthetic(dst, args.synthetic)
+            paths.append(dst)
+
+        for path in paths:
+            # Both layouts side by side so each variant can be measured
+            if os.path.isfile(os.path.join(path, "index.pkl")):
+                convert_legacy_vector_store(path)
+            else:
+                _write_legacy_pickle(path)
+            name = os.path.basename(path)
+            for mode in ("legacy", "mmap"):
+                r = _measure(mode, path, args.repeats)
+                print(
+                    f"{name:<22} {mode:<7} open={r['open_ms']:8.1f} ms  "
+                    f"first search={r['search_ms']:6.2f} ms  "
+                    f"RSS private +{r['private_mb']:7.1f} MB  shared +{r['shared_mb']:7.1f} MB"
+                )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/check_store_updates.py
+"""
+Build / incremental-update check of every FAISS index type of
+backend/index_spec.py (flat, IVF-Flat, IVF-PQ, HNSW, SQ8).
+
+For each type, a store is built from a few temporary JSON files, then updated
+with `update_vector_store` after (1) editing one file, (2) adding one,
+(3) deleting one, (4) pointing the build at a missing folder (the store must
+be kept as is), and (5) deleting all of them. After every step the store
+must hold exactly the documents of the files on disk (same vector count and
+same texts), whatever the index type.
+
+The embedding model defaults to a deterministic fake one (no download); pass
+--model to use a real HF model instead.
+
+Usage (from the repo root):
+    python benchmarks/check_store_updates.py
+    python benchmarks/check_store_updates.py --kinds hnsw ivf_pq --docs-per-file 40
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.index_spec import INDEX_KINDS, IndexSpec  # noqa: E402
+from backend.vector_store import (  # noqa: E402
+    INDEX_FILENAME,
+    evict_vector_store,
+    load_vector_store,
+    sample_documents,
+    update_vector_store,
+)
+
+
+def _write(folder: str, name: str, texts: List[str]) -> None:
+    with open(os.path.join(folder, name), "w", encoding="utf-8") as f:
+        json.dump([{"content": t, "metadata": {"law": "Test"}} for t in texts], f)
+
+
+def _expected(folder: str) -> List[str]:
+    texts: List[str] = []
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            texts.extend(item["content"] for item in json.load(f))
+    return sorted(texts)
+
+
+def _stored(store: str, model) -> List[str]:
+    if not os.path.isfile(os.path.join(store, INDEX_FILENAME)):
+        return []
+    evict_vector_store(store)
+    vs = load_vector_store(store, model)
+    texts = sorted(d.page_content for d in sample_documents(vs, None))
+    assert vs.index.ntotal == len(texts), f"{vs.index.ntotal} vectors for {len(texts)} documents"
+    return texts
+
+
+def _check_kind(kind: str, model, docs_per_file: int) -> Dict[str, str]:
+    spec = IndexSpec(kind=kind)
+    results: Dict[str, str] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        data, store = os.path.join(tmp, "data"), os.path.join(tmp, "store")
+        os.makedirs(data)
+
+        def texts(tag: str) -> List[str]:
+            return [f"{tag} document {i} about article {i} of the civil code" for i in range(docs_per_file)]
+
+        missing = os.path.join(tmp, "missing")
+        steps = [
+            ("build", lambda: [_write(data, f"f{i}.json", texts(f"file{i}")) for i in range(4)], data),
+            ("edit", lambda: _write(data, "f1.json", texts("edited")), data),
+            ("add", lambda: _write(data, "f4.json", texts("added")), data),
+            ("delete", lambda: os.remove(os.path.join(data, "f2.json")), data),
+            ("missing folder", lambda: None, missing),
+            ("delete all", lambda: [os.remove(os.path.join(data, n)) for n in os.listdir(data)], data),
+        ]
+        for step, change, folder in steps:
+            change()
+            stats = update_vector_store([folder], model, store, incremental=True, index_spec=spec)
+            expected, stored = _expected(data), _stored(store, model)
+            if folder == missing:
+                ok = expected == stored and stats["store_kept"]
+            else:
+                ok = expected == stored and stats["doc_count"] == len(expected)
+            results[step] = "ok" if ok else (
+                f"FAIL (expected {len(expected)} docs, store has {len(stored)}, "
+                f"reported {stats['doc_count']})"
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--kinds", nargs="+", default=list(INDEX_KINDS), choices=INDEX_KINDS)
+    parser.add_argument("--docs-per-file", type=int, default=30)
+    parser.add_argument("--model", default="", help="HF embedding model (default: fake embeddings)")
+    args = parser.parse_args()
+
+    if args.model:
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        model = HuggingFaceEmbeddings(model_name=args.model)
+    else:
+        from langchain_core.embeddings import DeterministicFakeEmbedding
+
+        model = DeterministicFakeEmbedding(size=64)
+
+    failed = False
+    for kind in args.kinds:
+        results = _check_kind(kind, model, args.docs_per_file)
+        failed = failed or any(r != "ok" for r in results.values())
+        print(f"{kind:<9} " + "  ".join(f"{step}: {r}" for step, r in results.items()))
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/fake_openai_server.py
+"""
+Tiny local OpenAI-compatible server for offline checks of the LLM layer.
+
+It answers POST /v1/chat/completions with a canned completion and counts how
+many TCP connections clients opened, so connection reuse (keep-alive) of the
+pooled LLM clients can be verified without network access or an API key.
+
+Usage as a fixture:
+
+    with FakeOpenAIServer(reply="hello") as server:
+        config.llm_base_url = server.base_url
+        ...
+        print(server.connections, server.requests)
+
+Or standalone:  python benchmarks/fake_openai_server.py --port 8765
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so connections stay open between requests (keep-alive)
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def setup(self) -> None:
+        super().setup()
+        # Avoid Nagle/delayed-ACK stalls between header and body writes
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.requests += 1
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        reply = self.server.reply
+        if body.get("stream"):
+            self._send_stream(body, reply)
+        else:
+            self._send_json(200, _completion(body, reply))
+
+    def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, body: Dict[str, Any], reply: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(raw: bytes) -> None:
+            self.wfile.write(f"{len(raw):X}\r\n".encode("ascii") + raw + b"\r\n")
+            self.wfile.flush()
+
+        for token in reply.split(" "):
+            chunk = _completion(body, token + " ", stream=True)
+            write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        write_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def _completion(body: Dict[str, Any], text: str, stream: bool = False) -> Dict[str, Any]:
+    choice: Dict[str, Any] = {"index": 0, "finish_reason": None if stream else "stop"}
+    if stream:
+        choice["delta"] = {"role": "assistant", "content": text}
+    else:
+        choice["message"] = {"role": "assistant", "content": text}
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion.chunk" if stream else "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [choice],
+        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, reply: str, delay: float):
+        super().__init__(addr, _Handler)
+        self.reply = reply
+        self.delay = delay
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients that time out / cancel simply drop the connection; that's expected.
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeOpenAIServer:
+    """Context manager running the fake server on a background thread."""
+
+    def __init__(self, reply: str = "fake answer", port: int = 0, delay: float = 0.0):
+        self._server = _Server(("127.0.0.1", port), reply, delay)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    @property
+    def connections(self) -> int:
+        return self._server.connections
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reply", default="fake answer")
+    args = parser.parse_args()
+    server = FakeOpenAIServer(reply=args.reply, port=args.port).start()
+    print(f"Serving fake OpenAI API on {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
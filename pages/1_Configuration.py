@@ -148,11 +148,161 @@ with col_r1:
 
 with col_r2:
     config.use_rerank = st.checkbox(
-        "Use extra post-retrieval reranker (placeholder)",
+        "Rerank candidates with a cross-encoder",
         value=config.use_rerank,
         help=(
-            "Reserved flag for plugging in an advanced reranker later.\n"
-            "Current pipeline already does cosine-similarity filtering and reranking."
+            "Second retrieval stage in every pipeline: a cross-encoder scores each "
+            "(question, document) pair and the best top-K are kept. Slower than the "
+            "vector search alone; bounded by the latency budget below."
+        ),
+    )
+
+if config.use_rerank:
+    col_rr1, col_rr2, col_rr3 = st.columns([2, 1, 1])
+    with col_rr1:
+        config.rerank_model_name = st.text_input(
+            "Cross-encoder model",
+            value=config.rerank_model_name,
+            help="Any sentence-transformers CrossEncoder (Hugging Face name or local path).",
+        )
+    with col_rr2:
+        config.rerank_budget_ms = float(
+            st.number_input(
+                "Latency budget (ms, 0 = none)",
+                min_value=0,
+                max_value=60000,
+                value=int(config.rerank_budget_ms),
+                step=100,
+                help="Candidates not scored within the budget keep their retrieval order.",
+            )
+        )
+    with col_rr3:
+        config.rerank_max_length = int(
+            st.number_input(
+                "Max tokens per pair",
+                min_value=64,
+                max_value=512,
+                value=int(config.rerank_max_length),
+                step=32,
+            )
+        )
+
+_chunk_modes = ["neighbors", "parent", "chunks"]
+config.chunk_retrieval_mode = st.radio(
+    "Chunked vector stores: what matched chunks add to the prompt",
+    options=_chunk_modes,
+    index=_chunk_modes.index(config.chunk_retrieval_mode)
+    if config.chunk_retrieval_mode in _chunk_modes
+    else 0,
+    horizontal=True,
+    help=(
+        "- neighbors: the matched chunks plus their neighbouring chunks, one block per document.\n"
+        "- parent: the whole source document of the matched chunks (deduplicated).\n"
+        "- chunks: only the matched chunks."
+    ),
+)
+
+_retrieval_modes = ["dense", "fusion"]
+config.retrieval_mode = st.radio(
+    "Retrieval mode",
+    options=_retrieval_modes,
+    index=_retrieval_modes.index(config.retrieval_mode)
+    if config.retrieval_mode in _retrieval_modes
+    else 0,
+    horizontal=True,
+    help=(
+        "- dense: FAISS embedding similarity only.\n"
+        "- fusion: FAISS + a BM25 keyword index of each store, merged with reciprocal "
+        "rank fusion. Better for exact article / case numbers and legal terms."
+    ),
+)
+
+col_s1, col_s2 = st.columns(2)
+with col_s1:
+    config.index_nprobe = st.number_input(
+        "IVF stores: cells searched (nprobe)",
+        min_value=1,
+        max_value=4096,
+        value=int(config.index_nprobe),
+        help="More cells → higher recall, slower search. Flat stores ignore it.",
+    )
+with col_s2:
+    config.index_ef_search = st.number_input(
+        "HNSW stores: candidate list (efSearch)",
+        min_value=8,
+        max_value=4096,
+        value=int(config.index_ef_search),
+        help="Larger → higher recall, slower search. Flat stores ignore it.",
+    )
+
+col_ac1, col_ac2, col_ac3 = st.columns([1, 1, 1])
+with col_ac1:
+    config.use_answer_cache = st.checkbox(
+        "Answer cache for repeated questions",
+        value=config.use_answer_cache,
+        help=(
+            "A question almost identical to an earlier one (same models, DBs and "
+            "settings) is answered instantly from the cache, without retrieval or LLM "
+            "calls. Entries of a DB are dropped when it is rebuilt.\n\n"
+            "Off by default: answers are shared by every session, and questions that "
+            "differ only by a negation or a jurisdiction can look almost identical."
+        ),
+    )
+with col_ac2:
+    config.answer_cache_threshold = st.slider(
+        "Answer cache: min. question similarity",
+        min_value=0.80,
+        max_value=1.0,
+        value=float(config.answer_cache_threshold),
+        step=0.01,
+        disabled=not config.use_answer_cache,
+        help="Cosine similarity of the question embeddings; 1.0 = identical questions only.",
+    )
+with col_ac3:
+    config.answer_cache_ttl_s = 3600 * st.number_input(
+        "Answer cache: expiry (hours, 0 = never)",
+        min_value=0,
+        max_value=24 * 365,
+        value=int(config.answer_cache_ttl_s // 3600),
+        disabled=not config.use_answer_cache,
+    )
+
+col_lr1, col_lr2, col_lr3 = st.columns([1, 1, 1])
+with col_lr1:
+    config.use_local_router = st.checkbox(
+        "Local router for retrieval / DB decisions",
+        value=config.use_local_router,
+        help=(
+            "Decide whether a question needs retrieval and which DB(s) to search "
+            "from each DB's centroid vectors and metadata keywords, in milliseconds "
+            "and without LLM calls. The LLM is asked only when the router is unsure."
+        ),
+    )
+with col_lr2:
+    config.router_min_similarity = st.slider(
+        "Router: similarity to use retrieval",
+        min_value=0.0,
+        max_value=1.0,
+        value=float(config.router_min_similarity),
+        step=0.05,
+        disabled=not config.use_local_router,
+        help=(
+            "Questions at least this similar to a DB use retrieval; below "
+            f"{config.router_skip_similarity:.2f} they are answered without it; "
+            "in between the LLM decides."
+        ),
+    )
+with col_lr3:
+    config.router_margin = st.slider(
+        "Router: DB score margin",
+        min_value=0.0,
+        max_value=0.3,
+        value=float(config.router_margin),
+        step=0.01,
+        disabled=not config.use_local_router,
+        help=(
+            "DBs scoring within this margin of the best one are all candidates; "
+            "several candidates not named by keywords in the question → the LLM picks."
         ),
     )
 
@@ -173,6 +323,24 @@ config.agentic_mode = st.radio(
     ),
 )
 
+if config.agentic_mode == "hybrid_legal":
+    _meta_modes = ["sequential", "parallel", "fused"]
+    config.hybrid_metadata_mode = st.radio(
+        "Hybrid metadata extraction mode",
+        options=_meta_modes,
+        index=_meta_modes.index(config.hybrid_metadata_mode)
+        if config.hybrid_metadata_mode in _meta_modes
+        else 0,
+        horizontal=True,
+        help=(
+            "- sequential: classify law, then extract metadata (2 LLM round trips "
+            "for ambiguous questions).\n"
+            "- parallel: classification and extraction at the same time, plus a "
+            "speculative 'law'-only retrieval as soon as the law is known.\n"
+            "- fused: one LLM call returns law and metadata together."
+        ),
+    )
+
 
 # ---------------- MULTI-AGENT SUPERVISOR ----------------
 st.subheader("Multi-agent Supervisor (tool-calling)")
@@ -1,14 +1,24 @@
 # pages/2_Vector_DB_Builder.py
 
 import os
+import time
 
 import streamlit as st
 
+from backend.chunking import chunking_spec_from_config
+from backend.index_spec import INDEX_KINDS, index_spec_from_config
 from backend.config import RAGConfig
-from backend.document_loader import load_documents_from_folders
-from backend.embeddings import get_embedding_model
-from backend.vector_store import build_vector_store
-from backend.vector_store import clear_vector_store_cache
+from backend.document_loader import IngestionReport
+from backend.embedding_cache import configure_embedding_cache
+from backend.embeddings import acquire_embedding_model, evict_embedding_model, release_embedding_model
+from backend.fingerprints import FINGERPRINTS_FILENAME
+from backend.vector_store import (
+    INDEX_FILENAME,
+    clear_vector_store_cache,
+    evict_vector_store,
+    get_resident_vector_stores,
+    update_vector_store,
+)
 
 BASE_VECTOR_DIR = "vector_store"  # 🔹 all vector DBs live under this folder
 
@@ -19,33 +29,6 @@ def get_config() -> RAGConfig:
     return st.session_state.config
 
 
-# ---------- CACHING LAYERS ----------
-
-@st.cache_data(show_spinner=True)
-def cached_load_documents_from_folders(
-    folders: tuple[str, ...],
-    corpus_name: str,
-):
-    """
-    Cache documents loaded from the given folders + corpus tagging.
-
-    Streamlit cache needs hashable args, so we pass folders as a tuple.
-    """
-    docs = load_documents_from_folders(list(folders))
-    for d in docs:
-        d.metadata = d.metadata or {}
-        d.metadata["corpus"] = corpus_name
-    return docs
-
-
-@st.cache_resource(show_spinner=False)
-def cached_get_embedding_model(config: RAGConfig):
-    """
-    Cache the embedding model so it's created only once per session/config.
-    """
-    return get_embedding_model(config)
-
-
 # ---------- UI ----------
 
 st.title("📚 Vector DB Builder (LangChain + FAISS)")
@@ -116,6 +99,101 @@ corpus_name = st.text_input(
 
 st.caption(f"Resulting vector store path will be: `{target_vector_dir}`")
 
+with st.expander("Chunking & embedding build settings"):
+    config.chunking_enabled = st.checkbox(
+        "Split documents into chunks",
+        value=bool(config.chunking_enabled),
+        help=(
+            "Long decisions are split by paragraphs, then sentences, then word windows, "
+            "so each vector covers one passage. Retrieval returns the matched passages "
+            "with their neighbours (or whole documents, see Configuration)."
+        ),
+    )
+    col_c1, col_c2 = st.columns(2)
+    with col_c1:
+        config.chunk_size_tokens = st.number_input(
+            "Chunk size (words)",
+            min_value=20,
+            max_value=2000,
+            value=int(config.chunk_size_tokens),
+            disabled=not config.chunking_enabled,
+        )
+    with col_c2:
+        config.chunk_overlap_tokens = st.number_input(
+            "Chunk overlap (words)",
+            min_value=0,
+            max_value=max(0, int(config.chunk_size_tokens) - 1),
+            value=min(int(config.chunk_overlap_tokens), max(0, int(config.chunk_size_tokens) - 1)),
+            disabled=not config.chunking_enabled,
+        )
+
+    col_b1, col_b2 = st.columns(2)
+    with col_b1:
+        config.embedding_batch_size = st.number_input(
+            "Batch size",
+            min_value=1,
+            max_value=1024,
+            value=int(config.embedding_batch_size),
+            help="Texts per forward pass. Texts are sorted by length, so batches need little padding.",
+        )
+    with col_b2:
+        config.embedding_build_workers = st.number_input(
+            "Embedding worker processes",
+            min_value=1,
+            max_value=max(1, os.cpu_count() or 1),
+            value=min(int(config.embedding_build_workers), max(1, os.cpu_count() or 1)),
+            help=(
+                "Hugging Face models only: number of sentence-transformers processes "
+                "(1 = embed in the app process)."
+            ),
+        )
+
+with st.expander("FAISS index type"):
+    config.index_type = st.selectbox(
+        "Index type",
+        options=list(INDEX_KINDS),
+        index=list(INDEX_KINDS).index(config.index_type) if config.index_type in INDEX_KINDS else 0,
+        help=(
+            "- flat: exact search (best for up to ~100k vectors).\n"
+            "- ivf_flat: k-means cells, only `nprobe` cells are searched.\n"
+            "- ivf_pq: cells + product quantization (~8x-30x less memory, approximate distances).\n"
+            "- hnsw: graph index, fastest queries, more memory and slower builds.\n"
+            "- sq8: exact scan over 8-bit vectors (4x less memory).\n"
+            "Trained types are trained on a sample of the vectors. Stores that are not "
+            "flat are rebuilt on every update (vectors come from the embedding cache)."
+        ),
+    )
+    col_i1, col_i2 = st.columns(2)
+    with col_i1:
+        config.index_nlist = st.number_input(
+            "IVF cells (0 = automatic)",
+            min_value=0,
+            max_value=65536,
+            value=int(config.index_nlist),
+            disabled=not config.index_type.startswith("ivf"),
+        )
+    with col_i2:
+        config.index_hnsw_m = st.number_input(
+            "HNSW neighbours per node",
+            min_value=4,
+            max_value=128,
+            value=int(config.index_hnsw_m),
+            disabled=config.index_type != "hnsw",
+        )
+
+incremental_build = st.checkbox(
+    "Incremental update (only re-embed new or changed documents)",
+    value=os.path.isfile(os.path.join(target_vector_dir, FINGERPRINTS_FILENAME))
+    if target_vector_dir
+    else False,
+    help=(
+        "Compares every JSON file with the fingerprint table saved by the last build: "
+        "unchanged files are skipped, changed documents are re-embedded and documents "
+        "of removed files are deleted. Falls back to a full build when the store has "
+        "no fingerprint table or was built with another embedding model."
+    ),
+)
+
 # ---------------- BUILD BUTTON ----------------
 if st.button("🔍 Scan folders & Build Vector DB"):
     if not selected_folders:
@@ -123,36 +201,82 @@ if st.button("🔍 Scan folders & Build Vector DB"):
     elif not vector_store_name:
         st.error("Please specify a vector store name (e.g. 'legal').")
     else:
-        progress = st.progress(0)
-
-        # 1) Load docs (CACHED)
-        with st.spinner("Loading JSON documents from selected folders..."):
-            docs = cached_load_documents_from_folders(
-                tuple(selected_folders),
-                corpus_name,
+        progress = st.progress(0, text="Initializing embedding model...")
+
+        # 1) Enable the persistent embedding cache (texts embedded by earlier
+        #    builds) and get the shared embedding model (process-wide registry),
+        #    held until the build ends so "Clear caches" in another session keeps it
+        configure_embedding_cache(config)
+        embedding_model = acquire_embedding_model(config)
+
+        # 2) Stream JSON documents (parsed in a process pool) straight into the
+        #    FAISS build: batch N is embedded while later files are still parsed.
+        #    In incremental mode only changed files are parsed.
+        report = IngestionReport()
+        t_build = time.perf_counter()
+
+        def on_batch(batch_docs: int, total_docs: int) -> None:
+            # Files parsed so far x share of their chunks already processed
+            # (`total_docs` counts chunks, like `report.chunks`)
+            embedded = total_docs / report.chunks if report.chunks else 0.0
+            rate = total_docs / max(time.perf_counter() - t_build, 1e-6)
+            unit = "chunks" if config.chunking_enabled else "documents"
+            progress.progress(
+                min(report.progress * embedded, 1.0),
+                text=(
+                    f"Parsed {report.files_done}/{report.files_total} files · "
+                    f"processed {total_docs}/{report.chunks} {unit} "
+                    f"({rate:.0f} {unit}/s)"
+                ),
             )
-        progress.progress(30)
-
-        if not docs:
-            st.error("No documents found in the selected folders.")
-            st.stop()
-
-        st.success(f"Loaded {len(docs)} documents. Initializing embedding model...")
-        progress.progress(50)
-
-        # 2) Create embeddings model (CACHED)
-        embedding_model = cached_get_embedding_model(config)
-        progress.progress(65)
-
-        # Ensure target directory exists (under vector_store/)
-        os.makedirs(target_vector_dir, exist_ok=True)
 
-        # 3) Build FAISS vector store at the chosen directory
         with st.spinner(
-            f"Computing embeddings & building FAISS index at `{target_vector_dir}`..."
+            f"Parsing JSON, computing embeddings & building FAISS index at `{target_vector_dir}`..."
         ):
-            build_vector_store(docs, embedding_model, target_vector_dir)
-        progress.progress(100)
+            try:
+                build_stats = update_vector_store(
+                    selected_folders,
+                    embedding_model,
+                    target_vector_dir,
+                    corpus_name=corpus_name,
+                    incremental=incremental_build,
+                    report=report,
+                    on_batch=on_batch,
+                    batch_size=int(config.embedding_batch_size),
+                    num_workers=int(config.embedding_build_workers),
+                    chunking=chunking_spec_from_config(config),
+                    index_spec=index_spec_from_config(config),
+                )
+            finally:
+                release_embedding_model(config)
+        progress.progress(1.0, text=report.summary())
+        n_docs = build_stats["doc_count"]
+        st.caption(
+            f"{build_stats['mode'].capitalize()} build in {build_stats['elapsed_s']:.1f}s — "
+            f"files: {build_stats['files_parsed']} parsed, {build_stats['files_unchanged']} unchanged · "
+            f"documents: {build_stats['docs_embedded'] - build_stats['embedding_cache_hits']} embedded, "
+            f"{build_stats['embedding_cache_hits']} from the embedding cache, "
+            f"{build_stats['docs_reused_vectors']} re-used vectors, "
+            f"{build_stats['docs_kept']} kept, {build_stats['docs_deleted']} deleted"
+        )
+
+        if report.errors:
+            with st.expander(f"⚠️ Ingestion problems ({len(report.errors)})"):
+                st.dataframe(report.as_records(), use_container_width=True)
+
+        if not n_docs:
+            if build_stats.get("store_kept"):
+                st.error(
+                    "No documents found in the selected folders: nothing built, "
+                    f"existing store at `{target_vector_dir}` kept."
+                )
+            elif build_stats.get("store_removed"):
+                st.warning(
+                    f"Every source file of `{target_vector_dir}` was deleted: the store was removed."
+                )
+            else:
+                st.error("No documents found in the selected folders.")
+            st.stop()
 
         # Update config
         config.vector_store_dir = target_vector_dir
@@ -163,7 +287,7 @@ if st.button("🔍 Scan folders & Build Vector DB"):
 
         st.success(
             f"Vector store created at: {target_vector_dir} "
-            f"(docs: {len(docs)})"
+            f"(docs: {n_docs})"
         )
 
         st.info(
@@ -181,12 +305,45 @@ st.caption(
 
 # ---------- CACHE MANAGEMENT UI ----------
 with st.expander("Advanced: cache management"):
+    resident = get_resident_vector_stores()
+    if resident:
+        st.write("Vector stores currently loaded in memory (least recently used first):")
+        st.table(
+            [
+                {
+                    "path": r["path"],
+                    "layout": r["layout"],
+                    "vectors": r["n_vectors"],
+                    "size (MB)": round(r["nbytes"] / 1e6, 2),
+                    "hits": r["hits"],
+                }
+                for r in resident
+            ]
+        )
+    else:
+        st.caption("No vector store loaded in memory.")
+
+    embedding_cache = configure_embedding_cache(config)
+    if embedding_cache is not None:
+        cache_stats = embedding_cache.stats()
+        st.caption(
+            f"Persistent embedding cache `{cache_stats['path']}`: "
+            f"{cache_stats['size_mb']} / {cache_stats['max_mb']} MB · "
+            + ", ".join(f"{m['model']} ({m['vectors']} vectors)" for m in cache_stats["models"])
+            + " — inspect or prune it with `python -m backend.embedding_cache stats|prune`."
+        )
+
     if st.button("♻️ Clear caches & Data"):
-        # Clear Streamlit caches
-        cached_load_documents_from_folders.clear()
-        cached_get_embedding_model.clear()
+        # Drop the shared embedding model (reloaded on next use; kept while a
+        # build in another session still holds it)
+        evict_embedding_model(config)
 
         # Clear in-memory FAISS cache
-        clear_vector_store_cache(current_name)
+        evict_vector_store()
+
+        # Delete the selected store on disk (only if it really is a store
+        # directory, never the parent folder of all stores)
+        if current_path and os.path.isfile(os.path.join(current_path, INDEX_FILENAME)):
+            clear_vector_store_cache(current_path)
 
         st.success("Caches cleared. The next build will reload everything from disk.")
\ No newline at end of file
@@ -8,9 +8,11 @@ from typing import Dict, Any, List, Optional, Tuple
 
 import streamlit as st
 
+from backend.answer_cache import get_answer_cache_stats
+from backend.router import get_router_stats
 from backend.config import RAGConfig
-from backend.rag_pipeline import answer_question as rag_answer_question
-from backend.hybrid_rag import hybrid_answer_question
+from backend.rag_pipeline import stream_answer_question as rag_stream_answer_question
+from backend.hybrid_rag import stream_hybrid_answer_question
 
 
 CHAT_DB_PATH = Path("chat_sessions.json")
@@ -112,6 +114,26 @@ with col_top2:
 with col_top3:
     db = load_chat_db()
     st.caption(f"📁 Saved chats in DB: **{len(db)}** (stored in `{CHAT_DB_PATH.name}`)")
+    try:
+        cache_stats = get_answer_cache_stats(config)
+    except Exception as e:
+        cache_stats = None
+        print(f"[chatbot] Answer cache stats unavailable: {e}")
+    if cache_stats is not None:
+        lookups = cache_stats["hits"] + cache_stats["misses"]
+        st.caption(
+            f"♻️ Answer cache: **{cache_stats['hits']}/{lookups}** questions answered from "
+            f"cache this session ({cache_stats['hit_rate']:.0%}) · "
+            f"{cache_stats['entries']} stored answer(s), "
+            f"{cache_stats['served_total']} served in total"
+        )
+    router_stats = get_router_stats()
+    if router_stats["questions"]:
+        st.caption(
+            f"🧭 Local router: **{router_stats['llm_calls_saved']}/"
+            f"{router_stats['llm_calls_needed']}** LLM routing calls saved "
+            f"({router_stats['saved_per_question']:.2f} per question)"
+        )
 
 
 # ---------------------------------------------------------------------
@@ -227,31 +249,70 @@ if user_input:
     with st.chat_message("user"):
         st.markdown(user_input)
 
-    # Assistant response
+    # Assistant response (streamed: retrieval status first, then answer tokens)
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            # Decide which pipeline: hybrid legal or standard RAG
-            use_hybrid = agentic_mode == "hybrid_legal"
-
-            # We request reasoning logs if any of the UI toggles need them
-            need_reasoning = show_react_trace or show_retrieval_logs or show_agent_logs
-
-            if use_hybrid:
-                answer, docs, reasoning_trace, extracted_meta = hybrid_answer_question(
-                    user_input,
-                    config,
-                    show_reasoning=need_reasoning,
-                )
-            else:
-                answer, docs, reasoning_trace = rag_answer_question(
-                    user_input,
-                    config,
-                    show_reasoning=need_reasoning,
-                )
-                extracted_meta = None
+        # Decide which pipeline: hybrid legal or standard RAG
+        use_hybrid = agentic_mode == "hybrid_legal"
+
+        # We request reasoning logs if any of the UI toggles need them
+        need_reasoning = show_react_trace or show_retrieval_logs or show_agent_logs
+
+        if use_hybrid:
+            events = stream_hybrid_answer_question(
+                user_input,
+                config,
+                show_reasoning=need_reasoning,
+            )
+        else:
+            events = rag_stream_answer_question(
+                user_input,
+                config,
+                show_reasoning=need_reasoning,
+            )
+
+        status_box = st.empty()
+        status_box.caption("🔎 Thinking / retrieving documents...")
+        final: Dict[str, Any] = {}
+        cache_hit: Dict[str, Any] = {}
+
+        def answer_tokens():
+            for event in events:
+                kind = event.get("type")
+                if kind == "retrieval":
+                    n_docs = len(event.get("docs") or [])
+                    db_names = event.get("db_names") or []
+                    where = f" from {', '.join(db_names)}" if db_names else ""
+                    if event.get("cache_hit"):
+                        cache_hit.update(event["cache_hit"])
+                    status_box.caption(
+                        f"📚 {n_docs} document(s) retrieved{where} — writing answer..."
+                    )
+                elif kind == "token":
+                    yield event["text"]
+                elif kind == "done":
+                    final.update(event)
+
+        st.write_stream(answer_tokens())
+
+        result = final["result"]
+        if use_hybrid:
+            answer, docs, reasoning_trace, extracted_meta = result
+        else:
+            answer, docs, reasoning_trace = result
+            extracted_meta = None
+        if cache_hit:
+            status_box.caption(
+                f"♻️ Answered from cache in {final['total_s']:.2f}s — "
+                f"{cache_hit['similarity']:.0%} similar to an earlier question: "
+                f"“{cache_hit['question'][:100]}”"
+            )
+        else:
+            status_box.caption(
+                f"⏱ First token after {final['ttft_s']:.2f}s · "
+                f"complete after {final['total_s']:.2f}s"
+            )
 
         answer_text = answer
-        st.markdown(answer_text)
 
         # ---------- Optional reasoning / logs display ----------
         if reasoning_trace:
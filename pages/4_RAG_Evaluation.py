@@ -20,6 +20,7 @@ from ragas.metrics import (
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 
 from backend.config import RAGConfig
+from backend.llm_cache import LangChainResponseCache, get_llm_response_cache
 
 CHAT_DB_PATH = Path("chat_sessions.json")
 
@@ -128,13 +129,17 @@ def build_ragas_dataset_from_chats(chat_db: List[Dict[str, Any]]) -> Dataset:
 # ---------------------------------------------------------------------
 # Ragas evaluation models (OpenRouter via LangChain)
 # ---------------------------------------------------------------------
-def get_ragas_models():
+def get_ragas_models(config: RAGConfig, reuse_cached: bool = True):
     """
     Create LangChain LLM + embeddings for Ragas to use.
 
     Uses:
       - ChatOpenAI("openai/gpt-4o-mini")
       - OpenAIEmbeddings("text-embedding-3-small")
+
+    reuse_cached → judge prompts already answered (e.g. in an earlier run over
+    the same rows) are served from the LLM response cache (backend/llm_cache.py)
+    instead of being sent (and billed) again.
     """
     if not os.getenv("OPENROUTER_API_KEY"):
         raise RuntimeError(
@@ -143,11 +148,13 @@ def get_ragas_models():
         )
 
     api_key = os.getenv("OPENROUTER_API_KEY")
+    response_cache = get_llm_response_cache(config) if reuse_cached else None
     eval_llm = ChatOpenAI(
         model="openai/gpt-4o-mini",
         temperature=0.0,
         api_key=api_key,
         base_url="https://openrouter.ai/api/v1",
+        cache=LangChainResponseCache(response_cache) if response_cache is not None else False,
     )
     eval_embeddings = OpenAIEmbeddings(
         model="text-embedding-3-small",
@@ -316,9 +323,22 @@ dataset_eval = Dataset.from_pandas(df_eval, preserve_index=False)
 # ---------------------------------------------------------------------
 # Run evaluation
 # ---------------------------------------------------------------------
+reuse_cached = st.checkbox(
+    "Reuse cached judge responses",
+    value=getattr(config, "use_llm_response_cache", True),
+    disabled=not getattr(config, "use_llm_response_cache", True),
+    help=(
+        "Judge prompts identical to ones already answered (same rows, same metrics) "
+        "are served from the LLM response cache instead of being sent to OpenRouter again."
+    ),
+)
+
 if st.button("Run RAGAS evaluation"):
+    response_cache = get_llm_response_cache(config) if reuse_cached else None
+    cache_hits0 = response_cache.hits if response_cache is not None else 0
+    cache_misses0 = response_cache.misses if response_cache is not None else 0
     try:
-        eval_llm, eval_embeddings = get_ragas_models()
+        eval_llm, eval_embeddings = get_ragas_models(config, reuse_cached=reuse_cached)
     except RuntimeError as e:
         st.error(str(e))
         st.stop()
@@ -346,6 +366,12 @@ if st.button("Run RAGAS evaluation"):
             st.stop()
 
     st.success("Evaluation completed.")
+    if response_cache is not None:
+        reused = response_cache.hits - cache_hits0
+        sent = response_cache.misses - cache_misses0
+        st.caption(
+            f"♻️ Judge LLM calls: {reused} served from cache, {sent} sent to the provider."
+        )
     st.subheader("Per-row metric scores")
 
     # Result → pandas